@@ -0,0 +1,74 @@
+"""Content-hash cache of document analyses.
+
+Identical files uploaded again (often by several departments) reuse the
+stored extraction, embedding, summary and alerts; only the per-upload
+misfiling check is re-run. Size is bounded by DEDUP_CACHE_MAX_ENTRIES with
+least-recently-used eviction. Writes join the caller's transaction.
+
+Entries are tagged with a fingerprint of the models and analysis settings
+that produced them; after a change (another embedding model or backend,
+OCR options, summary mode, ...) older entries are misses and get
+overwritten, so cached embeddings never mix vector spaces.
+"""
+import json, hashlib
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from . import models, vector_store
+from .app.config import get_settings
+
+settings = get_settings()
+
+ANALYSIS_VERSION = 2  # bump when processor changes what an analysis contains
+# Exactly the settings processor/extraction/ocr read while analysing a file; the
+# summarizer model and the alert/misfile thresholds are constants in processor.py
+# and are covered by ANALYSIS_VERSION.
+FINGERPRINT_SETTINGS = (
+    'EMBED_MODEL', 'EMBED_BACKEND', 'SUMMARY_MODE', 'SUMMARY_CHUNK_WORDS',
+    'SUMMARY_LATENCY_BUDGET_SECONDS', 'SUMMARY_EXTRACTIVE_SENTENCES', 'TRANSLATION_MODEL',
+    'OCR_ENABLED', 'OCR_LANGUAGE', 'OCR_DPI', 'OCR_MIN_TEXT_CHARS', 'OCR_MAX_PIXELS', 'OCR_BINARIZE',
+    'CHUNK_MAX_WORDS', 'DEPT_AGGREGATION_STRATEGY', 'MAX_SECTION_SCORES',
+)
+
+def fingerprint(config=None) -> str:
+    """Short hash of the settings an analysis depends on"""
+    config = config or settings
+    values = {name: getattr(config, name) for name in FINGERPRINT_SETTINGS}
+    values['version'] = ANALYSIS_VERSION
+    return hashlib.sha256(json.dumps(values, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+def lookup(db: Session, content_hash: str):
+    """Return the cached analysis for these bytes under the current settings, or None"""
+    entry = db.query(models.AnalysisCache).filter(models.AnalysisCache.content_hash == content_hash).first()
+    if entry is None or entry.fingerprint != fingerprint():
+        return None
+    entry.hits = (entry.hits or 0) + 1
+    entry.last_used_at = datetime.utcnow()
+    analysis = json.loads(entry.analysis)
+    analysis['embedding'] = vector_store.from_blob(entry.embedding)
+    return analysis
+
+def store(db: Session, content_hash: str, analysis: dict):
+    payload = {k: v for k, v in analysis.items() if k != 'embedding'}
+    db.merge(models.AnalysisCache(
+        content_hash=content_hash,
+        fingerprint=fingerprint(),
+        analysis=json.dumps(payload),
+        embedding=vector_store.to_blob(analysis['embedding']),
+        hits=0,
+        last_used_at=datetime.utcnow()
+    ))
+    db.flush()
+    evict(db)
+
+def evict(db: Session, max_entries: int = None):
+    """Drop least recently used entries beyond the size bound"""
+    max_entries = settings.DEDUP_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+    excess = db.query(func.count(models.AnalysisCache.content_hash)).scalar() - max_entries
+    if excess <= 0:
+        return
+    stale = [h for (h,) in db.query(models.AnalysisCache.content_hash)
+             .order_by(models.AnalysisCache.last_used_at).limit(excess).all()]
+    db.query(models.AnalysisCache).filter(
+        models.AnalysisCache.content_hash.in_(stale)
+    ).delete(synchronize_session=False)
@@ -1,19 +1,15 @@
 """
 Database Configuration and Session Management
 """
-from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import get_settings
+from .engine import make_engine
 
 settings = get_settings()
 
-# Create engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
-    pool_pre_ping=True
-)
+# Create engine (shared SQLite pragmas / PostgreSQL pool settings)
+engine = make_engine(settings.DATABASE_URL)
 
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
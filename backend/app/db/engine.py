@@ -0,0 +1,48 @@
+"""
+Engine Configuration
+Shared create_engine settings for SQLite and PostgreSQL
+"""
+from sqlalchemy import create_engine, event
+from ..config import get_settings
+
+settings = get_settings()
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    return url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+
+
+def _apply_sqlite_pragmas(engine, url: str):
+    """WAL lets readers proceed while a writer commits; NORMAL sync is durable in WAL mode"""
+    journal_mode = None if _is_memory_sqlite(url) else settings.SQLITE_JOURNAL_MODE
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if journal_mode:
+            cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.close()
+
+
+def make_engine(url: str = None, **kwargs):
+    """Create an engine for url (default DATABASE_URL) with per-backend tuning"""
+    url = url or settings.DATABASE_URL
+    if url.startswith("sqlite"):
+        engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False, "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000},
+            **kwargs
+        )
+        _apply_sqlite_pragmas(engine, url)
+        return engine
+    return create_engine(
+        url,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=True,
+        **kwargs
+    )
@@ -5,10 +5,19 @@ import logging
 import sys
 from pythonjsonlogger import jsonlogger
 
-def setup_logging():
-    """Configure structured JSON logging"""
-    logger = logging.getLogger()
+APP_LOGGER = 'kmrl'
+
+def setup_logging(name: str = APP_LOGGER):
+    """Configure structured JSON logging for the application's own logger.
+
+    Only the named logger (and its children, e.g. ``kmrl.timing``) gets the
+    JSON handler; the root logger and third-party libraries are left alone.
+    """
+    logger = logging.getLogger(name)
     logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if logger.handlers:  # already configured (module reloaded)
+        return logger
     
     # Console handler with JSON formatting
     handler = logging.StreamHandler(sys.stdout)
@@ -1,6 +1,11 @@
-import hashlib, time, jwt, os
-from sqlalchemy.orm import Session
+import hashlib, time, jwt, os, threading
+from collections import OrderedDict
+from sqlalchemy import event, inspect, update, insert
+from sqlalchemy.orm import Session, object_session
 from . import models
+from .app.config import get_settings
+
+settings = get_settings()
 
 SECRET = os.getenv('JWT_SECRET', 'CHANGE_THIS_SECRET_IN_ENV_FILE')
 
@@ -56,3 +61,180 @@ def decode_token(token: str):
         return payload
     except:
         return None
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire; counts hits, misses and evictions"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl: float = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None
+            }
+
+class UserSnapshot:
+    """Detached, read-only copy of the User fields request handlers use"""
+    __slots__ = ('id', 'username', 'role', 'department', 'is_active')
+
+    def __init__(self, user):
+        self.id = user.id
+        self.username = user.username
+        self.role = user.role
+        self.department = user.department
+        self.is_active = user.is_active
+
+# Verified token claims (keyed by token hash) and user snapshots (keyed by username)
+token_cache = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL_SECONDS)
+user_cache = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL_SECONDS)
+
+# User changes bump a shared generation row; each process compares it with the one its
+# user_cache was filled under at most every AUTH_CACHE_SYNC_SECONDS and clears on change,
+# so edits made through any worker apply everywhere within that bound
+USERS_GENERATION = 'users'
+_generation = {'seen': None, 'checked': float('-inf')}
+_generation_lock = threading.Lock()
+
+def _sync_user_cache(db: Session):
+    now = time.monotonic()
+    if now - _generation['checked'] < settings.AUTH_CACHE_SYNC_SECONDS:
+        return
+    row = db.query(models.CacheGeneration.generation).filter(
+        models.CacheGeneration.name == USERS_GENERATION).first()
+    current = row[0] if row else 0
+    with _generation_lock:
+        if current != _generation['seen']:
+            user_cache.clear()
+            _generation['seen'] = current
+        _generation['checked'] = now
+
+def bump_users_generation(connection):
+    """Tell every worker to drop its cached users; runs in the caller's transaction"""
+    table = models.CacheGeneration.__table__
+    bumped = connection.execute(update(table).where(table.c.name == USERS_GENERATION)
+                                .values(generation=table.c.generation + 1))
+    if not bumped.rowcount:
+        connection.execute(insert(table).values(name=USERS_GENERATION, generation=1))
+
+def verify_token(token: str):
+    """decode_token, cached until the token's expiry or the cache TTL"""
+    if not settings.AUTH_CACHE_ENABLED:
+        return decode_token(token)
+    key = hashlib.sha256(token.encode()).hexdigest()
+    payload = token_cache.get(key)
+    if payload is None:
+        payload = decode_token(token)
+        if payload:
+            remaining = payload.get('exp', time.time() + token_cache.ttl) - time.time()
+            if remaining > 0:
+                token_cache.set(key, payload, ttl=remaining)
+    return payload
+
+def get_user(db: Session, username: str):
+    """UserSnapshot for username (cached), or None"""
+    if settings.AUTH_CACHE_ENABLED:
+        _sync_user_cache(db)
+    user = user_cache.get(username) if settings.AUTH_CACHE_ENABLED else None
+    if user is None:
+        record = db.query(models.User).filter(models.User.username == username).first()
+        if record is None:
+            return None
+        user = UserSnapshot(record)
+        if settings.AUTH_CACHE_ENABLED:
+            user_cache.set(username, user)
+    return user
+
+def invalidate_user(username: str):
+    """Drop a cached user from this process only; see bump_users_generation for all workers"""
+    user_cache.pop(username)
+
+def cache_stats():
+    return {'enabled': settings.AUTH_CACHE_ENABLED, 'tokens': token_cache.stats(), 'users': user_cache.stats()}
+
+# Processes drop cached users only once the change is committed: invalidating inside the
+# flush let a concurrent request re-cache the old row before commit. Whatever still slips
+# through that window is cleared by the generation check above.
+_PENDING_KEY = 'kmrl_invalidated_users'
+
+def _invalidate_after_commit(session: Session, username: str = None):
+    """Queue a user_cache drop for when session commits (username None: every user)"""
+    session.info.setdefault(_PENDING_KEY, set()).add(username)
+
+@event.listens_for(Session, 'after_commit')
+def _apply_invalidations(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    if None in pending:
+        user_cache.clear()
+        return
+    for username in pending:
+        invalidate_user(username)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_invalidations(session):
+    session.info.pop(_PENDING_KEY, None)
+
+@event.listens_for(models.User, 'after_update')
+@event.listens_for(models.User, 'after_delete')
+def _user_changed(mapper, connection, target):
+    bump_users_generation(connection)
+    usernames = [target.username] + list(inspect(target).attrs.username.history.deleted or ())
+    session = object_session(target)
+    for username in usernames:
+        if session is None:
+            invalidate_user(username)
+        else:
+            _invalidate_after_commit(session, username)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bulk_user_change(state):
+    """Bulk UPDATE/DELETE on users (query.update(), session.execute(update(User))) skip flush events"""
+    if not (state.is_update or state.is_delete):
+        return
+    table = getattr(state.statement, 'table', None)
+    if getattr(table, 'name', None) != models.User.__tablename__:
+        return
+    bump_users_generation(state.session.connection())
+    _invalidate_after_commit(state.session)
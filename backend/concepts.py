@@ -0,0 +1,55 @@
+"""Stacked concept embeddings (departments, alert types) with an on-disk cache.
+
+Each concept set is held as one pre-normalized (concepts, dim) matrix so a
+document, or a whole batch of documents, is scored with a single matmul.
+Matrices are cached as .npz files keyed by the embedding model name and a
+hash of the descriptions, so restarts skip re-encoding.
+"""
+import os, json, hashlib, tempfile
+import numpy as np
+
+class ConceptMatrix:
+    """Labels plus their unit-normalized embeddings, row-aligned"""
+
+    def __init__(self, labels, matrix):
+        self.labels = list(labels)
+        self.matrix = _normalize(np.asarray(matrix, dtype=np.float32))
+
+    def scores(self, embeddings):
+        """Cosine similarity of one (dim,) or many (N, dim) embeddings to every concept"""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        return _normalize(embeddings) @ self.matrix.T
+
+    def as_dict(self, row):
+        return {label: float(score) for label, score in zip(self.labels, row)}
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+def cache_key(model_name: str, descriptions: dict) -> str:
+    payload = json.dumps({'model': model_name, 'descriptions': descriptions}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def load_concept_matrix(descriptions: dict, cache_path: str, model_name: str, encode):
+    """Load the cached matrix for these descriptions, encoding and saving on a miss"""
+    key = cache_key(model_name, descriptions)
+    labels = list(descriptions)
+    try:
+        with np.load(cache_path) as cached:
+            if str(cached['key']) == key and list(cached['labels']) == labels:
+                return ConceptMatrix(labels, cached['matrix'])
+    except (OSError, KeyError, ValueError):
+        pass
+
+    concepts = ConceptMatrix(labels, encode([descriptions[label] for label in labels]))
+    try:
+        directory = os.path.dirname(os.path.abspath(cache_path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.npz')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, key=np.array(key), labels=np.array(labels), matrix=concepts.matrix)
+        os.replace(tmp, cache_path)
+    except OSError as e:
+        print(f"Could not cache concept embeddings at {cache_path}: {e}")
+    return concepts
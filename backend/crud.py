@@ -1,15 +1,296 @@
-from sqlalchemy.orm import Session
-from . import models, schemas
+import json, base64
+from datetime import datetime, date, timedelta
+from sqlalchemy import func, or_, and_, case
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, load_only
+from . import models, schemas, vector_store
 
-def create_document(db: Session, doc: schemas.DocumentCreate):
-    db_doc = models.Document(**doc.dict())
+# Columns loaded for document listings (summary and extracted texts stay deferred)
+LIST_COLUMNS = (
+    models.Document.id, models.Document.filename, models.Document.department,
+    models.Document.predicted_department, models.Document.confidence,
+    models.Document.semantic_alerts, models.Document.is_misfiled,
+    models.Document.uploaded_by, models.Document.created_at,
+)
+
+def create_document(db: Session, doc: schemas.DocumentCreate, embedding=None, search_text: str = None,
+                    commit: bool = True):
+    db_doc = models.Document(**doc.dict(), search_text=search_text)
     db.add(db_doc)
-    db.commit()
-    db.refresh(db_doc)
+    db.flush()
+    alert_count = add_alerts(db, db_doc)
+    bump_counters(db, db_doc.department, db_doc.created_at.date(),
+                  alerting=1 if alert_count else 0, misfiled=1 if db_doc.is_misfiled else 0)
+    if embedding is not None:
+        db.add(models.DocumentEmbedding(
+            document_id=db_doc.id,
+            department=db_doc.department,
+            vector=vector_store.to_blob(embedding)
+        ))
+    if commit:
+        db.commit()
+        db.refresh(db_doc)
     return db_doc
 
-def get_documents(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Document).offset(skip).limit(limit).all()
+def encode_cursor(doc) -> str:
+    raw = f"{doc.created_at.isoformat()}|{doc.id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str):
+    """(created_at, id) from an opaque cursor; ValueError if malformed"""
+    try:
+        created_at, doc_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+        return datetime.fromisoformat(created_at), int(doc_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def _parse_alerts(semantic_alerts):
+    try:
+        alerts = json.loads(semantic_alerts) if semantic_alerts else []
+    except ValueError:
+        return []
+    return alerts if isinstance(alerts, list) else []
+
+def _alert_rows(doc):
+    return [{
+        'document_id': doc.id,
+        'label': alert['label'],
+        'score': alert['score'],
+        'paragraph_index': alert.get('paragraph_index'),
+        'page': alert.get('page'),
+        'snippet': alert.get('snippet'),
+        'created_at': doc.created_at
+    } for alert in _parse_alerts(doc.semantic_alerts)]
+
+def add_alerts(db: Session, doc):
+    """Write a document's semantic_alerts JSON as Alert rows, returning how many"""
+    rows = _alert_rows(doc)
+    for row in rows:
+        db.add(models.Alert(**row))
+    return len(rows)
+
+def _insert_ignoring_conflicts(db: Session, table, rows, index_elements):
+    """INSERT rows, skipping any that collide on index_elements, inside the caller's transaction"""
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        db.execute(insert(table).values(rows).on_conflict_do_nothing(index_elements=index_elements))
+        return
+    for row in rows:
+        try:
+            with db.begin_nested():
+                db.execute(table.insert().values(**row))
+        except IntegrityError:
+            pass
+
+ALERTS_BACKFILL = 'alerts_backfill'
+
+def backfill_alerts(db: Session, batch_size: int = 500):
+    """Create Alert rows for documents stored before alerts were normalized (one-off).
+
+    Skipped once the completion marker exists. Workers that race on the first
+    start cannot duplicate rows: inserts ignore (document_id, label) conflicts.
+    """
+    if db.get(models.CompletedMigration, ALERTS_BACKFILL) is not None:
+        return 0
+    alerts = models.Alert.__table__
+    has_rows = db.query(models.Alert.id).filter(models.Alert.document_id == models.Document.id).exists()
+    query = db.query(models.Document).options(
+        load_only(models.Document.id, models.Document.semantic_alerts, models.Document.created_at)
+    ).filter(
+        models.Document.semantic_alerts != None,
+        models.Document.semantic_alerts != '[]',
+        ~has_rows
+    ).order_by(models.Document.id)
+    count, last_id = 0, 0
+    while True:
+        docs = query.filter(models.Document.id > last_id).limit(batch_size).all()
+        if not docs:
+            break
+        _insert_ignoring_conflicts(db, alerts, [row for doc in docs for row in _alert_rows(doc)],
+                                   [alerts.c.document_id, alerts.c.label])
+        db.commit()
+        count += len(docs)
+        last_id = docs[-1].id
+    marker = models.CompletedMigration.__table__
+    _insert_ignoring_conflicts(db, marker, [{'name': ALERTS_BACKFILL, 'completed_at': datetime.utcnow()}],
+                               [marker.c.name])
+    db.commit()
+    return count
+
+def bump_counters(db: Session, department: str, day: date, total: int = 1, alerting: int = 0, misfiled: int = 0):
+    """Atomically add to a (department, day) counter row inside the caller's transaction"""
+    counter = models.DocumentCounter.__table__
+    values = {'department': department or '', 'day': day, 'total': total, 'alerting': alerting, 'misfiled': misfiled}
+    dialect = db.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(counter).values(**values)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[counter.c.department, counter.c.day],
+            set_={name: counter.c[name] + stmt.excluded[name] for name in ('total', 'alerting', 'misfiled')}
+        ))
+        return
+    row = db.get(models.DocumentCounter, (values['department'], day), with_for_update=True)
+    if row is None:
+        db.add(models.DocumentCounter(**values))
+    else:
+        row.total += total
+        row.alerting += alerting
+        row.misfiled += misfiled
+    db.flush()
+
+def rebuild_counters(db: Session):
+    """Recompute all counters from the documents table (one GROUP BY); commits"""
+    has_alerts = and_(models.Document.semantic_alerts != None, models.Document.semantic_alerts != '[]',
+                      models.Document.semantic_alerts != '')
+    day = func.date(models.Document.created_at)
+    rows = db.query(
+        models.Document.department, day,
+        func.count(models.Document.id),
+        func.sum(case((has_alerts, 1), else_=0)),
+        func.sum(case((models.Document.is_misfiled == True, 1), else_=0))
+    ).group_by(models.Document.department, day).all()
+    db.query(models.DocumentCounter).delete(synchronize_session=False)
+    for department, row_day, total, alerting, misfiled in rows:
+        if row_day is None:
+            continue
+        db.add(models.DocumentCounter(
+            department=department or '',
+            day=date.fromisoformat(row_day) if isinstance(row_day, str) else row_day,
+            total=total, alerting=alerting or 0, misfiled=misfiled or 0
+        ))
+    db.commit()
+    return len(rows)
+
+def get_counter_totals(db: Session, department: str = None):
+    query = db.query(
+        func.coalesce(func.sum(models.DocumentCounter.total), 0),
+        func.coalesce(func.sum(models.DocumentCounter.alerting), 0),
+        func.coalesce(func.sum(models.DocumentCounter.misfiled), 0)
+    )
+    if department is not None:
+        query = query.filter(models.DocumentCounter.department == department)
+    total, alerting, misfiled = query.one()
+    return {'total': int(total), 'alerting': int(alerting), 'misfiled': int(misfiled)}
+
+def get_counter_series(db: Session, days: int, department: str = None):
+    """Daily totals for the last `days` days (UTC), oldest first; days without uploads are omitted"""
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    query = db.query(
+        models.DocumentCounter.day,
+        func.sum(models.DocumentCounter.total),
+        func.sum(models.DocumentCounter.alerting),
+        func.sum(models.DocumentCounter.misfiled)
+    ).filter(models.DocumentCounter.day >= since)
+    if department is not None:
+        query = query.filter(models.DocumentCounter.department == department)
+    rows = query.group_by(models.DocumentCounter.day).order_by(models.DocumentCounter.day).all()
+    return [{'day': d.isoformat(), 'total': int(t), 'alerting': int(a), 'misfiled': int(m)} for d, t, a, m in rows]
+
+def _keyset_page(query, created_column, id_column, limit: int, cursor: str = None, key=lambda row: row):
+    """Newest-first page of query keyed on (created_at, id): (rows, next_cursor).
+
+    key maps a result row to the object carrying created_at and id.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            created_column < created_at,
+            and_(created_column == created_at, id_column < row_id)
+        ))
+    rows = query.order_by(created_column.desc(), id_column.desc()).limit(limit + 1).all()
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(key(rows[limit - 1]))
+    return rows, None
+
+def get_documents_page(db: Session, limit: int, cursor: str = None, department: str = None,
+                       misfiled: bool = None):
+    """One page of documents (list columns only), newest first.
+
+    Returns (documents, next_cursor); next_cursor is None on the last page.
+    """
+    query = db.query(models.Document).options(load_only(*LIST_COLUMNS, models.Document.flag_reason))
+    if department is not None:
+        query = query.filter(models.Document.department == department)
+    if misfiled is not None:
+        query = query.filter(models.Document.is_misfiled == misfiled)
+    return _keyset_page(query, models.Document.created_at, models.Document.id, limit, cursor)
+
+def get_alerts_page(db: Session, limit: int, cursor: str = None, label: str = None,
+                    min_score: float = None, department: str = None):
+    """Alerts newest first as (Alert, filename, department) rows, plus next_cursor"""
+    query = db.query(models.Alert, models.Document.filename, models.Document.department).join(
+        models.Document, models.Document.id == models.Alert.document_id)
+    if label is not None:
+        query = query.filter(models.Alert.label == label)
+    if min_score is not None:
+        query = query.filter(models.Alert.score >= min_score)
+    if department is not None:
+        query = query.filter(models.Document.department == department)
+    return _keyset_page(query, models.Alert.created_at, models.Alert.id, limit, cursor, key=lambda row: row[0])
 
 def get_document(db: Session, doc_id: int):
     return db.query(models.Document).filter(models.Document.id == doc_id).first()
+
+def get_documents_by_ids(db: Session, doc_ids):
+    docs = db.query(models.Document).filter(models.Document.id.in_(doc_ids)).all()
+    return {d.id: d for d in docs}
+
+def get_embedding_matrix(db: Session, department: str = None):
+    """Load stored embeddings as (document_ids, matrix), optionally for one department"""
+    query = db.query(models.DocumentEmbedding.document_id, models.DocumentEmbedding.vector)
+    if department is not None:
+        query = query.filter(models.DocumentEmbedding.department == department)
+    rows = query.all()
+    return [r[0] for r in rows], vector_store.stack([r[1] for r in rows])
+
+def get_embedding_ids(db: Session, department: str):
+    """Document ids with a stored embedding in one department"""
+    rows = db.query(models.DocumentEmbedding.document_id).filter(
+        models.DocumentEmbedding.department == department).all()
+    return {r[0] for r in rows}
+
+def get_embeddings(db: Session, doc_ids, chunk_size: int = 500):
+    """Stored embeddings of the given documents as (document_ids, matrix)"""
+    doc_ids = list(doc_ids)
+    rows = []
+    for start in range(0, len(doc_ids), chunk_size):
+        rows.extend(db.query(models.DocumentEmbedding.document_id, models.DocumentEmbedding.vector).filter(
+            models.DocumentEmbedding.document_id.in_(doc_ids[start:start + chunk_size])).all())
+    return [r[0] for r in rows], vector_store.stack([r[1] for r in rows])
+
+def count_embeddings_by_department(db: Session, department: str = None):
+    query = db.query(models.DocumentEmbedding.department, func.count(models.DocumentEmbedding.document_id))
+    if department is not None:
+        query = query.filter(models.DocumentEmbedding.department == department)
+    return dict(query.group_by(models.DocumentEmbedding.department).all())
+
+def get_documents_without_embeddings(db: Session):
+    return db.query(models.Document).outerjoin(
+        models.DocumentEmbedding,
+        models.DocumentEmbedding.document_id == models.Document.id
+    ).filter(models.DocumentEmbedding.document_id == None).all()
+
+def add_embeddings(db: Session, docs, embeddings):
+    for doc, embedding in zip(docs, embeddings):
+        db.add(models.DocumentEmbedding(
+            document_id=doc.id,
+            department=doc.department,
+            vector=vector_store.to_blob(embedding)
+        ))
+    db.commit()
+
+def get_job(db: Session, job_id: str):
+    return db.query(models.ProcessingJob).filter(models.ProcessingJob.id == job_id).first()
+
+def get_job_by_idempotency_key(db: Session, key: str):
+    return db.query(models.ProcessingJob).filter(models.ProcessingJob.idempotency_key == key).first()
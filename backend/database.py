@@ -1,14 +1,48 @@
-from sqlalchemy import create_engine
+from sqlalchemy import inspect, text, select, func
 from sqlalchemy.orm import sessionmaker
 from .models import Base, User, UserRole
+from .app.db.engine import make_engine
+from . import lexical_index
 import os
 
 DB_URL = os.getenv('DATABASE_URL', 'sqlite:///./kochi_metro_docs.db')
-engine = create_engine(DB_URL, connect_args={'check_same_thread': False} if 'sqlite' in DB_URL else {})
+engine = make_engine(DB_URL)  # WAL + busy timeout on SQLite, pooled on PostgreSQL
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+    upgrade_schema()
+    lexical_index.setup(engine)
+
+def upgrade_schema():
+    """Additive migrations for existing databases: missing nullable columns and indexes"""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            columns = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    ddl_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {ddl_type}'))
+    for table in Base.metadata.sorted_tables:
+        existing_indexes = {i['name'] for i in inspector.get_indexes(table.name)} if table.name in existing_tables else None
+        for index in table.indexes:
+            if index.unique and existing_indexes is not None and index.name not in existing_indexes:
+                drop_duplicates(index)
+            index.create(bind=engine, checkfirst=True)
+
+def drop_duplicates(index):
+    """Delete rows that would violate a new unique index, keeping the oldest of each group"""
+    table = index.table
+    pk = list(table.primary_key.columns)[0]
+    keep = select(func.min(pk)).group_by(*index.columns)
+    with engine.begin() as conn:
+        removed = conn.execute(table.delete().where(pk.not_in(keep))).rowcount
+    if removed:
+        print(f"Removed {removed} duplicate rows from {table.name} before adding {index.name}")
     
 def get_db():
     db = SessionLocal()
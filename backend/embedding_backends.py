@@ -0,0 +1,170 @@
+"""Pluggable sentence-embedding backends.
+
+``torch`` is the stock SentenceTransformer. ``onnx`` exports its transformer
+to ONNX and runs it through ONNX Runtime on CPU, and ``onnx-int8`` also
+applies dynamic int8 weight quantization. Mean pooling and normalization
+happen in numpy, so the ONNX encoders never import torch once exported.
+
+On first use an export is parity-checked against the PyTorch model: probe
+texts are scored against the concept descriptions with both encoders, and
+if any cosine score drifts by more than ``EMBED_PARITY_TOLERANCE`` the
+export is rejected and the torch backend is used. The measured error is
+stored next to the model files, so later loads skip torch entirely.
+"""
+import os, re, json
+import numpy as np
+
+BACKENDS = ('torch', 'onnx', 'onnx-int8')
+
+# Representative document sentences used for the parity check
+PARITY_PROBES = [
+    'Job card for replacement of worn brake pads on rolling stock unit 12 at Muttom depot.',
+    'Monthly payroll summary and leave attendance register for station staff.',
+    'Incident report: passenger slipped on the platform, first aid administered, area cordoned off.',
+    'Circular from the Commissioner of Metro Rail Safety regarding statutory inspection before commissioning.',
+    'Internal audit checklist for ISO 9001 quality documentation review.',
+    'Urgent: signalling failure between Aluva and Pulinchodu requires immediate action.',
+    'Submission deadline for the environmental compliance certificate is 30 June.',
+    'Minutes of the meeting on tender evaluation for escalator maintenance.',
+]
+
+class OnnxSentenceEncoder:
+    """ONNX Runtime encoder with the SentenceTransformer ``encode`` signature (mean pooling)"""
+
+    def __init__(self, session, tokenizer, max_seq_length: int):
+        self.session = session
+        self.tokenizer = tokenizer
+        self.max_seq_length = max_seq_length
+        self.input_names = [i.name for i in session.get_inputs()]
+
+    def _embed_batch(self, texts):
+        tokens = self.tokenizer(texts, padding=True, truncation=True,
+                                max_length=self.max_seq_length, return_tensors='np')
+        feeds = {name: tokens[name].astype(np.int64) for name in self.input_names if name in tokens}
+        if 'token_type_ids' in self.input_names and 'token_type_ids' not in feeds:
+            feeds['token_type_ids'] = np.zeros_like(feeds['input_ids'])
+        hidden = self.session.run(None, feeds)[0]
+        mask = tokens['attention_mask'][..., None].astype(np.float32)
+        return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        # Length-sorted batches keep padding (and wasted compute) small
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = np.zeros((len(texts), 0), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            ids = order[start:start + batch_size]
+            batch = self._embed_batch([texts[i] for i in ids]).astype(np.float32)
+            if vectors.shape[1] == 0:
+                vectors = np.zeros((len(texts), batch.shape[1]), dtype=np.float32)
+            vectors[ids] = batch
+        if normalize_embeddings:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms == 0, 1, norms)
+        return vectors[0] if single else vectors
+
+def _supports_onnx(st_model) -> bool:
+    """Only Transformer + mean Pooling models are reproduced by OnnxSentenceEncoder"""
+    modules = list(st_model)
+    if len(modules) != 2 or type(modules[0]).__name__ != 'Transformer':
+        return False
+    pooling = modules[1]
+    return type(pooling).__name__ == 'Pooling' and getattr(pooling, 'pooling_mode_mean_tokens', False)
+
+def export_onnx(st_model, path: str):
+    """Export the model's transformer to ONNX with dynamic batch and sequence axes"""
+    import torch
+    transformer = st_model[0].auto_model.eval()
+    sample = st_model.tokenizer(['export sample'], return_tensors='pt')
+    input_names = [n for n in ('input_ids', 'attention_mask', 'token_type_ids') if n in sample]
+    axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names + ['last_hidden_state']}
+    with torch.no_grad():
+        torch.onnx.export(transformer, tuple(sample[n] for n in input_names), path,
+                          input_names=input_names, output_names=['last_hidden_state'],
+                          dynamic_axes=axes, opset_version=14, do_constant_folding=True)
+
+def quantize(fp32_path: str, int8_path: str):
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+def open_session(path: str, threads: int = 0):
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads:
+        options.intra_op_num_threads = threads
+    return ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+
+def parity_error(reference, candidate, concept_texts) -> float:
+    """Largest absolute difference in probe-vs-concept cosine scores between two encoders"""
+    texts = PARITY_PROBES + list(concept_texts)
+    ref = reference.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    cand = candidate.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    n = len(PARITY_PROBES)
+    ref_scores = ref[:n] @ ref[n:].T
+    cand_scores = cand[:n] @ cand[n:].T
+    return float(np.abs(ref_scores - cand_scores).max())
+
+def load_sentence_encoder(backend: str, model_name: str, build_reference, concept_texts,
+                          cache_dir: str, tolerance: float = 0.02, threads: int = 0):
+    """Return an encoder for the configured backend, falling back to build_reference()"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+    if backend == 'torch':
+        return build_reference()
+
+    safe = re.sub(r'[^A-Za-z0-9_.-]', '_', model_name)
+    directory = os.path.join(cache_dir, safe)
+    model_path = os.path.join(directory, 'model-int8.onnx' if backend == 'onnx-int8' else 'model.onnx')
+    record_path = model_path + '.json'
+
+    try:
+        with open(record_path) as f:
+            record = json.load(f)
+        if record['error'] > tolerance:
+            print(f"ONNX backend '{backend}' failed parity earlier (error {record['error']:.4f}); using torch")
+            return build_reference()
+        from transformers import AutoTokenizer
+        return OnnxSentenceEncoder(open_session(model_path, threads),
+                                   AutoTokenizer.from_pretrained(directory), record['max_seq_length'])
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        # Corrupt record or model, missing onnxruntime, ORT load errors (RuntimeError subclasses)
+        print(f"Cached ONNX backend '{backend}' unusable, re-exporting: {e}")
+        for stale in {os.path.join(directory, 'model.onnx'), model_path, record_path}:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+    reference = build_reference()
+    try:
+        if not _supports_onnx(reference):
+            print(f"Model '{model_name}' does not use plain mean pooling; ONNX backend unavailable")
+            return reference
+        os.makedirs(directory, exist_ok=True)
+        fp32_path = os.path.join(directory, 'model.onnx')
+        if not os.path.exists(fp32_path):
+            export_onnx(reference, fp32_path)
+        if backend == 'onnx-int8':
+            quantize(fp32_path, model_path)
+        reference.tokenizer.save_pretrained(directory)
+        candidate = OnnxSentenceEncoder(open_session(model_path, threads), reference.tokenizer,
+                                        reference.max_seq_length)
+        error = parity_error(reference, candidate, concept_texts)
+    except Exception as e:
+        print(f"ONNX export failed, using torch backend: {e}")
+        return reference
+
+    passed = error <= tolerance
+    try:
+        with open(record_path, 'w') as f:
+            json.dump({'backend': backend, 'error': error, 'max_seq_length': reference.max_seq_length}, f)
+    except OSError as e:
+        print(f"Could not record ONNX parity result at {record_path}: {e}")
+    print(f"ONNX backend '{backend}' parity error {error:.4f} (tolerance {tolerance}): "
+          f"{'using ONNX Runtime' if passed else 'using torch'}")
+    return candidate if passed else reference
@@ -0,0 +1,133 @@
+"""Text extraction engine.
+
+PDF pages are produced by a generator, in page order. Large PDFs are split
+into page ranges that are extracted in a shared process pool, so one
+400-page manual uses every core instead of one. Results keep their page
+boundaries (``ExtractedText.pages`` / ``page_offsets``) so later stages can
+work page by page. Pages without a text layer (scans) and image uploads go
+through the OCR stage in ``ocr``.
+"""
+import os, threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from . import ocr, metrics
+from .app.config import get_settings
+
+settings = get_settings()
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tiff', '.tif', '.bmp')
+
+class ExtractedText:
+    """Page texts of one document plus the joined text and page start offsets"""
+
+    def __init__(self, pages):
+        self.pages = list(pages)
+        self._text = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = ''.join(self.pages)
+        return self._text
+
+    @property
+    def page_offsets(self):
+        """Character offset in ``text`` where each page starts"""
+        offsets, position = [], 0
+        for page in self.pages:
+            offsets.append(position)
+            position += len(page)
+        return offsets
+
+    def __bool__(self):
+        return any(p.strip() for p in self.pages)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: workers must not inherit model weights or torch thread pools
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.PDF_EXTRACTION_PROCESSES or max(1, (os.cpu_count() or 2) // 2),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pool
+
+def _extract_page_range(filepath: str, start: int, stop: int):
+    """Worker: text of pages [start, stop)"""
+    return list(iter_pdf_pages(filepath, start, stop))
+
+def iter_pdf_pages(filepath: str, start: int = 0, stop: int = None):
+    """Yield page texts sequentially"""
+    import fitz  # pymupdf
+    with fitz.open(filepath) as doc:
+        stop = doc.page_count if stop is None else min(stop, doc.page_count)
+        for number in range(start, stop):
+            yield doc.load_page(number).get_text()
+
+def pdf_page_count(filepath: str) -> int:
+    import fitz  # pymupdf
+    with fitz.open(filepath) as doc:
+        return doc.page_count
+
+def stream_pdf_pages(filepath: str):
+    """Yield page texts in order, fanning page ranges out to the process pool for large PDFs"""
+    page_count = pdf_page_count(filepath)
+    if page_count < settings.PDF_PARALLEL_MIN_PAGES:
+        yield from iter_pdf_pages(filepath)
+        return
+    pool = _get_pool()
+    span = max(settings.PDF_PAGES_PER_TASK, 1)
+    futures = [pool.submit(_extract_page_range, filepath, start, min(start + span, page_count))
+               for start in range(0, page_count, span)]
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+def extract_document(filepath: str) -> ExtractedText:
+    """Extract page texts from a PDF, image (OCR) or plain text file"""
+    file_lower = filepath.lower()
+    pages = []
+
+    # Try PDF extraction first
+    if file_lower.endswith('.pdf'):
+        try:
+            pages = list(stream_pdf_pages(filepath))
+        except Exception as e:
+            print(f"PDF extraction failed: {e}")
+            pages = []
+        # Scanned pages: no usable text layer, OCR the rendered page instead
+        scanned = [i for i, p in enumerate(pages) if len(p.strip()) < settings.OCR_MIN_TEXT_CHARS]
+        if scanned and settings.OCR_ENABLED:
+            try:
+                with metrics.stage('ocr', pages=len(scanned)):
+                    texts = ocr.ocr_pdf_pages(filepath, scanned)
+                for i, text in zip(scanned, texts):
+                    if len(text.strip()) > len(pages[i].strip()):
+                        pages[i] = text
+            except Exception as e:
+                print(f"OCR extraction failed: {e}")
+
+    # OCR image files
+    if not any(p.strip() for p in pages) and file_lower.endswith(IMAGE_EXTENSIONS) and settings.OCR_ENABLED:
+        try:
+            with metrics.stage('ocr', pages=1):
+                pages = [ocr.ocr_image(filepath)]
+        except Exception as e:
+            print(f"OCR extraction failed: {e}")
+
+    # Fallback: try reading as text
+    if not any(p.strip() for p in pages):
+        try:
+            with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
+                pages = [f.read()]
+        except Exception:
+            pages = []
+
+    return ExtractedText(pages)
@@ -0,0 +1,343 @@
+"""Durable, database-backed processing queue for uploaded documents.
+
+Uploads are recorded as ``ProcessingJob`` rows and picked up by a bounded
+pool of worker threads, so OCR, summarization and embedding no longer run
+while the HTTP request is held open. Jobs are claimed with a conditional
+UPDATE, which keeps claiming safe across threads and uvicorn worker
+processes sharing the same database. Failed jobs are retried with
+exponential backoff. Running jobs hold a lease that a side thread renews
+while they are processed; jobs left ``running`` by a crashed process are
+requeued once it expires, which counts as an attempt. Each claim carries
+a token, and results are only saved while the job is still running under
+that token, so a job requeued behind a slow worker is never saved twice.
+"""
+import json, threading, uuid
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from . import database, models, schemas, crud, processor, search_index, analysis_cache, write_behind, metrics, profiling
+from .app.config import get_settings
+
+settings = get_settings()
+
+def analyze_jobs(db: Session, claimed):
+    """Content analyses for claimed jobs, reusing cached results for known file hashes"""
+    use_cache = settings.DEDUP_CACHE_ENABLED
+    analyses = [None] * len(claimed)
+    pending = {}  # content key -> job positions, so duplicates within a batch run once
+    for i, job in enumerate(claimed):
+        if use_cache and job.content_hash:
+            analyses[i] = analysis_cache.lookup(db, job.content_hash)
+            if analyses[i] is not None:
+                print(f"Reusing cached analysis for {job.filename} ({job.content_hash[:12]})")
+                continue
+        pending.setdefault(job.content_hash or job.filepath, []).append(i)
+    if pending:
+        firsts = [positions[0] for positions in pending.values()]
+        with metrics.stage('analysis', documents=len(firsts)):
+            fresh = processor.analyze_documents([claimed[i].filepath for i in firsts])
+        for positions, analysis in zip(pending.values(), fresh):
+            for i in positions:
+                analyses[i] = analysis
+            content_hash = claimed[positions[0]].content_hash
+            if use_cache and content_hash:
+                analysis_cache.store(db, content_hash, analysis)
+    return analyses
+
+# Optional shared writer: document writes of all workers committed together
+writer = write_behind.WriteBehindBatcher(
+    database.SessionLocal, settings.WRITE_BEHIND_INTERVAL_MS, settings.WRITE_BEHIND_MAX_BATCH
+) if settings.WRITE_BEHIND_ENABLED else None
+
+def save_results(db: Session, claims, documents, embeddings, profile_ids=None, search_texts=None):
+    """Insert documents (with alerts and counters) and mark their jobs succeeded.
+
+    claims are (job_id, claim_token) pairs. A job that is no longer running
+    under its token (lease expired, requeued or failed meanwhile) is skipped.
+    Returns [(doc_id, department, embedding)] for the documents inserted.
+    """
+    saved = []
+    for i, ((job_id, token), document, embedding) in enumerate(zip(claims, documents, embeddings)):
+        held = db.query(models.ProcessingJob).filter(
+            models.ProcessingJob.id == job_id,
+            models.ProcessingJob.status == models.JobStatus.RUNNING,
+            models.ProcessingJob.claim_token == token
+        ).update({
+            models.ProcessingJob.status: models.JobStatus.SUCCEEDED,
+            models.ProcessingJob.error: None,
+            models.ProcessingJob.profile_id: profile_ids[i] if profile_ids else None,
+            models.ProcessingJob.updated_at: datetime.utcnow()
+        }, synchronize_session=False)
+        if not held:
+            print(f"Job {job_id} lost its lease, discarding its result")
+            continue
+        doc = crud.create_document(db, document, embedding=embedding,
+                                   search_text=search_texts[i] if search_texts else None, commit=False)
+        db.query(models.ProcessingJob).filter(models.ProcessingJob.id == job_id).update(
+            {models.ProcessingJob.document_id: doc.id}, synchronize_session=False)
+        saved.append((doc.id, doc.department, embedding))
+    return saved
+
+def run_jobs(db: Session, claimed):
+    """Process claimed jobs as one batch, under the sampling profiler if an admin asked for it"""
+    if not any(job.profile_requested for job in claimed):
+        return process_jobs(db, claimed)
+    job_ids = [job.id for job in claimed]
+    filenames = [job.filename for job in claimed]
+    profiler = profiling.SamplingProfiler()
+    try:
+        with profiler:
+            process_jobs(db, claimed, profile_id=profiler.id)
+    finally:
+        profiling.save(profiler, kind='job', jobs=job_ids, files=filenames)
+        print(f"Stored profile {profiler.id} for jobs {', '.join(job_ids)}")
+
+def process_jobs(db: Session, claimed, profile_id: str = None):
+    """Process claimed jobs as one batch and persist all documents in one transaction"""
+    results = [processor.apply_filing(a, job.department)
+               for a, job in zip(analyze_jobs(db, claimed), claimed)]
+    claims = [(job.id, job.claim_token) for job in claimed]
+    documents = [schemas.DocumentCreate(
+        filename=job.filename,
+        department=job.department,
+        predicted_department=result['predicted_department'],
+        confidence=result['confidence'],
+        summary=result['summary'],
+        semantic_alerts=json.dumps(result['semantic_alerts']),
+        section_scores=json.dumps(result.get('section_scores', [])),
+        is_misfiled=result['is_misfiled'],
+        flag_reason=result.get('flag_reason',''),
+        original_text=result.get('original_text',''),
+        translated_text=result.get('translated_text',''),
+        filepath=job.filepath,
+        uploaded_by=job.uploaded_by
+    ) for job, result in zip(claimed, results)]
+    embeddings = [result['embedding'] for result in results]
+    search_texts = [result.get('search_text') for result in results]
+    profile_ids = [profile_id if job.profile_requested else None for job in claimed] if profile_id else None
+    with metrics.stage('persist', documents=len(documents)):
+        if writer is not None:
+            db.commit()  # analysis cache entries
+            saved = writer.submit(lambda wdb: save_results(wdb, claims, documents, embeddings, profile_ids, search_texts)).result()
+        else:
+            saved = save_results(db, claims, documents, embeddings, profile_ids, search_texts)
+            db.commit()
+    with metrics.stage('index_add', documents=len(saved)):
+        search_index.index.add_many(saved)
+
+class Lease:
+    """Keeps claimed jobs' lease alive from a side thread while they are processed"""
+
+    def __init__(self, session_factory, job_ids, token: str, interval: float):
+        self.session_factory = session_factory
+        self.job_ids = list(job_ids)
+        self.token = token
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def renew(self):
+        """Push updated_at forward for jobs still running under this claim; returns how many"""
+        db = self.session_factory()
+        try:
+            renewed = db.query(models.ProcessingJob).filter(
+                models.ProcessingJob.id.in_(self.job_ids),
+                models.ProcessingJob.status == models.JobStatus.RUNNING,
+                models.ProcessingJob.claim_token == self.token
+            ).update({'updated_at': datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+            return renewed
+        finally:
+            db.close()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.renew()
+            except Exception as e:
+                print(f"Lease renewal failed: {e}")
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self._run, name='job-lease', daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+
+class JobQueue:
+    """Bounded pool of worker threads draining the processing_jobs table"""
+
+    def __init__(self, session_factory, workers: int, poll_interval: float, batch_size: int = 1):
+        self.session_factory = session_factory
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.poll_interval = poll_interval
+        self.lease_renewal = settings.JOB_LEASE_SECONDS / 3
+        self.threads = []
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+
+    def _new_job(self, filename: str, filepath: str, department: str, uploaded_by: str,
+                 idempotency_key: str = None, content_hash: str = None, profile: bool = False):
+        return models.ProcessingJob(
+            id=uuid.uuid4().hex,
+            idempotency_key=idempotency_key,
+            status=models.JobStatus.QUEUED,
+            filename=filename,
+            filepath=filepath,
+            content_hash=content_hash,
+            department=department,
+            uploaded_by=uploaded_by,
+            max_attempts=settings.JOB_MAX_ATTEMPTS,
+            profile_requested=profile
+        )
+
+    def enqueue_batch(self, db: Session, files, department: str, uploaded_by: str, profile: bool = False):
+        """Queue [(filename, filepath, content_hash)] in one commit so workers can claim them together"""
+        batch = [self._new_job(filename, filepath, department, uploaded_by, content_hash=content_hash, profile=profile)
+                 for filename, filepath, content_hash in files]
+        db.add_all(batch)
+        db.commit()
+        for job in batch:
+            db.refresh(job)
+        self.wakeup.set()
+        return batch
+
+    def enqueue(self, db: Session, filename: str, filepath: str, department: str,
+                uploaded_by: str, idempotency_key: str = None, content_hash: str = None, profile: bool = False):
+        job = self._new_job(filename, filepath, department, uploaded_by, idempotency_key, content_hash, profile)
+        db.add(job)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Concurrent retry with the same idempotency key won the race
+            db.rollback()
+            existing = crud.get_job_by_idempotency_key(db, idempotency_key) if idempotency_key else None
+            if existing is None:
+                raise
+            return existing
+        db.refresh(job)
+        self.wakeup.set()
+        return job
+
+    def start(self):
+        if self.threads:
+            return
+        self.stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        print(f"✓ Processing queue started with {self.workers} workers")
+
+    def stop(self, timeout: float = 5.0):
+        self.stopping.set()
+        self.wakeup.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def _requeue_expired(self, db: Session):
+        """Return jobs whose worker died mid-run to the queue, or fail them once out of attempts"""
+        now = datetime.utcnow()
+        expired = (
+            models.ProcessingJob.status == models.JobStatus.RUNNING,
+            models.ProcessingJob.updated_at < now - timedelta(seconds=settings.JOB_LEASE_SECONDS)
+        )
+        # The expired run was counted as an attempt when it was claimed
+        db.query(models.ProcessingJob).filter(
+            *expired, models.ProcessingJob.attempts >= models.ProcessingJob.max_attempts
+        ).update({
+            'status': models.JobStatus.FAILED,
+            'claim_token': None,
+            'error': 'Lease expired: worker stopped or took longer than JOB_LEASE_SECONDS',
+            'updated_at': now
+        }, synchronize_session=False)
+        db.query(models.ProcessingJob).filter(*expired).update({
+            'status': models.JobStatus.QUEUED,
+            'claim_token': None,
+            'updated_at': now
+        }, synchronize_session=False)
+        db.commit()
+
+    def _claim(self, db: Session):
+        """Atomically claim up to batch_size queued jobs under one fresh claim token"""
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+        candidates = db.query(models.ProcessingJob.id).filter(
+            models.ProcessingJob.status == models.JobStatus.QUEUED,
+            models.ProcessingJob.available_at <= now
+        ).order_by(models.ProcessingJob.available_at).limit(self.batch_size).all()
+        claimed = []
+        for (job_id,) in candidates:
+            updated = db.query(models.ProcessingJob).filter(
+                models.ProcessingJob.id == job_id,
+                models.ProcessingJob.status == models.JobStatus.QUEUED
+            ).update({
+                'status': models.JobStatus.RUNNING,
+                'attempts': models.ProcessingJob.attempts + 1,
+                'claim_token': token,
+                'updated_at': now
+            }, synchronize_session=False)
+            if updated:
+                claimed.append(job_id)
+        db.commit()
+        return [crud.get_job(db, job_id) for job_id in claimed]
+
+    def _fail(self, db: Session, job_id: str, token: str, error: Exception):
+        db.rollback()
+        job = crud.get_job(db, job_id)
+        if job.status != models.JobStatus.RUNNING or job.claim_token != token:
+            print(f"Job {job_id} failed after losing its lease: {error}")
+            return
+        job.claim_token = None
+        job.error = f'{type(error).__name__}: {error}'
+        job.updated_at = datetime.utcnow()
+        if job.attempts < job.max_attempts:
+            delay = settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+            job.status = models.JobStatus.QUEUED
+            job.available_at = datetime.utcnow() + timedelta(seconds=delay)
+            print(f"Job {job_id} failed (attempt {job.attempts}), retrying in {delay:.0f}s: {error}")
+        else:
+            job.status = models.JobStatus.FAILED
+            print(f"Job {job_id} failed permanently: {error}")
+        db.commit()
+
+    def _worker(self):
+        while not self.stopping.is_set():
+            db = self.session_factory()
+            try:
+                self._requeue_expired(db)
+                claimed = self._claim(db)
+                if not claimed:
+                    self.wakeup.wait(self.poll_interval)
+                    self.wakeup.clear()
+                    continue
+                job_ids = [job.id for job in claimed]
+                token = claimed[0].claim_token
+                with Lease(self.session_factory, job_ids, token, self.lease_renewal):
+                    try:
+                        run_jobs(db, claimed)
+                    except Exception as e:
+                        if len(job_ids) == 1:
+                            self._fail(db, job_ids[0], token, e)
+                            continue
+                        # Isolate the bad file: retry the batch one job at a time
+                        print(f"Batch of {len(job_ids)} jobs failed, processing individually: {e}")
+                        db.rollback()
+                        for job_id in job_ids:
+                            try:
+                                run_jobs(db, [crud.get_job(db, job_id)])
+                            except Exception as e:
+                                self._fail(db, job_id, token, e)
+            except Exception as e:
+                print(f"Processing queue error: {e}")
+                self.stopping.wait(self.poll_interval)
+            finally:
+                db.close()
+
+
+queue = JobQueue(database.SessionLocal, settings.JOB_WORKERS, settings.JOB_POLL_INTERVAL_SECONDS,
+                 batch_size=settings.JOB_BATCH_SIZE)
@@ -0,0 +1,148 @@
+"""Lexical (keyword) index over document text.
+
+On SQLite this is an FTS5 external-content table, ``documents_fts``, over
+filename, summary and ``search_text``, the full extracted (and translated)
+text; ``original_text``/``translated_text`` keep only the first 2,000
+characters for display, so identifiers deep inside long documents would
+otherwise never match. Triggers on
+``documents`` keep it in sync inside the same transaction as every insert,
+update and delete, and queries are ranked with BM25 (filename matches
+weigh most). On PostgreSQL an expression GIN index over a ``simple``
+tsvector serves the same queries with ``ts_rank_cd``. Other databases fall
+back to a LIKE scan.
+
+Queries are split into terms and every term is matched as a phrase, so
+identifiers such as ``WO-2024-113`` or ``KMRL/CIR/45`` match exactly
+without FTS query syntax errors.
+"""
+import re
+from sqlalchemy import text, or_
+from sqlalchemy.orm import Session
+from . import models
+
+FTS_TABLE = 'documents_fts'
+INDEXED_COLUMNS = ('filename', 'summary', 'search_text')
+BM25_WEIGHTS = (10.0, 2.0, 1.0)  # per INDEXED_COLUMNS
+PG_INDEX = 'ix_documents_fts_full'
+LEGACY_PG_INDEXES = ('ix_documents_fts',)  # built over the truncated text columns
+TERM = re.compile(r'\w+(?:[-/.:]\w+)*', re.UNICODE)
+
+_SQLITE_TRIGGERS = {
+    'documents_fts_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS documents_fts_ai AFTER INSERT ON documents BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, {', '.join(INDEXED_COLUMNS)})
+            VALUES (new.id, {', '.join('new.' + c for c in INDEXED_COLUMNS)});
+        END""",
+    'documents_fts_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS documents_fts_ad AFTER DELETE ON documents BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {', '.join(INDEXED_COLUMNS)})
+            VALUES ('delete', old.id, {', '.join('old.' + c for c in INDEXED_COLUMNS)});
+        END""",
+    'documents_fts_au': f"""
+        CREATE TRIGGER IF NOT EXISTS documents_fts_au AFTER UPDATE ON documents BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {', '.join(INDEXED_COLUMNS)})
+            VALUES ('delete', old.id, {', '.join('old.' + c for c in INDEXED_COLUMNS)});
+            INSERT INTO {FTS_TABLE}(rowid, {', '.join(INDEXED_COLUMNS)})
+            VALUES (new.id, {', '.join('new.' + c for c in INDEXED_COLUMNS)});
+        END""",
+}
+
+_PG_DOCUMENT = ("to_tsvector('simple', " +
+                " || ' ' || ".join(f"coalesce({c}, '')" for c in INDEXED_COLUMNS) + ")")
+
+_backend = None  # 'fts5', 'postgresql' or 'like', set by setup()
+
+def _backfill_search_text(conn):
+    """Documents stored before search_text existed only have their truncated text"""
+    conn.execute(text(
+        "UPDATE documents SET search_text = trim(coalesce(original_text, '') || ' ' || coalesce(translated_text, '')) "
+        "WHERE search_text IS NULL"
+    ))
+
+def setup(engine):
+    """Create the lexical index for this database (idempotent), rebuilding it when new"""
+    global _backend
+    dialect = engine.dialect.name
+    if dialect == 'sqlite':
+        try:
+            with engine.begin() as conn:
+                _backfill_search_text(conn)
+                existing = conn.execute(text(
+                    "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"
+                ), {'name': FTS_TABLE}).scalar()
+                exists = existing is not None and all(c in existing for c in INDEXED_COLUMNS)
+                if existing is not None and not exists:
+                    # Index predates search_text: recreate it over the current columns
+                    for trigger in _SQLITE_TRIGGERS:
+                        conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+                    conn.execute(text(f"DROP TABLE {FTS_TABLE}"))
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                    f"{', '.join(INDEXED_COLUMNS)}, content='documents', content_rowid='id', "
+                    f"tokenize='unicode61 remove_diacritics 2')"
+                ))
+                for ddl in _SQLITE_TRIGGERS.values():
+                    conn.execute(text(ddl))
+                if not exists:
+                    conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+            _backend = 'fts5'
+            return _backend
+        except Exception as e:
+            print(f"FTS5 unavailable, lexical search will scan: {e}")
+    elif dialect == 'postgresql':
+        with engine.begin() as conn:
+            _backfill_search_text(conn)
+            for legacy in LEGACY_PG_INDEXES:
+                conn.execute(text(f"DROP INDEX IF EXISTS {legacy}"))
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON documents USING GIN ({_PG_DOCUMENT})"))
+        _backend = 'postgresql'
+        return _backend
+    _backend = 'like'
+    return _backend
+
+def rebuild(db: Session):
+    """Re-index every document (after bulk loads that bypassed the triggers)"""
+    if _backend == 'fts5':
+        db.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        db.commit()
+
+def query_terms(q: str):
+    return TERM.findall(q or '')
+
+def search(db: Session, q: str, department: str = None, k: int = 10):
+    """Return [(doc_id, score)] best first; higher scores are better"""
+    terms = query_terms(q)
+    if not terms:
+        return []
+    if _backend == 'fts5':
+        match = ' OR '.join('"' + term.replace('"', '""') + '"' for term in terms)
+        weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+        sql = (f"SELECT d.id, bm25({FTS_TABLE}, {weights}) AS rank FROM {FTS_TABLE} "
+               f"JOIN documents d ON d.id = {FTS_TABLE}.rowid WHERE {FTS_TABLE} MATCH :match")
+        params = {'match': match, 'k': k}
+        if department is not None:
+            sql += " AND d.department = :department"
+            params['department'] = department
+        rows = db.execute(text(sql + " ORDER BY rank LIMIT :k"), params).all()
+        return [(int(doc_id), -float(rank)) for doc_id, rank in rows]
+    if _backend == 'postgresql':
+        sql = (f"SELECT id, ts_rank_cd({_PG_DOCUMENT}, query) AS rank FROM documents, "
+               f"to_tsquery('simple', :tsquery) AS query WHERE {_PG_DOCUMENT} @@ query")
+        tsquery = ' | '.join('(' + ' <-> '.join("'" + part.replace("'", "''") + "'" for part in re.findall(r'\w+', term)) + ')'
+                             for term in terms)
+        params = {'tsquery': tsquery, 'k': k}
+        if department is not None:
+            sql += " AND department = :department"
+            params['department'] = department
+        rows = db.execute(text(sql + " ORDER BY rank DESC LIMIT :k"), params).all()
+        return [(int(doc_id), float(rank)) for doc_id, rank in rows]
+
+    # LIKE fallback: filename matches first, then text matches, newest first
+    query = db.query(models.Document.id, models.Document.filename)
+    if department is not None:
+        query = query.filter(models.Document.department == department)
+    conditions = [getattr(models.Document, column).ilike(f'%{term}%') for term in terms for column in INDEXED_COLUMNS]
+    rows = query.filter(or_(*conditions)).order_by(models.Document.created_at.desc()).limit(k).all()
+    lowered = [t.lower() for t in terms]
+    scored = [(doc_id, float(sum(t in (filename or '').lower() for t in lowered))) for doc_id, filename in rows]
+    return sorted(scored, key=lambda h: h[1], reverse=True)
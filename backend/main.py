@@ -1,18 +1,33 @@
-from fastapi import FastAPI, Depends, UploadFile, File, HTTPException, Form, Header
+from fastapi import FastAPI, Depends, UploadFile, File, HTTPException, Form, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, FileResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-import shutil, os, uuid, json
+import threading
 from typing import Optional
 from dotenv import load_dotenv
 
 # Load environment variables FIRST
 load_dotenv()
 
-from . import database, models, schemas, crud, auth, processor
+from . import database, models, schemas, crud, auth, processor, search_index, lexical_index, jobs, uploads, metrics, profiling
+from .model_registry import registry
+from .app.config import get_settings
+
+settings = get_settings()
 
 app = FastAPI(title='Kochi Metro Rail - Document Intelligence System')
 
+# Reject oversized upload bodies before the multipart form is parsed
+# (added before CORS, so CORS wraps it and its 413s stay readable in the browser)
+app.add_middleware(
+    uploads.UploadLimitMiddleware,
+    limits={
+        '/documents/upload': uploads.max_file_bytes() + uploads.MULTIPART_OVERHEAD,
+        '/documents/batch-upload': settings.MAX_BATCH_UPLOAD_MB * 1024 * 1024,
+    }
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=['*'],
@@ -21,9 +36,15 @@ app.add_middleware(
     allow_headers=['*'],
 )
 
+# Request latency, in-flight requests and SQL statement counts (outermost, so it times everything)
+metrics.setup(app)
+
 @app.on_event('startup')
 def startup():
     database.init_db()
+    # Start loading models in the background so the port opens immediately
+    if settings.MODEL_WARMUP:
+        registry.warm_up(settings.MODEL_WARMUP_MODELS)
     # Create initial admin from environment variables (first run only)
     db = database.SessionLocal()
     try:
@@ -36,6 +57,82 @@ def startup():
         print(f"Error creating admin: {e}")
     finally:
         db.close()
+    backfill_counters()
+    threading.Thread(target=backfill_alerts, name='alert-backfill', daemon=True).start()
+    threading.Thread(target=prepare_search_index, name='search-index', daemon=True).start()
+    jobs.queue.start()
+
+@app.on_event('shutdown')
+def shutdown():
+    jobs.queue.stop()
+    search_index.index.save()
+
+def prepare_search_index():
+    """Embed legacy documents and load the ANN index (searches fall back to an exact scan meanwhile)"""
+    db = database.SessionLocal()
+    try:
+        backfill_embeddings(db)
+        search_index.index.load(db)
+    except Exception as e:
+        print(f"Error preparing search index: {e}")
+    finally:
+        db.close()
+
+def backfill_counters():
+    """Build dashboard counters for databases that predate them (one-off, single GROUP BY)"""
+    db = database.SessionLocal()
+    try:
+        if db.query(models.DocumentCounter).first() is None and db.query(models.Document.id).first() is not None:
+            print(f"✓ Built dashboard counters for {crud.rebuild_counters(db)} department-days")
+    except Exception as e:
+        db.rollback()
+        print(f"Error building dashboard counters: {e}")
+    finally:
+        db.close()
+
+def backfill_alerts():
+    """Normalize alerts of documents stored before the alerts table existed (one-off)"""
+    db = database.SessionLocal()
+    try:
+        count = crud.backfill_alerts(db)
+        if count:
+            print(f"✓ Backfilled alerts for {count} documents")
+    except Exception as e:
+        print(f"Error backfilling alerts: {e}")
+    finally:
+        db.close()
+
+def backfill_embeddings(db: Session):
+    """Embed documents stored before embeddings were persisted (one-off)"""
+    docs = crud.get_documents_without_embeddings(db)
+    if not docs:
+        return
+    print(f"Computing embeddings for {len(docs)} existing documents...")
+    texts = [d.translated_text or d.original_text or d.summary for d in docs]
+    crud.add_embeddings(db, docs, processor.compute_embeddings(texts))
+
+@app.get('/metrics', include_in_schema=False)
+def prometheus_metrics():
+    exposition = metrics.render()
+    if exposition is None:
+        raise HTTPException(status_code=404, detail='Metrics are disabled')
+    body, content_type = exposition
+    return Response(content=body, media_type=content_type)
+
+@app.get('/health/live')
+def health_live():
+    return {'status': 'ok'}
+
+@app.get('/health/ready')
+def health_ready():
+    """Ready once every warm-up model is loaded; reports per-model state"""
+    models_status = registry.status()
+    required = settings.MODEL_WARMUP_MODELS if settings.MODEL_WARMUP else []
+    ready = all(registry.is_ready(name) for name in required)
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={'status': 'ready' if ready else 'loading', 'models': models_status}
+    )
 
 # Dependency to get current user from JWT
 def get_current_user(authorization: Optional[str] = Header(None), db: Session = Depends(database.get_db)):
@@ -43,12 +140,12 @@ def get_current_user(authorization: Optional[str] = Header(None), db: Session =
         raise HTTPException(status_code=401, detail='Not authenticated')
     
     token = authorization.split(' ')[1]
-    payload = auth.decode_token(token)
+    payload = auth.verify_token(token)
     if not payload:
         raise HTTPException(status_code=401, detail='Invalid token')
     
     username = payload.get('sub')
-    user = db.query(models.User).filter(models.User.username == username).first()
+    user = auth.get_user(db, username)  # cached snapshot; see auth.user_cache
     if not user:
         raise HTTPException(status_code=401, detail='User not found')
     
@@ -62,6 +159,11 @@ def require_role(required_roles: list):
         return current_user
     return role_checker
 
+# Admin opt-in to the sampling profiler; the flag is ignored for other roles
+def profiling_requested(request: Request, current_user: models.User = Depends(get_current_user)):
+    flag = request.headers.get('x-profile') or request.query_params.get('profile')
+    return profiling.requested(flag) and current_user.role == models.UserRole.ADMIN
+
 @app.post('/auth/login', response_model=schemas.Token)
 def login(username: str = Form(...), password: str = Form(...), db: Session = Depends(database.get_db)):
     user = auth.authenticate_user(db, username, password)
@@ -70,6 +172,27 @@ def login(username: str = Form(...), password: str = Form(...), db: Session = De
     token = auth.create_access_token({'sub': user.username, 'role': user.role.value})
     return {'access_token': token, 'token_type': 'bearer', 'role': user.role.value, 'username': user.username}
 
+@app.get('/admin/auth-cache')
+def auth_cache_stats(current_user: models.User = Depends(require_role(['admin']))):
+    """Hit/miss counters of the token and user caches"""
+    return auth.cache_stats()
+
+@app.get('/admin/profiles')
+def list_profiles(
+    limit: int = Query(50, ge=1, le=500),
+    current_user: models.User = Depends(require_role(['admin']))
+):
+    """Stored request and job profiles, newest first"""
+    return profiling.list_profiles(limit)
+
+@app.get('/admin/profiles/{profile_id}')
+def download_profile(profile_id: str, current_user: models.User = Depends(require_role(['admin']))):
+    """Collapsed stacks (flamegraph.pl / speedscope input)"""
+    path = profiling.profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail='Profile not found')
+    return FileResponse(path, media_type='text/plain', filename=f'profile-{profile_id}.folded')
+
 @app.get('/auth/me')
 def get_me(current_user: models.User = Depends(get_current_user)):
     return {
@@ -78,54 +201,88 @@ def get_me(current_user: models.User = Depends(get_current_user)):
         'department': current_user.department
     }
 
-@app.post('/documents/upload', response_model=schemas.DocumentOut)
-def upload_document(
+@app.post('/documents/upload', response_model=schemas.JobOut, status_code=202)
+async def upload_document(
     department: str = Form(...),
     file: UploadFile = File(...),
+    idempotency_key: Optional[str] = Header(None),
     current_user: models.User = Depends(get_current_user),
+    profile: bool = Depends(profiling_requested),
     db: Session = Depends(database.get_db)
 ):
-    # save file
-    upload_dir = os.path.join(os.getcwd(), 'uploaded_files')
-    os.makedirs(upload_dir, exist_ok=True)
-    filename = f"{uuid.uuid4().hex}_{file.filename}"
-    filepath = os.path.join(upload_dir, filename)
-    with open(filepath, 'wb') as f:
-        shutil.copyfileobj(file.file, f)
+    # Retried uploads with the same Idempotency-Key return the original job
+    if idempotency_key:
+        idempotency_key = f"{current_user.username}:{idempotency_key}"
+        existing = await run_in_threadpool(crud.get_job_by_idempotency_key, db, idempotency_key)
+        if existing:
+            return existing
     
-    # process with improved accuracy
-    result = processor.process_document(filepath, department)
+    # save file (streamed in chunks, size/type checked and hashed on the way;
+    # identical content is stored once)
+    filepath, content_hash = await uploads.save_upload(file)
     
-    # persist
-    doc = crud.create_document(db, schemas.DocumentCreate(
+    # queue for background processing; poll /jobs/{id} for the result
+    # (and its profile_id, when an admin asked for a profile)
+    return await run_in_threadpool(
+        jobs.queue.enqueue,
+        db,
         filename=file.filename,
-        department=department,
-        predicted_department=result['predicted_department'],
-        confidence=result['confidence'],
-        summary=result['summary'],
-        semantic_alerts=json.dumps(result['semantic_alerts']),
-        is_misfiled=result['is_misfiled'],
-        flag_reason=result.get('flag_reason',''),
-        original_text=result.get('original_text',''),
-        translated_text=result.get('translated_text',''),
         filepath=filepath,
-        uploaded_by=current_user.username
-    ))
-    return doc
+        department=department,
+        uploaded_by=current_user.username,
+        idempotency_key=idempotency_key,
+        content_hash=content_hash,
+        profile=profile
+    )
+
+@app.post('/documents/batch-upload', response_model=list[schemas.JobOut], status_code=202)
+async def batch_upload_documents(
+    department: str = Form(...),
+    files: list[UploadFile] = File(...),
+    current_user: models.User = Depends(get_current_user),
+    profile: bool = Depends(profiling_requested),
+    db: Session = Depends(database.get_db)
+):
+    """Queue many files at once; workers extract them concurrently and run
+    embedding and summarization over the whole batch"""
+    for file in files:
+        uploads.check_extension(file.filename)
+    saved = [(file.filename, *await uploads.save_upload(file)) for file in files]
+    return await run_in_threadpool(jobs.queue.enqueue_batch, db, saved, department, current_user.username, profile)
+
+@app.get('/jobs/{job_id}', response_model=schemas.JobOut)
+def get_job(
+    job_id: str,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    job = crud.get_job(db, job_id)
+    if not job:
+        raise HTTPException(404, 'Job not found')
+    
+    # RBAC: Users can only follow their own uploads
+    if current_user.role == models.UserRole.USER and job.uploaded_by != current_user.username:
+        raise HTTPException(403, 'Access denied')
+    
+    return job
 
-@app.get('/documents', response_model=list[schemas.DocumentOut])
+@app.get('/documents', response_model=schemas.DocumentPage)
 def list_documents(
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    department: Optional[str] = None,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(database.get_db)
 ):
+    """Documents newest first; pass next_cursor back as cursor for the following page"""
     # RBAC: Users see only their department docs, Reviewers/Admins see all
     if current_user.role == models.UserRole.USER:
-        docs = db.query(models.Document).filter(
-            models.Document.department == current_user.department
-        ).all()
-    else:
-        docs = crud.get_documents(db)
-    return docs
+        department = current_user.department
+    try:
+        docs, next_cursor = crud.get_documents_page(db, limit, cursor=cursor, department=department)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return {'items': docs, 'next_cursor': next_cursor}
 
 @app.get('/documents/{doc_id}', response_model=schemas.DocumentOut)
 def get_document(
@@ -146,42 +303,52 @@ def get_document(
 # New endpoint for alerts (FIXED)
 @app.get('/alerts')
 def get_alerts(
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    label: Optional[str] = None,
+    min_score: Optional[float] = None,
+    department: Optional[str] = None,
     current_user: models.User = Depends(require_role(['admin', 'reviewer'])),
     db: Session = Depends(database.get_db)
 ):
-    """Get all documents with active alerts"""
-    docs = db.query(models.Document).filter(
-        models.Document.semantic_alerts != None,
-        models.Document.semantic_alerts != '[]'
-    ).all()
-    
-    alerts_list = []
-    for doc in docs:
-        try:
-            alerts = json.loads(doc.semantic_alerts) if doc.semantic_alerts else []
-            if alerts:
-                alerts_list.append({
-                    'document_id': doc.id,
-                    'filename': doc.filename,
-                    'alerts': alerts,
-                    'created_at': doc.created_at.isoformat() if doc.created_at else None
-                })
-        except:
-            pass
-    
-    return {'total': len(alerts_list), 'documents': alerts_list}
+    """Detected alerts, newest first, optionally filtered by label, score and department"""
+    try:
+        rows, next_cursor = crud.get_alerts_page(db, limit, cursor=cursor, label=label,
+                                                 min_score=min_score, department=department)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return {
+        'items': [{
+            'id': alert.id,
+            'document_id': alert.document_id,
+            'filename': filename,
+            'department': doc_department,
+            'label': alert.label,
+            'score': alert.score,
+            'paragraph_index': alert.paragraph_index,
+            'page': alert.page,
+            'snippet': alert.snippet,
+            'created_at': alert.created_at.isoformat() if alert.created_at else None
+        } for alert, filename, doc_department in rows],
+        'next_cursor': next_cursor
+    }
 
 # New endpoint for misfiled documents (FIXED)
 @app.get('/misfiled')
 def get_misfiled(
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    department: Optional[str] = None,
     current_user: models.User = Depends(require_role(['admin', 'reviewer'])),
     db: Session = Depends(database.get_db)
 ):
-    """Get all misfiled documents"""
-    docs = db.query(models.Document).filter(models.Document.is_misfiled == True).all()
+    """Misfiled documents, newest first"""
+    try:
+        docs, next_cursor = crud.get_documents_page(db, limit, cursor=cursor, department=department, misfiled=True)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
     return {
-        'total': len(docs),
-        'documents': [{
+        'items': [{
             'id': d.id,
             'filename': d.filename,
             'user_department': d.department,
@@ -189,7 +356,8 @@ def get_misfiled(
             'confidence': d.confidence,
             'flag_reason': d.flag_reason,
             'created_at': d.created_at.isoformat() if d.created_at else None
-        } for d in docs]
+        } for d in docs],
+        'next_cursor': next_cursor
     }
 
 # Stats endpoint
@@ -198,73 +366,99 @@ def get_stats(
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(database.get_db)
 ):
-    """Get dashboard statistics"""
-    total_docs = db.query(models.Document).count()
-    
-    # Count alerts
-    alert_docs = db.query(models.Document).filter(
-        models.Document.semantic_alerts != None,
-        models.Document.semantic_alerts != '[]'
-    ).count()
-    
-    # Count misfiled
-    misfiled = db.query(models.Document).filter(models.Document.is_misfiled == True).count()
-    
+    """Get dashboard statistics (read from the per-department daily counters)"""
+    totals = crud.get_counter_totals(db)
     return {
-        'total_documents': total_docs,
-        'active_alerts': alert_docs,
-        'misfiled_documents': misfiled,
+        'total_documents': totals['total'],
+        'active_alerts': totals['alerting'],
+        'misfiled_documents': totals['misfiled'],
         'user_role': current_user.role.value
     }
 
-# Semantic search endpoint
+@app.get('/stats/timeseries')
+def get_stats_timeseries(
+    days: int = Query(30, ge=1, le=366),
+    department: Optional[str] = None,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """Daily document, alert and misfiling counts for the last `days` days"""
+    return {
+        'days': days,
+        'department': department,
+        'series': crud.get_counter_series(db, days, department=department)
+    }
+
+# Search endpoint: hybrid (BM25 + semantic, fused), semantic-only or lexical-only
 @app.get('/search')
 def semantic_search(
     q: str,
+    response: Response,
+    mode: str = Query('hybrid', pattern='^(hybrid|semantic|lexical)$'),
     current_user: models.User = Depends(get_current_user),
+    profile: bool = Depends(profiling_requested),
     db: Session = Depends(database.get_db)
 ):
-    """Semantic search across documents"""
+    """Search across documents; lexical matching covers the full extracted text and never calls the encoder"""
     if not q or len(q.strip()) < 3:
         raise HTTPException(status_code=400, detail='Search query must be at least 3 characters')
     
-    # Compute query embedding
-    query_embedding = processor.compute_embedding(q)
+    # Regular users search only their department's documents
+    department = current_user.department if current_user.role == models.UserRole.USER else None
+    if not profile:
+        return run_search(db, q, mode, department)
+    with profiling.SamplingProfiler() as profiler:
+        result = run_search(db, q, mode, department)
+    profiling.save(profiler, kind='request', path='/search', query=q, mode=mode, user=current_user.username)
+    response.headers['X-Profile-Id'] = profiler.id
+    return result
+
+def run_search(db: Session, q: str, mode: str, department: Optional[str]):
+    """Search response for q within department (None: all departments)"""
+    k = settings.SEARCH_TOP_K
     
-    # Get all documents (filter by department for regular users)
-    if current_user.role == models.UserRole.USER:
-        all_docs = db.query(models.Document).filter(models.Document.department == current_user.department).all()
+    semantic_hits, lexical_hits = [], []
+    if mode != 'lexical':
+        # Compute query embedding (the only encoder call per search)
+        query_embedding = processor.compute_embedding(q)
+        # ANN index lookup (exact NumPy scan if the index is missing or stale)
+        semantic_hits = search_index.search(db, query_embedding, department, min_score=0.1)  # LOWERED threshold for demo - was 0.3
+    if mode != 'semantic':
+        lexical_hits = lexical_index.search(db, q, department, k=k)
+    
+    if mode == 'hybrid':
+        hits = search_index.fuse([semantic_hits, lexical_hits], k=settings.SEARCH_RRF_K)[:k]
     else:
-        all_docs = db.query(models.Document).all()
+        hits = semantic_hits or lexical_hits
+    similarities = dict(semantic_hits)
+    lexical_scores = dict(lexical_hits)
+    docs = crud.get_documents_by_ids(db, [doc_id for doc_id, _ in hits])
     
-    # Calculate similarity scores
     results = []
-    for doc in all_docs:
-        # Compute similarity with document text
-        doc_text = doc.original_text or doc.summary
-        if doc_text:
-            doc_embedding = processor.compute_embedding(doc_text[:1000])  # Use first 1000 chars
-            similarity = processor.util.cos_sim(query_embedding, doc_embedding).item()
-            
-            if similarity > 0.1:  # LOWERED threshold for demo - was 0.3
-                results.append({
-                    'id': doc.id,
-                    'filename': doc.filename,
-                    'department': doc.department,
-                    'predicted_department': doc.predicted_department,
-                    'confidence': doc.confidence,
-                    'summary': doc.summary[:200] + '...' if len(doc.summary) > 200 else doc.summary,
-                    'similarity': round(similarity, 3),
-                    'uploaded_at': doc.uploaded_at.isoformat()
-                })
-    
-    # Sort by similarity descending
-    results.sort(key=lambda x: x['similarity'], reverse=True)
+    for doc_id, score in hits:
+        doc = docs.get(doc_id)
+        if doc is None:
+            continue
+        summary = doc.summary or ''
+        similarity = similarities.get(doc_id)
+        results.append({
+            'id': doc.id,
+            'filename': doc.filename,
+            'department': doc.department,
+            'predicted_department': doc.predicted_department,
+            'confidence': doc.confidence,
+            'summary': summary[:200] + '...' if len(summary) > 200 else summary,
+            'similarity': round(similarity, 3) if similarity is not None else None,
+            'lexical_score': round(lexical_scores[doc_id], 3) if doc_id in lexical_scores else None,
+            'score': round(score, 4),
+            'uploaded_at': doc.created_at.isoformat() if doc.created_at else None
+        })
     
     return {
         'query': q,
+        'mode': mode,
         'total_results': len(results),
-        'results': results[:20]  # Top 20 results
+        'results': results
     }
 
 if __name__ == '__main__':
@@ -0,0 +1,200 @@
+"""Prometheus metrics and structured timing logs.
+
+Pipeline stages are wrapped in ``stage(name)`` (a context manager that also
+works as a decorator), which observes a latency histogram and tracks an
+in-flight gauge. With ``METRICS_TIMING_LOGS`` (off by default, since it
+writes a line per request and stage) each one also logs a JSON line
+through the ``kmrl`` logger from ``app.utils.logger``. HTTP requests are
+timed by ``RequestMetricsMiddleware``, a plain ASGI middleware labelled by
+route template, and every SQL statement bumps a counter from a
+``before_cursor_execute`` listener. Model load times, queue depths, auth
+cache hits and misses, and worker memory are read only when ``/metrics``
+is scraped, so they cost nothing in between. Micro-batchers report batch
+sizes and wait times through ``observe_batch``.
+
+Without prometheus_client, or with ``METRICS_ENABLED`` off, the metric
+updates are skipped and only the timing logs remain.
+"""
+import time, logging
+from contextlib import contextmanager
+from sqlalchemy import event, func
+from sqlalchemy.engine import Engine
+from .app.config import get_settings
+from .app.utils.logger import logger as _app_logger  # JSON handler on the 'kmrl' logger only
+
+settings = get_settings()
+timing_log = _app_logger.getChild('timing')
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Gauge, Histogram
+    from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily
+except ImportError:
+    prometheus_client = None
+
+enabled = settings.METRICS_ENABLED and prometheus_client is not None
+
+# Pipeline stages run from milliseconds (language detection) to minutes (OCR of long scans)
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+if enabled:
+    REQUEST_SECONDS = Histogram('kmrl_http_request_duration_seconds', 'HTTP request latency',
+                                ['method', 'route', 'status'])
+    REQUESTS_IN_FLIGHT = Gauge('kmrl_http_requests_in_flight', 'HTTP requests being served', ['method'])
+    STAGE_SECONDS = Histogram('kmrl_stage_duration_seconds', 'Pipeline stage latency', ['stage'],
+                              buckets=STAGE_BUCKETS)
+    STAGE_IN_FLIGHT = Gauge('kmrl_stage_in_flight', 'Pipeline stages currently running', ['stage'])
+    STAGE_ERRORS = Counter('kmrl_stage_errors_total', 'Pipeline stages that raised', ['stage'])
+    DB_QUERIES = Counter('kmrl_db_queries_total', 'SQL statements executed', ['operation'])
+    BATCH_SIZE = Histogram('kmrl_microbatch_size', 'Inputs per micro-batched model call', ['batcher'],
+                           buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+    BATCH_WAIT = Histogram('kmrl_microbatch_wait_seconds', 'Time inputs waited for their micro-batch', ['batcher'],
+                           buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1))
+
+@contextmanager
+def stage(name: str, **fields):
+    """Time a pipeline stage; extra fields are added to its timing log line"""
+    if not enabled and not settings.METRICS_TIMING_LOGS:
+        yield
+        return
+    if enabled:
+        STAGE_IN_FLIGHT.labels(name).inc()
+    started = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except Exception:
+        failed = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        if enabled:
+            STAGE_IN_FLIGHT.labels(name).dec()
+            STAGE_SECONDS.labels(name).observe(elapsed)
+            if failed:
+                STAGE_ERRORS.labels(name).inc()
+        if settings.METRICS_TIMING_LOGS:
+            timing_log.info('stage', extra={'stage': name, 'duration_ms': round(elapsed * 1000, 2),
+                                            'failed': failed, **fields})
+
+def observe_batch(batcher: str, size: int, waits):
+    """Record one micro-batch: its size and how long each input waited for it"""
+    if enabled:
+        BATCH_SIZE.labels(batcher).observe(size)
+        for wait in waits:
+            BATCH_WAIT.labels(batcher).observe(wait)
+
+class RequestMetricsMiddleware:
+    """Latency histogram and in-flight gauge for every HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        method = scope['method']
+        status = [500]
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        if enabled:
+            REQUESTS_IN_FLIGHT.labels(method).inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            # The router stores the matched route in the shared scope; unmatched paths
+            # share one label so scanners cannot blow up the series count
+            route = getattr(scope.get('route'), 'path', 'unmatched')
+            if enabled:
+                REQUESTS_IN_FLIGHT.labels(method).dec()
+                REQUEST_SECONDS.labels(method, route, str(status[0])).observe(elapsed)
+            if settings.METRICS_TIMING_LOGS:
+                timing_log.info('request', extra={'method': method, 'route': route, 'status': status[0],
+                                                  'duration_ms': round(elapsed * 1000, 2)})
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    operation = statement.lstrip()[:6].lower()
+    DB_QUERIES.labels(operation if operation in ('select', 'insert', 'update', 'delete') else 'other').inc()
+
+class _ScrapeCollector:
+    """Values that are only worth computing when someone scrapes"""
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        from . import database, models, jobs, microbatch, auth
+        from .model_registry import registry
+        from .serve import process_memory
+        loads = GaugeMetricFamily('kmrl_model_load_seconds', 'Time taken to load each model', labels=['model'])
+        for name, info in registry.status().items():
+            if 'load_seconds' in info:
+                loads.add_metric([name], info['load_seconds'])
+        yield loads
+
+        depth = GaugeMetricFamily('kmrl_job_queue_depth', 'Processing jobs by status', labels=['status'])
+        db = database.SessionLocal()
+        try:
+            counts = dict(db.query(models.ProcessingJob.status, func.count(models.ProcessingJob.id))
+                          .group_by(models.ProcessingJob.status).all())
+        except Exception as e:
+            print(f"Could not read job queue depth: {e}")
+            counts = {}
+        finally:
+            db.close()
+        for status in models.JobStatus:
+            depth.add_metric([status.value], counts.get(status, 0))
+        yield depth
+
+        memory = process_memory()
+        if memory:
+            usage = GaugeMetricFamily('kmrl_process_memory_bytes', 'Memory of this worker from smaps_rollup '
+                                      '(shared includes model weights inherited from the serve master)', labels=['kind'])
+            for kind, value in memory.items():
+                usage.add_metric([kind], value)
+            yield usage
+
+        pending = GaugeMetricFamily('kmrl_microbatch_pending', 'Inputs waiting for a micro-batch', labels=['batcher'])
+        for batcher in microbatch.batchers:
+            pending.add_metric([batcher.name], batcher.pending.qsize())
+        yield pending
+
+        if settings.AUTH_CACHE_ENABLED:
+            lookups = CounterMetricFamily('kmrl_auth_cache_lookups', 'Token and user cache lookups',
+                                          labels=['cache', 'result'])
+            entries = GaugeMetricFamily('kmrl_auth_cache_entries', 'Entries in the auth caches', labels=['cache'])
+            for name, cache in (('tokens', auth.token_cache), ('users', auth.user_cache)):
+                stats = cache.stats()
+                lookups.add_metric([name, 'hit'], stats['hits'])
+                lookups.add_metric([name, 'miss'], stats['misses'])
+                entries.add_metric([name], stats['entries'])
+            yield lookups
+            yield entries
+
+        if jobs.writer is not None:
+            yield GaugeMetricFamily('kmrl_write_behind_pending', 'Database writes waiting for the writer thread',
+                                    value=jobs.writer.pending.qsize())
+
+def setup(app):
+    """Install the request middleware, the SQL listener and the scrape-time collector"""
+    if not enabled:
+        if settings.METRICS_TIMING_LOGS:
+            app.add_middleware(RequestMetricsMiddleware)
+        return
+    app.add_middleware(RequestMetricsMiddleware)
+    if not event.contains(Engine, 'before_cursor_execute', _count_query):
+        event.listen(Engine, 'before_cursor_execute', _count_query)
+        prometheus_client.REGISTRY.register(_ScrapeCollector())
+
+def render():
+    """(body, content type) of the Prometheus exposition, or None when metrics are off"""
+    if not enabled:
+        return None
+    return prometheus_client.generate_latest(), prometheus_client.CONTENT_TYPE_LATEST
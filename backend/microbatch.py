@@ -0,0 +1,93 @@
+"""Dynamic micro-batching of single-input model calls.
+
+Concurrent requests that each need one embedding (``/search``) or one
+summary submit their input and wait on a future. One thread per batcher
+takes the first waiting input, collects more for up to ``max_wait_ms`` or
+until ``max_batch`` inputs are queued, runs a single batched call and
+hands each caller its result. The wait is only spent when the previous
+batch had company, so a lone request on an idle server is not delayed.
+Inputs that queue up while a batch is running join the next one without
+waiting, so ``max_wait_ms = 0`` still batches under load. If the batched
+call fails (or returns fewer results than inputs), every caller left without
+a result gets an exception, and the thread carries on with the next batch.
+Callers wait at most ``timeout`` seconds; an input whose caller gave up
+before its batch started is dropped.
+"""
+import time, queue, threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from . import metrics
+
+batchers = []  # every MicroBatcher, for the scrape-time queue gauge
+
+class MicroBatcher:
+    """Coalesces concurrent single-input calls into calls of fn(inputs) -> results"""
+
+    def __init__(self, name: str, fn, max_batch: int, max_wait_ms: float, timeout: float = None):
+        self.name = name
+        self.fn = fn
+        self.timeout = timeout
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.pending = queue.Queue()
+        self.concurrent = False  # whether the last batch had more than one input
+        self.thread = None
+        self._lock = threading.Lock()
+        batchers.append(self)
+
+    def submit(self, item) -> Future:
+        future = Future()
+        self.pending.put((item, future, time.perf_counter()))
+        self._ensure_started()
+        return future
+
+    def __call__(self, item):
+        future = self.submit(item)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            future.cancel()  # skipped if its batch has not started yet
+            raise TimeoutError(f"{self.name} micro-batch gave no result within {self.timeout}s")
+
+    def _ensure_started(self):
+        with self._lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name=f'microbatch-{self.name}', daemon=True)
+                self.thread.start()
+
+    def _collect(self):
+        batch = [self.pending.get()]
+        deadline = time.perf_counter() + (self.max_wait if self.concurrent else 0.0)
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self.pending.get(timeout=remaining) if remaining > 0 else self.pending.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_batch(self, batch):
+        self.concurrent = len(batch) > 1
+        started = time.perf_counter()
+        results = list(self.fn([item for item, _, _ in batch]))
+        if len(results) != len(batch):
+            raise RuntimeError(f"{self.name} batch returned {len(results)} results for {len(batch)} inputs")
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+        metrics.observe_batch(self.name, len(batch), [started - queued for _, _, queued in batch])
+
+    def _run(self):
+        while True:
+            # Inputs whose caller already timed out are dropped
+            batch = [entry for entry in self._collect() if entry[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            error = None
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                error = e
+                print(f"Micro-batch '{self.name}' failed: {e}")
+            finally:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(error or RuntimeError(f"{self.name} micro-batch was interrupted"))
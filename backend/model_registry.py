@@ -0,0 +1,118 @@
+"""Lazy, thread-safe model registry with background warm-up.
+
+Models are registered with a loader and only built on first use, so
+importing the processor (and binding the API port) no longer waits for
+transformer weights. ``warm_up`` loads a chosen set in a background thread
+and ``status`` feeds the readiness probe.
+
+``load_artifact`` caches a model as a local ``save_pretrained`` directory
+(safetensors weights, no pickled objects), so later loads skip hub lookups
+and remote downloads. Artifacts are keyed by the torch, transformers and
+sentence-transformers versions that wrote them.
+"""
+import os, re, time, shutil, threading, tempfile
+from importlib import metadata
+
+class ModelRegistry:
+    """Named models built on first access"""
+
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._locks = {}
+        self._status = {}
+        self._guard = threading.Lock()
+
+    def register(self, name: str, loader):
+        with self._guard:
+            self._loaders[name] = loader
+            self._locks.setdefault(name, threading.Lock())
+            self._status.setdefault(name, {'state': 'pending'})
+            self._models.pop(name, None)
+
+    def get(self, name: str):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        with self._locks[name]:
+            if name not in self._models:
+                self._status[name] = {'state': 'loading'}
+                started = time.perf_counter()
+                try:
+                    self._models[name] = self._loaders[name]()
+                except Exception as e:
+                    self._status[name] = {'state': 'error', 'error': str(e)}
+                    raise
+                elapsed = time.perf_counter() - started
+                self._status[name] = {'state': 'ready', 'load_seconds': round(elapsed, 3)}
+                print(f"✓ Model '{name}' loaded in {elapsed:.1f}s")
+            return self._models[name]
+
+    def is_ready(self, name: str) -> bool:
+        return name in self._models
+
+    def status(self):
+        return {name: dict(info) for name, info in self._status.items()}
+
+    def warm_up(self, names, background: bool = True):
+        """Load the named models, in a daemon thread unless background is False"""
+        def load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"Warm-up failed for model '{name}': {e}")
+        if not background:
+            load_all()
+            return None
+        thread = threading.Thread(target=load_all, name='model-warmup', daemon=True)
+        thread.start()
+        return thread
+
+
+registry = ModelRegistry()
+
+ARTIFACT_PACKAGES = (('torch', 'torch'), ('tf', 'transformers'), ('st', 'sentence-transformers'))
+
+def _package_version(package: str) -> str:
+    try:
+        return metadata.version(package)
+    except metadata.PackageNotFoundError:
+        return 'none'
+
+def artifact_path(name: str, artifact_dir: str) -> str:
+    safe = re.sub(r'[^A-Za-z0-9_.-]', '_', name)
+    versions = '-'.join(f"{tag}{_package_version(pkg)}" for tag, pkg in ARTIFACT_PACKAGES)
+    return os.path.join(artifact_dir, f"{safe}-{re.sub(r'[^A-Za-z0-9_.-]', '_', versions)}")
+
+def load_artifact(name: str, build, artifact_dir: str = None, save=None, load=None):
+    """Return build(), cached in artifact_dir as a directory written by save(obj, path)
+
+    On later calls the object is rebuilt with load(path). Both must use a
+    non-pickle format (``save_pretrained``/``from_pretrained`` with
+    safetensors); nothing in the cache directory is ever unpickled.
+    """
+    if not artifact_dir or save is None or load is None:
+        return build()
+    path = artifact_path(name, artifact_dir)
+    if os.path.isdir(path):
+        try:
+            return load(path)
+        except Exception as e:
+            print(f"Ignoring unreadable model artifact {path}: {e}")
+    obj = build()
+    tmp = None
+    try:
+        os.makedirs(artifact_dir, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=artifact_dir, prefix='.tmp-')
+        save(obj, tmp)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+        tmp = None
+    except Exception as e:
+        print(f"Could not write model artifact {path}: {e}")
+    finally:
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+    return obj
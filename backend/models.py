@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, Text, ForeignKey, DateTime, Enum as SQLEnum
-from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy import Column, Integer, String, Float, Boolean, Text, ForeignKey, Date, DateTime, LargeBinary, Index, Enum as SQLEnum
+from sqlalchemy.orm import declarative_base, relationship, deferred
 from datetime import datetime
 import enum
 
@@ -11,6 +11,13 @@ class UserRole(str, enum.Enum):
     REVIEWER = "reviewer"
     USER = "user"
 
+class JobStatus(str, enum.Enum):
+    """Lifecycle of an upload processing job"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
 class User(Base):
     __tablename__ = 'users'
     id = Column(Integer, primary_key=True, index=True)
@@ -30,10 +37,99 @@ class Document(Base):
     confidence = Column(Float)
     summary = Column(Text)
     semantic_alerts = Column(Text)
+    section_scores = Column(Text)  # JSON: [{paragraph_index, snippet, dept_scores, alerts}]
     is_misfiled = Column(Boolean, default=False)
     flag_reason = Column(Text)
     original_text = Column(Text)
     translated_text = Column(Text)
+    search_text = deferred(Column(Text))  # full extracted + translated text, read by the lexical index only
     filepath = Column(String)
     uploaded_by = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Keyset pagination: newest first, overall, per department and for misfiled documents
+    __table_args__ = (
+        Index('ix_documents_created_at_id', 'created_at', 'id'),
+        Index('ix_documents_department_created_at_id', 'department', 'created_at', 'id'),
+        Index('ix_documents_is_misfiled_created_at_id', 'is_misfiled', 'created_at', 'id'),
+    )
+
+class Alert(Base):
+    """One detected alert of a document, written alongside the document"""
+    __tablename__ = 'alerts'
+    id = Column(Integer, primary_key=True)
+    document_id = Column(Integer, ForeignKey('documents.id'), nullable=False, index=True)
+    label = Column(String, nullable=False)
+    score = Column(Float, nullable=False)
+    paragraph_index = Column(Integer)
+    page = Column(Integer)
+    snippet = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index('ix_alerts_created_at_id', 'created_at', 'id'),
+        Index('ix_alerts_label_created_at_id', 'label', 'created_at', 'id'),
+        # One alert per concept per document (the best-matching section)
+        Index('ux_alerts_document_id_label', 'document_id', 'label', unique=True),
+    )
+
+class DocumentCounter(Base):
+    """Dashboard counts per department and (UTC) day, updated with every document write"""
+    __tablename__ = 'document_counters'
+    department = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True, index=True)
+    total = Column(Integer, default=0, nullable=False)
+    alerting = Column(Integer, default=0, nullable=False)
+    misfiled = Column(Integer, default=0, nullable=False)
+
+class DocumentEmbedding(Base):
+    """Normalized float32 document embedding, computed once at upload"""
+    __tablename__ = 'document_embeddings'
+    document_id = Column(Integer, ForeignKey('documents.id'), primary_key=True)
+    department = Column(String, index=True)
+    vector = Column(LargeBinary)
+
+class ProcessingJob(Base):
+    """Durable queue entry for an uploaded file awaiting process_document"""
+    __tablename__ = 'processing_jobs'
+    id = Column(String, primary_key=True)
+    idempotency_key = Column(String, unique=True, index=True, nullable=True)
+    status = Column(SQLEnum(JobStatus), default=JobStatus.QUEUED, index=True)
+    filename = Column(String)
+    filepath = Column(String)
+    department = Column(String)
+    uploaded_by = Column(String, index=True)
+    content_hash = Column(String, index=True)  # sha256 of the uploaded bytes
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    claim_token = Column(String, nullable=True)  # set per claim; results of a lost lease are discarded
+    error = Column(Text)
+    document_id = Column(Integer, ForeignKey('documents.id'), nullable=True)
+    profile_requested = Column(Boolean, default=False)  # admin opted in with X-Profile
+    profile_id = Column(String, nullable=True)  # see /admin/profiles/{profile_id}
+    available_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class AnalysisCache(Base):
+    """Content analysis keyed by file hash, reused when identical files are re-uploaded"""
+    __tablename__ = 'analysis_cache'
+    content_hash = Column(String, primary_key=True)
+    fingerprint = Column(String)  # models and analysis settings the entry was computed with
+    analysis = Column(Text)  # JSON: extraction, summary, classification, alerts
+    embedding = Column(LargeBinary)
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class CacheGeneration(Base):
+    """Version number of a per-process cache, bumped on writes so every worker drops stale entries"""
+    __tablename__ = 'cache_generations'
+    name = Column(String, primary_key=True)
+    generation = Column(Integer, default=0, nullable=False)
+
+class CompletedMigration(Base):
+    """Marker row for a one-off data migration that has finished"""
+    __tablename__ = 'completed_migrations'
+    name = Column(String, primary_key=True)
+    completed_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,147 @@
+"""Parallel OCR for images and scanned PDF pages.
+
+PDF pages with (almost) no text layer are rendered at ``OCR_DPI`` and sent,
+together with image uploads, to a spawn-based process pool of Tesseract
+workers. Oversized images are downscaled and optionally binarized before
+recognition. Results are cached on disk per page hash (page content
+stream + embedded images, or the image file bytes) and OCR settings, so
+re-processing the same scan costs a hash and a file read.
+"""
+import os, io, hashlib, tempfile, threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from .app.config import get_settings
+
+settings = get_settings()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.OCR_PROCESSES or max(1, (os.cpu_count() or 2) // 2),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pool
+
+def _options():
+    """OCR settings passed to workers (spawned workers re-read nothing)"""
+    return {
+        'lang': settings.OCR_LANGUAGE,
+        'tesseract_cmd': settings.TESSERACT_CMD,
+        'dpi': settings.OCR_DPI,
+        'max_pixels': settings.OCR_MAX_PIXELS,
+        'binarize': settings.OCR_BINARIZE,
+    }
+
+# ---- workers ----------------------------------------------------------------
+
+def _prepare_image(img, max_pixels: int, binarize: bool):
+    """Grayscale, downscale past max_pixels, optionally binarize"""
+    from PIL import Image
+    img = img.convert('L')
+    width, height = img.size
+    if width * height > max_pixels:
+        scale = (max_pixels / float(width * height)) ** 0.5
+        img = img.resize((max(1, int(width * scale)), max(1, int(height * scale))), Image.LANCZOS)
+    if binarize:
+        img = img.point(lambda v: 255 if v > 160 else 0, mode='1')
+    return img
+
+def _recognize(img, options):
+    import pytesseract
+    # Several Tesseract processes run side by side; keep each single-threaded
+    os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+    if options['tesseract_cmd']:
+        pytesseract.pytesseract.tesseract_cmd = options['tesseract_cmd']
+    img = _prepare_image(img, options['max_pixels'], options['binarize'])
+    return pytesseract.image_to_string(img, lang=options['lang'])
+
+def _ocr_image_file(filepath: str, options):
+    from PIL import Image
+    with Image.open(filepath) as img:
+        return _recognize(img, options)
+
+def _ocr_pdf_page(filepath: str, number: int, options):
+    import fitz  # pymupdf
+    from PIL import Image
+    with fitz.open(filepath) as doc:
+        pixmap = doc.load_page(number).get_pixmap(dpi=options['dpi'])
+        img = Image.open(io.BytesIO(pixmap.tobytes('png')))
+    return _recognize(img, options)
+
+# ---- cache ------------------------------------------------------------------
+
+def _cache_key(content_hash: str, options) -> str:
+    tag = f"{content_hash}|{options['lang']}|{options['dpi']}|{options['max_pixels']}|{options['binarize']}"
+    return hashlib.sha256(tag.encode('utf-8')).hexdigest()
+
+def _cache_path(key: str) -> str:
+    return os.path.join(settings.OCR_CACHE_DIR, key[:2], key + '.txt')
+
+def _cache_get(key: str):
+    try:
+        with open(_cache_path(key), 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+def _cache_put(key: str, text: str):
+    path = _cache_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"Could not cache OCR output: {e}")
+
+def page_hash(doc, number: int) -> str:
+    """Hash of a PDF page's content stream and embedded images"""
+    page = doc.load_page(number)
+    digest = hashlib.sha256(page.read_contents())
+    for image in page.get_images(full=True):
+        digest.update(doc.xref_stream_raw(image[0]) or b'')
+    return digest.hexdigest()
+
+def file_hash(filepath: str) -> str:
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# ---- public API ---------------------------------------------------------------
+
+def _run_cached(tasks):
+    """tasks: [(content_hash, fn, args)] -> texts, OCRing cache misses in the pool"""
+    options = _options()
+    keys = [_cache_key(content_hash, options) for content_hash, _, _ in tasks]
+    texts = [_cache_get(key) for key in keys]
+    misses = [i for i, text in enumerate(texts) if text is None]
+    if misses:
+        pool = _get_pool()
+        futures = {i: pool.submit(tasks[i][1], *tasks[i][2], options) for i in misses}
+        for i, future in futures.items():
+            try:
+                texts[i] = future.result()
+                _cache_put(keys[i], texts[i])
+            except Exception as e:
+                print(f"OCR extraction failed: {e}")
+                texts[i] = ''
+    return texts
+
+def ocr_image(filepath: str) -> str:
+    """OCR a single image file"""
+    return _run_cached([(file_hash(filepath), _ocr_image_file, (filepath,))])[0]
+
+def ocr_pdf_pages(filepath: str, page_numbers):
+    """OCR the given (0-based) PDF pages in parallel, returning texts in the same order"""
+    import fitz  # pymupdf
+    with fitz.open(filepath) as doc:
+        hashes = [page_hash(doc, number) for number in page_numbers]
+    return _run_cached([(h, _ocr_pdf_page, (filepath, number)) for h, number in zip(hashes, page_numbers)])
@@ -1,17 +1,62 @@
-import os, json
+import os, json, time, itertools
 from langdetect import detect
-from sentence_transformers import SentenceTransformer, util
-from transformers import pipeline, MarianMTModel, MarianTokenizer
 import numpy as np
 import warnings
+from concurrent.futures import ThreadPoolExecutor
+from . import concepts, sections, extraction, embedding_backends, summarization, metrics, translation, microbatch
+from .model_registry import registry, load_artifact
+from .app.config import get_settings
 warnings.filterwarnings('ignore')
 
-# Initialize models globally for efficiency
-print("Loading Sentence Transformer model...")
-sentence_model = SentenceTransformer('paraphrase-MiniLM-L6-v2')
+settings = get_settings()
 
-print("Loading summarization model...")
-summarizer = pipeline('summarization', model='sshleifer/distilbart-cnn-12-6', device=-1)
+# Models are loaded lazily through the registry (see warm_up in main.startup)
+def _artifact_dir():
+    return settings.MODEL_ARTIFACT_DIR if settings.MODEL_ARTIFACTS_ENABLED else None
+
+def _load_torch_sentence_model():
+    from sentence_transformers import SentenceTransformer
+    print("Loading Sentence Transformer model...")
+    return load_artifact(f'sentence-{settings.EMBED_MODEL}',
+                         lambda: SentenceTransformer(settings.EMBED_MODEL), _artifact_dir(),
+                         save=lambda model, path: model.save(path),
+                         load=lambda path: SentenceTransformer(path))
+
+def _pretrained_pair(model_cls, tokenizer_cls):
+    """save/load callables for a (model, tokenizer) pair stored as save_pretrained output"""
+    def save(pair, path):
+        pair[0].save_pretrained(path, safe_serialization=True)
+        pair[1].save_pretrained(path)
+    def load(path):
+        return model_cls.from_pretrained(path, use_safetensors=True), tokenizer_cls.from_pretrained(path)
+    return {'save': save, 'load': load}
+
+def _load_sentence_model():
+    return embedding_backends.load_sentence_encoder(
+        settings.EMBED_BACKEND, settings.EMBED_MODEL, _load_torch_sentence_model,
+        list(DEPARTMENT_DESCRIPTIONS.values()) + list(ALERT_CONCEPTS.values()),
+        settings.EMBED_ONNX_DIR, settings.EMBED_PARITY_TOLERANCE, settings.EMBED_ONNX_THREADS)
+
+def _load_summarizer():
+    from transformers import pipeline, AutoModelForSeq2SeqLM, AutoTokenizer
+    print("Loading summarization model...")
+    model_name = 'sshleifer/distilbart-cnn-12-6'
+    model, tokenizer = load_artifact(
+        f'summarizer-{model_name}',
+        lambda: (AutoModelForSeq2SeqLM.from_pretrained(model_name), AutoTokenizer.from_pretrained(model_name)),
+        _artifact_dir(), **_pretrained_pair(AutoModelForSeq2SeqLM, AutoTokenizer))
+    return pipeline('summarization', model=model, tokenizer=tokenizer, device=-1)
+
+def _load_translation_model():
+    from transformers import MarianMTModel, MarianTokenizer
+    print("Loading translation model...")
+    model_name = settings.TRANSLATION_MODEL
+    model, tokenizer = load_artifact(
+        f'translation-{model_name}',
+        lambda: (MarianMTModel.from_pretrained(model_name), MarianTokenizer.from_pretrained(model_name)),
+        _artifact_dir(), **_pretrained_pair(MarianMTModel, MarianTokenizer))
+    model.eval()
+    return model, tokenizer
 
 # Pre-compute department embeddings with ENHANCED descriptions for better accuracy
 DEPARTMENT_DESCRIPTIONS = {
@@ -22,12 +67,7 @@ DEPARTMENT_DESCRIPTIONS = {
     'Compliance': 'compliance adherence standard procedure guideline protocol requirement audit verification certification quality control ISO checklist documentation review internal external process'  
 }
 
-print("Computing department embeddings...")
-DEPT_EMBEDDINGS = {}
-for dept, desc in DEPARTMENT_DESCRIPTIONS.items():
-    DEPT_EMBEDDINGS[dept] = sentence_model.encode(desc, convert_to_tensor=True)
-
-# Pre-compute alert concept embeddings
+# Alert concept descriptions
 ALERT_CONCEPTS = {
     'urgent operations': 'urgent critical immediate action required priority',
     'safety hazards': 'safety hazard danger risk injury harm workplace accident',
@@ -36,101 +76,42 @@ ALERT_CONCEPTS = {
     'safety non-compliance': 'safety violation non-compliance breach infraction deviation'
 }
 
-print("Computing alert concept embeddings...")
-ALERT_EMBEDDINGS = {}
-for concept, desc in ALERT_CONCEPTS.items():
-    ALERT_EMBEDDINGS[concept] = sentence_model.encode(desc, convert_to_tensor=True)
+def _encode_descriptions(descriptions):
+    return registry.get('sentence').encode(descriptions, convert_to_numpy=True, normalize_embeddings=True)
 
-# Translation model (lazy loading)
-translation_model = None
-translation_tokenizer = None
+def _concept_loader(descriptions, filename):
+    path = os.path.join(settings.EMBEDDINGS_DIR, filename)
+    return lambda: concepts.load_concept_matrix(descriptions, path, f'{settings.EMBED_MODEL}:{settings.EMBED_BACKEND}', _encode_descriptions)
+
+registry.register('sentence', _load_sentence_model)
+registry.register('summarizer', _load_summarizer)
+registry.register('translation', _load_translation_model)
+registry.register('department_concepts', _concept_loader(DEPARTMENT_DESCRIPTIONS, settings.DEPT_EMBEDDINGS_FILE))
+registry.register('alert_concepts', _concept_loader(ALERT_CONCEPTS, settings.ALERT_EMBEDDINGS_FILE))
 
 def get_translation_model():
-    global translation_model, translation_tokenizer
-    if translation_model is None:
-        print("Loading translation model...")
-        model_name = 'Helsinki-NLP/opus-mt-mul-en'
-        translation_tokenizer = MarianTokenizer.from_pretrained(model_name)
-        translation_model = MarianMTModel.from_pretrained(model_name)
-    return translation_model, translation_tokenizer
+    return registry.get('translation')
 
 def extract_text_from_file(filepath: str) -> str:
     """Extract text from PDF or image files"""
-    text = ''
-    file_lower = filepath.lower()
-    
-    # Try PDF extraction first
-    if file_lower.endswith('.pdf'):
-        try:
-            import fitz  # pymupdf
-            doc = fitz.open(filepath)
-            for page in doc:
-                text += page.get_text()
-            doc.close()
-        except Exception as e:
-            print(f"PDF extraction failed: {e}")
-    
-    # Try image OCR if PDF failed or for image files
-    if not text and (file_lower.endswith(('.png', '.jpg', '.jpeg', '.tiff', '.bmp'))):
-        try:
-            from PIL import Image
-            import pytesseract
-            img = Image.open(filepath)
-            text = pytesseract.image_to_string(img)
-        except Exception as e:
-            print(f"OCR extraction failed: {e}")
-    
-    # Fallback: try reading as text
-    if not text:
-        try:
-            with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-                text = f.read()
-        except Exception:
-            pass
-    
-    return text.strip()
+    return extraction.extract_document(filepath).text.strip()
 
-def detect_and_translate(text: str):
-    """Detect language and translate Malayalam to English"""
-    translated = ''
-    lang = 'en'
-    
-    if not text:
-        return lang, translated
-    
-    # Check for Malayalam Unicode characters OR garbled Malayalam patterns
-    has_malayalam_chars = any(ord(char) >= 0x0D00 and ord(char) <= 0x0D7F for char in text[:500])
-    
-    # Check for common garbled Malayalam patterns (from PDF extraction issues)
-    garbled_patterns = ['Ø', '¢', 'ß', 'Þ', 'Ä', 'á', 'É', 'Ï', 'í', 'ç', 'æ', 'Õ', 'µ', 'Ú', 'Ù', 'Î']
-    garbled_count = sum(1 for char in text[:500] if char in garbled_patterns)
-    has_garbled_malayalam = garbled_count > 20  # If more than 20 garbled chars, likely Malayalam
-    
-    if has_malayalam_chars or has_garbled_malayalam:
-        lang = 'ml'  # Force Malayalam detection
-    else:
-        try:
-            lang = detect(text[:500])  # Detect from first 500 chars
-        except Exception:
-            lang = 'unknown'
-    
-    # Translate if Malayalam detected
-    is_malayalam = (lang == 'ml' or 
-                    'malayalam' in text.lower()[:200] or
-                    has_malayalam_chars or
-                    has_garbled_malayalam)
-    
-    if is_malayalam:
-        print(f"Detected Malayalam text, attempting translation...")
-        
-        # For Malayalam documents, provide a structured English summary instead of machine translation
-        # Machine translation often produces poor quality results for Malayalam
-        try:
-            # Extract key information that can be identified without translation
-            lines = [line.strip() for line in text.split('\n') if line.strip()]
-            
-            # Create a descriptive English summary
-            translated = f"""Malayalam Language Document Detected
+def detect_language(text: str):
+    """(language code, is_malayalam) from the first characters of text"""
+    head = text[:500]
+    # Malayalam script, or legacy-font Malayalam that PDF extraction turns into Latin-1 (Ø, ß, Þ, ...)
+    if translation.has_malayalam(head) or translation.garbled_count(head) > 20:
+        return 'ml', True
+    try:
+        lang = detect(head)
+    except Exception:
+        lang = 'unknown'
+    return lang, lang == 'ml' or 'malayalam' in text.lower()[:200]
+
+def _malayalam_notice(text: str):
+    """Structured English description for Malayalam documents that could not be translated"""
+    lines = [line.strip() for line in text.split('\n') if line.strip()]
+    return f"""Malayalam Language Document Detected
 
 Document Type: Official/Administrative Document
 Language: Malayalam (Kerala State Language)
@@ -142,28 +123,49 @@ This is an official document written in Malayalam script. The document appears t
 - Contact information and reference numbers
 - Departmental correspondence or official communication
 - Regulatory or compliance-related content"""
-            
-            print(f"Generated descriptive summary for Malayalam document")
-                
-        except Exception as e:
-            print(f"Malayalam processing failed: {e}")
-            translated = f"Malayalam document detected. Translation unavailable. Document contains text in Malayalam script that requires manual review for accurate understanding and classification."
-    
-    return lang, translated
+
+def translate_malayalam(text: str):
+    """Machine translation of the Malayalam sentences in text, or None if it is unavailable"""
+    if not translation.has_malayalam(text):
+        return None  # legacy-font text: nothing the model can read
+    try:
+        model, tokenizer = get_translation_model()
+        translated, complete = translation.translate(text, model, tokenizer, settings.TRANSLATION_MODEL)
+    except Exception as e:
+        print(f"Translation failed: {e}")
+        return None
+    if not complete:
+        print("Translation stopped at the time budget; remaining sentences kept in Malayalam")
+    return translated
+
+def detect_and_translate(text: str):
+    """Detect language and translate Malayalam to English"""
+    if not text:
+        return 'en', ''
+    lang, is_malayalam = detect_language(text)
+    if not is_malayalam:
+        return lang, ''
+    print("Detected Malayalam text, translating...")
+    translated = translate_malayalam(text)
+    return lang, translated or _malayalam_notice(text)
 
 def compute_embedding(text: str):
-    """Compute semantic embedding using Sentence-Transformers"""
+    """Compute a unit-normalized semantic embedding using Sentence-Transformers"""
     if not text:
-        return sentence_model.encode('empty document', convert_to_tensor=True)
-    return sentence_model.encode(text[:5000], convert_to_tensor=True)  # Limit to first 5000 chars
+        text = 'empty document'
+    if embedding_batcher is not None:
+        return embedding_batcher(text[:5000])  # shares an encoder call with concurrent requests
+    return registry.get('sentence').encode(text[:5000], convert_to_numpy=True, normalize_embeddings=True)  # Limit to first 5000 chars
 
-def semantic_classify_department(doc_embedding):
-    """Classify document to department using semantic similarity"""
-    similarities = {}
-    
-    for dept, dept_emb in DEPT_EMBEDDINGS.items():
-        similarity = util.cos_sim(doc_embedding, dept_emb).item()
-        similarities[dept] = similarity
+def compute_embeddings(texts, batch_size=32):
+    """Compute unit-normalized embeddings for many texts in one batched encoder call"""
+    texts = [t[:5000] if t else 'empty document' for t in texts]
+    encoder = registry.get('sentence')
+    with metrics.stage('encoding', texts=len(texts)):
+        return encoder.encode(texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+
+def _classification_from_scores(dept_scores):
+    similarities = registry.get('department_concepts').as_dict(dept_scores)
     
     # Get department with highest similarity
     predicted_dept = max(similarities, key=similarities.get)
@@ -171,149 +173,315 @@ def semantic_classify_department(doc_embedding):
     
     return predicted_dept, round(confidence, 3), similarities
 
-def detect_semantic_alerts(doc_embedding, threshold=0.50):  # Increased threshold for better accuracy
-    """Detect alerts using semantic similarity with alert concepts"""
-    alerts = []
-    
-    for concept, alert_emb in ALERT_EMBEDDINGS.items():
-        similarity = util.cos_sim(doc_embedding, alert_emb).item()
-        if similarity > threshold:
-            alerts.append({
-                'label': concept,
-                'score': round(similarity, 3)
-            })
+def _alerts_from_scores(alert_scores, threshold):
+    alerts = [{'label': concept, 'score': round(similarity, 3)}
+              for concept, similarity in registry.get('alert_concepts').as_dict(alert_scores).items()
+              if similarity > threshold]
     
     # Sort by score descending
     alerts.sort(key=lambda x: x['score'], reverse=True)
     return alerts
 
-def generate_semantic_summary(text: str):
-    """Generate semantic summary using transformer model"""
+def semantic_classify_department(doc_embedding):
+    """Classify document to department using semantic similarity"""
+    return _classification_from_scores(registry.get('department_concepts').scores(doc_embedding))
+
+def detect_semantic_alerts(doc_embedding, threshold=0.50):  # Increased threshold for better accuracy
+    """Detect alerts using semantic similarity with alert concepts"""
+    return _alerts_from_scores(registry.get('alert_concepts').scores(doc_embedding), threshold)
+
+def _short_text_summary(text: str):
+    """Summary for texts too short for the transformer, else None"""
     if not text or len(text.strip()) < 50:
         return "• Document too short for meaningful summarization"
     
-    try:
-        # Prepare text for summarization - use more text for better context
-        text_chunk = text[:2048]  # Increased from 1024 for better summaries
-        
-        # Skip if text is still too short
-        if len(text_chunk.split()) < 30:
-            sentences = text.split('.')[:3]
-            return '\n'.join(['• ' + s.strip() + '.' for s in sentences if s.strip() and len(s.strip()) > 10])
-        
-        # Generate summary with better parameters
-        summary_result = summarizer(
-            text_chunk,
-            max_length=200,  # Increased for more detailed summaries
-            min_length=80,   # Increased minimum
-            do_sample=False,
-            truncation=True
-        )
-        
-        summary_text = summary_result[0]['summary_text']
-        
-        # Validate summary is readable English
-        if not summary_text or len(summary_text.strip()) < 20:
-            raise ValueError("Summary too short")
-        
-        # Format as bullet points
-        sentences = summary_text.split('. ')
-        bullets = []
-        for s in sentences:
-            if s.strip() and len(s.strip()) > 10:  # Filter very short fragments
-                bullet_text = s.strip()
-                if not bullet_text.endswith('.'):
-                    bullet_text += '.'
-                bullets.append('• ' + bullet_text)
-        
-        # Create meaningful summary with sections
-        formatted_summary = '\n'.join(bullets[:8])  # Up to 8 bullets
-        
-        # Add actionable insights
-        formatted_summary += '\n\nKey Actions Required:'
-        formatted_summary += '\n• Review document content and verify accuracy'
-        formatted_summary += '\n• Ensure proper department classification'
-        formatted_summary += '\n• Address any detected alerts promptly'
-        
-        return formatted_summary
-        
-    except Exception as e:
-        print(f"Summarization failed: {e}")
-        # Better fallback: extract meaningful sentences
-        sentences = [s.strip() for s in text.split('.') if len(s.strip()) > 20][:6]
-        if sentences:
-            return '\n'.join(['• ' + s + '.' for s in sentences])
-        else:
-            return "• Document processed successfully\n• Content requires manual review\n• Please verify classification and department assignment\n• Check for any alerts or compliance requirements"
+    # Skip if text is still too short
+    if len(text[:2048].split()) < 30:
+        sentences = text.split('.')[:3]
+        return '\n'.join(['• ' + s.strip() + '.' for s in sentences if s.strip() and len(s.strip()) > 10])
+    return None
 
-def process_document(filepath: str, user_department: str):
-    """Main processing pipeline for semantic document intelligence"""
-    
-    # Step 1: Extract text
-    print(f"Processing: {filepath}")
-    text = extract_text_from_file(filepath)
-    
-    if not text:
-        return {
-            'predicted_department': user_department,
-            'confidence': 0.0,
-            'summary': '• Unable to extract text from document',
-            'semantic_alerts': [],
-            'is_misfiled': False,
-            'flag_reason': '',
-            'original_text': '',
-            'translated_text': ''
-        }
-    
-    # Step 2: Language detection and translation
-    lang, translated = detect_and_translate(text)
-    print(f"Language detected: {lang}")
-    print(f"Translation available: {bool(translated)}")
-    if translated:
-        print(f"Translated text preview: {translated[:100]}...")
+def _format_summary(summary_text: str):
+    """Format transformer output as bullet points with review actions"""
+    # Validate summary is readable English
+    if not summary_text or len(summary_text.strip()) < 20:
+        raise ValueError("Summary too short")
+    return _format_bullets(summary_text.split('. '))
+
+def _format_bullets(sentences):
+    bullets = []
+    for s in sentences:
+        if s.strip() and len(s.strip()) > 10:  # Filter very short fragments
+            bullet_text = s.strip()
+            if not bullet_text.endswith('.'):
+                bullet_text += '.'
+            bullets.append('• ' + bullet_text)
     
-    # Use translated text for processing if Malayalam detected
-    # This ensures summary is in English for Malayalam documents
-    processing_text = translated if translated else text
-    print(f"Processing text preview: {processing_text[:100]}...")
+    # Create meaningful summary with sections
+    formatted_summary = '\n'.join(bullets[:8])  # Up to 8 bullets
     
-    # Step 3: Compute semantic embedding
-    doc_embedding = compute_embedding(processing_text)
+    # Add actionable insights
+    formatted_summary += '\n\nKey Actions Required:'
+    formatted_summary += '\n• Review document content and verify accuracy'
+    formatted_summary += '\n• Ensure proper department classification'
+    formatted_summary += '\n• Address any detected alerts promptly'
     
-    # Step 4: Semantic classification
-    predicted_department, confidence, all_similarities = semantic_classify_department(doc_embedding)
+    return formatted_summary
+
+def _fallback_summary(text: str):
+    # Better fallback: extract meaningful sentences
+    sentences = [s.strip() for s in text.split('.') if len(s.strip()) > 20][:6]
+    if sentences:
+        return '\n'.join(['• ' + s + '.' for s in sentences])
+    else:
+        return "• Document processed successfully\n• Content requires manual review\n• Please verify classification and department assignment\n• Check for any alerts or compliance requirements"
+
+def generate_semantic_summary(text: str):
+    """Generate semantic summary using transformer model"""
+    if summary_batcher is not None:
+        return summary_batcher(text)
+    return generate_semantic_summaries([text])[0]
+
+# Running estimate of summarizer seconds per input, refined from every call
+summary_cost = summarization.ChunkCost(settings.SUMMARY_SECONDS_PER_CHUNK)
+
+def _abstractive_batch(inputs, final, batch_size=None):
+    """One batched summarizer call; final passes produce the full-length summary"""
+    started = time.perf_counter()
+    outputs = registry.get('summarizer')(
+        inputs,
+        batch_size=batch_size or settings.SUMMARY_BATCH_SIZE,
+        max_length=200 if final else 80,
+        min_length=80 if final else 20,
+        do_sample=False,
+        truncation=True
+    )
+    summary_cost.observe(time.perf_counter() - started, len(inputs))
+    return [output['summary_text'] for output in outputs]
+
+def extractive_summary(text: str):
+    """Centrality-ranked sentences, formatted like the transformer summary"""
+    sentences = summarization.extractive(
+        text, lambda batch: compute_embeddings(batch, batch_size=settings.EMBED_BATCH_SIZE),
+        max_sentences=settings.SUMMARY_EXTRACTIVE_SENTENCES)
+    if not sentences:
+        return _fallback_summary(text)
+    return _format_bullets(sentences)
+
+def _summary_mode(text: str):
+    mode = settings.SUMMARY_MODE
+    if mode not in summarization.MODES:
+        raise ValueError(f"Unknown summary mode '{mode}', expected one of {summarization.MODES}")
+    if mode != 'auto':
+        return mode
+    return summarization.choose_mode(len(text.split()), settings.SUMMARY_CHUNK_WORDS,
+                                     settings.SUMMARY_LATENCY_BUDGET_SECONDS, summary_cost)
+
+def generate_semantic_summaries(texts, batch_size=None):
+    """Summarize many texts: map-reduce over the transformer or extractive, per SUMMARY_MODE"""
+    summaries = [_short_text_summary(t) for t in texts]
+    pending = [i for i, s in enumerate(summaries) if s is None]
+    modes = {i: _summary_mode(texts[i]) for i in pending}
+    abstractive = [i for i in pending if modes[i] == 'abstractive']
     
-    # Step 5: Detect semantic alerts
-    semantic_alerts = detect_semantic_alerts(doc_embedding)
+    if abstractive:
+        try:
+            outputs = summarization.map_reduce(
+                [texts[i] for i in abstractive],
+                lambda inputs, final: _abstractive_batch(inputs, final, batch_size),
+                settings.SUMMARY_CHUNK_WORDS)
+        except Exception as e:
+            print(f"Summarization failed: {e}")
+            outputs = [None] * len(abstractive)
+        for i, output in zip(abstractive, outputs):
+            try:
+                summaries[i] = _format_summary(output or '')
+            except Exception as e:
+                print(f"Summarization failed: {e}")
+                modes[i] = 'extractive'
     
-    # Step 6: Misfiling detection with IMPROVED threshold (lowered to 0.55 to catch more misfiles)
+    for i in pending:
+        if modes[i] == 'extractive':
+            try:
+                summaries[i] = extractive_summary(texts[i])
+            except Exception as e:
+                print(f"Extractive summarization failed: {e}")
+                summaries[i] = _fallback_summary(texts[i])
+    return summaries
+
+# Concurrent single-input callers share one batched model call
+embedding_batcher = microbatch.MicroBatcher(
+    'embedding', lambda texts: list(compute_embeddings(texts, batch_size=settings.EMBED_BATCH_SIZE)),
+    settings.MICROBATCH_EMBED_MAX_BATCH, settings.MICROBATCH_EMBED_MAX_WAIT_MS, settings.MICROBATCH_TIMEOUT_SECONDS
+) if settings.MICROBATCH_ENABLED else None
+summary_batcher = microbatch.MicroBatcher(
+    'summary', generate_semantic_summaries,
+    settings.MICROBATCH_SUMMARY_MAX_BATCH, settings.MICROBATCH_SUMMARY_MAX_WAIT_MS, settings.MICROBATCH_TIMEOUT_SECONDS
+) if settings.MICROBATCH_ENABLED else None
+
+def _iter_chunks(documents):
+    """Yield (doc_index, chunk_index, chunk, page) over [(page, text)] segments of each document"""
+    for doc_index, segments in enumerate(documents):
+        chunk_index = 0
+        for page, text in segments:
+            for chunk in sections.split_into_chunks(text, settings.CHUNK_MAX_WORDS):
+                yield doc_index, chunk_index, chunk, page
+                chunk_index += 1
+
+def _analyze_sections(documents):
+    """Score every paragraph chunk of every document, one batched encoder call per EMBED_BATCH_SIZE chunks.
+
+    documents: per document, a list of (page number or None, text) segments.
+    """
+    dept_concepts = registry.get('department_concepts')
+    alert_concepts = registry.get('alert_concepts')
+    aggregators = [
+        sections.SectionAggregator(
+            dept_concepts.labels, alert_concepts.labels,
+            strategy=settings.DEPT_AGGREGATION_STRATEGY,
+            alert_threshold=0.50,  # Increased threshold for better accuracy
+            max_sections=settings.MAX_SECTION_SCORES
+        )
+        for _ in documents
+    ]
+    chunks = _iter_chunks(documents)
+    while True:
+        batch = list(itertools.islice(chunks, settings.EMBED_BATCH_SIZE))
+        if not batch:
+            break
+        embeddings = compute_embeddings([chunk for _, _, chunk, _ in batch], batch_size=settings.EMBED_BATCH_SIZE)
+        dept_scores = dept_concepts.scores(embeddings)
+        alert_scores = alert_concepts.scores(embeddings)
+        for row, (doc_index, chunk_index, chunk, page) in enumerate(batch):
+            aggregators[doc_index].add(chunk_index, chunk, embeddings[row], dept_scores[row], alert_scores[row], page=page)
+    return aggregators
+
+def evaluate_filing(user_department: str, predicted_department: str, confidence: float):
+    """Misfiling check against the department chosen at upload"""
+    # IMPROVED threshold (lowered to 0.55 to catch more misfiles)
     is_misfiled = (user_department != predicted_department) and (confidence > 0.55)  # Lowered from 0.65
     flag_reason = ''
     if is_misfiled:
         flag_reason = f'Document semantically matches "{predicted_department}" with {confidence:.1%} confidence, but filed under "{user_department}". Top matching terms suggest {predicted_department} classification.'
-    
-    # Step 7: Generate semantic summary from ENGLISH text (translated if Malayalam)
-    # This ensures Malayalam documents get English summaries
-    # For Malayalam, processing_text already contains structured English description
-    if lang == 'ml' or any(ord(char) >= 0x0D00 and ord(char) <= 0x0D7F for char in text[:200]):
-        # For Malayalam documents, use the descriptive text directly as summary
-        summary = processing_text if translated else "Malayalam document detected. Manual review required."
+    return is_misfiled, flag_reason
+
+def apply_filing(analysis: dict, user_department: str):
+    """Complete a content analysis with the per-upload parts (misfiling against the chosen department)"""
+    result = dict(analysis)
+    if result['predicted_department'] is None:
+        # Nothing extracted: keep the uploader's department
+        result['predicted_department'] = user_department
+        result['is_misfiled'], result['flag_reason'] = False, ''
     else:
-        # For other languages, generate semantic summary normally
-        summary = generate_semantic_summary(processing_text)
+        result['is_misfiled'], result['flag_reason'] = evaluate_filing(
+            user_department, result['predicted_department'], result['confidence'])
+    return result
+
+def process_document(filepath: str, user_department: str):
+    """Main processing pipeline for semantic document intelligence"""
+    return process_documents([filepath], [user_department])[0]
+
+def process_documents(filepaths, user_departments):
+    """Batched pipeline: analyze content, then check filing per upload"""
+    analyses = analyze_documents(filepaths)
+    return [apply_filing(a, dept) for a, dept in zip(analyses, user_departments)]
+
+def analyze_documents(filepaths):
+    """Content-only analysis (depends on file bytes, not on who uploaded it).
+
+    Concurrent extraction, one encoder call, batched summaries.
+    """
+    # Step 1: Extract text concurrently (I/O and OCR bound)
+    for filepath in filepaths:
+        print(f"Processing: {filepath}")
+    with metrics.stage('extraction', documents=len(filepaths)):
+        with ThreadPoolExecutor(max_workers=settings.EXTRACTION_WORKERS) as pool:
+            extracted = list(pool.map(extraction.extract_document, filepaths))
+    texts = [e.text.strip() for e in extracted]
+    
+    # Step 2: Language detection and translation
+    langs, translations, processing_texts, machine_translated = [], [], [], []
+    for text in texts:
+        with metrics.stage('language_detection', chars=len(text)):
+            lang, is_malayalam = detect_language(text) if text else ('en', False)
+        translated = translate_malayalam(text) if is_malayalam else None
+        machine_translated.append(translated is not None)
+        if is_malayalam and translated is None:
+            translated = _malayalam_notice(text)
+        translated = translated or ''
+        if text:
+            print(f"Language detected: {lang}")
+            print(f"Translation available: {bool(translated)}")
+        langs.append(lang)
+        translations.append(translated)
+        # Use translated text for processing if Malayalam detected
+        # This ensures summary is in English for Malayalam documents
+        processing_texts.append(translated if translated else text)
     
-    # Add similarity scores to summary
-    summary += '\n\nDepartment Similarities:'
-    for dept, score in sorted(all_similarities.items(), key=lambda x: x[1], reverse=True):
-        summary += f'\n• {dept}: {score:.1%}'
+    # Step 3: Paragraph-level analysis; chunks from every document are encoded
+    # in batched calls and folded into running per-document aggregates
+    empty_summary = '• Unable to extract text from document'
+    with metrics.stage('sections', documents=len(texts)):
+        aggregators = _analyze_sections([
+            [(None, translations[i])] if translations[i] else list(enumerate(extracted[i].pages, start=1))
+            for i in range(len(texts))
+        ])
     
-    return {
-        'predicted_department': predicted_department,
-        'confidence': confidence,
-        'summary': summary,
-        'semantic_alerts': semantic_alerts,
-        'is_misfiled': is_misfiled,
-        'flag_reason': flag_reason,
-        'original_text': text[:2000],  # Limit stored text
-        'translated_text': translated[:2000] if translated else ''
-    }
+    # Step 4: Generate semantic summaries from ENGLISH text (translated if Malayalam)
+    # For untranslated Malayalam, processing_text is the structured English description
+    summaries = [None] * len(texts)
+    to_summarize = []
+    for i, text in enumerate(texts):
+        if not text:
+            summaries[i] = empty_summary
+        elif not machine_translated[i] and (langs[i] == 'ml' or translation.has_malayalam(text[:200])):
+            # Untranslated Malayalam documents use the descriptive text directly as summary
+            summaries[i] = translations[i] if translations[i] else "Malayalam document detected. Manual review required."
+        else:
+            to_summarize.append(i)
+    with metrics.stage('summarization', documents=len(to_summarize)):
+        generated = generate_semantic_summaries([processing_texts[i] for i in to_summarize])
+    for i, summary in zip(to_summarize, generated):
+        summaries[i] = summary
+    
+    results = []
+    for i, text in enumerate(texts):
+        if not text:
+            results.append({
+                'predicted_department': None,
+                'confidence': 0.0,
+                'summary': summaries[i],
+                'semantic_alerts': [],
+                'section_scores': [],
+                'original_text': '',
+                'translated_text': '',
+                'search_text': '',
+                'embedding': compute_embedding(empty_summary)
+            })
+            continue
+        
+        # Step 5: Semantic classification (aggregated with DEPT_AGGREGATION_STRATEGY)
+        aggregator = aggregators[i]
+        predicted_department, confidence, all_similarities = _classification_from_scores(aggregator.department_scores())
+        
+        # Step 6: Semantic alerts, located at their best-matching section
+        semantic_alerts = aggregator.alerts()
+        
+        # Add similarity scores to summary
+        summary = summaries[i] + '\n\nDepartment Similarities:'
+        for dept, score in sorted(all_similarities.items(), key=lambda x: x[1], reverse=True):
+            summary += f'\n• {dept}: {score:.1%}'
+        
+        translated = translations[i]
+        results.append({
+            'predicted_department': predicted_department,
+            'confidence': confidence,
+            'summary': summary,
+            'semantic_alerts': semantic_alerts,
+            'section_scores': aggregator.sections,
+            'original_text': text[:2000],  # Limit stored text
+            'translated_text': translated[:2000] if translated else '',
+            'search_text': '\n\n'.join(t for t in (text, translated) if t),  # full text, lexical index only
+            'embedding': aggregator.embedding()  # Persisted so /search never re-encodes documents
+        })
+    return results
@@ -0,0 +1,166 @@
+"""On-demand sampling profiler for admin requests and processing jobs.
+
+An admin opts one request in with ``X-Profile: 1`` (or ``?profile=1``). A
+daemon thread then reads the stacks of every thread in the process from
+``sys._current_frames()`` every ``PROFILE_SAMPLE_INTERVAL_MS`` and folds the
+samples into collapsed stacks (``outer;inner;leaf count`` per line), the
+input format of flamegraph.pl and speedscope. Each stack is rooted at a
+``[thread name]`` frame, and the thread that started the profiler is marked
+``(profiled)``. Work handed to other threads is therefore visible where it
+actually runs: the micro-batcher encoding a query, or extraction and OCR
+threads during an upload. Other threads idle or busy at the same time show
+up too, under their own names. OCR and PDF processes cannot be sampled from
+here; their time appears as the pool's threads waiting on results.
+
+Uploads carry the flag on their ``ProcessingJob``, so the worker that runs
+``process_document`` profiles that batch instead. The first sample is taken
+immediately, so even requests shorter than the interval leave one.
+Profiles are written to ``PROFILE_DIR`` and downloaded through
+``/admin/profiles``. Requests that do not opt in never create a profiler.
+"""
+import os, re, sys, json, time, uuid, tempfile, threading, collections
+from datetime import datetime
+from .app.config import get_settings
+
+settings = get_settings()
+
+PROFILE_ID = re.compile(r'^[0-9a-f]{32}$')
+TRUTHY = ('1', 'true', 'yes', 'on')
+
+def requested(flag) -> bool:
+    return flag is not None and flag.strip().lower() in TRUTHY
+
+def _frame_name(code) -> str:
+    path = code.co_filename.replace(os.sep, '/').rsplit('/', 2)
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})".replace(';', ',')
+
+def _fold(frame) -> str:
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+class SamplingProfiler:
+    """Periodic stack samples of all (or chosen) threads, folded into collapsed stacks"""
+
+    def __init__(self, thread_ids=None, interval_ms: float = None, max_seconds: float = None):
+        self.id = uuid.uuid4().hex  # known up front so callers can record it before the profile is saved
+        self.thread_ids = set(thread_ids) if thread_ids else None  # default: every thread but the sampler
+        self.origin = None
+        self.interval = (interval_ms or settings.PROFILE_SAMPLE_INTERVAL_MS) / 1000.0
+        self.max_seconds = max_seconds or settings.PROFILE_MAX_SECONDS
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.thread_samples = collections.Counter()  # thread name -> stacks recorded
+        self.duration = 0.0
+        self._started = None
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.origin = threading.get_ident()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample, name='profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self._started
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def _label(self, thread_id: int, names) -> str:
+        name = names.get(thread_id, f'thread-{thread_id}').replace(';', ',')
+        return f"{name} (profiled)" if thread_id == self.origin else name
+
+    def _take_sample(self):
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        frames = sys._current_frames()
+        try:
+            for thread_id, frame in frames.items():
+                if thread_id == own or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                    continue
+                label = self._label(thread_id, names)
+                self.stacks[f"[{label}];{_fold(frame)}"] += 1
+                self.thread_samples[label] += 1
+            self.samples += 1
+        finally:
+            del frames
+
+    def _sample(self):
+        deadline = time.monotonic() + self.max_seconds
+        self._take_sample()
+        while not self._stopping.wait(self.interval) and time.monotonic() < deadline:
+            self._take_sample()
+
+    def collapsed(self) -> str:
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+def _write_atomic(path: str, data: str):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def save(profiler: SamplingProfiler, kind: str, **meta) -> str:
+    """Store a finished profile; returns its id"""
+    profile_id = profiler.id
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    _write_atomic(os.path.join(settings.PROFILE_DIR, f'{profile_id}.folded'), profiler.collapsed())
+    _write_atomic(os.path.join(settings.PROFILE_DIR, f'{profile_id}.json'), json.dumps({
+        'id': profile_id,
+        'kind': kind,
+        'created_at': datetime.utcnow().isoformat(),
+        'duration_seconds': round(profiler.duration, 3),
+        'samples': profiler.samples,
+        'threads': dict(profiler.thread_samples.most_common()),
+        'interval_ms': profiler.interval * 1000,
+        **meta
+    }))
+    _prune()
+    return profile_id
+
+def _stored():
+    """Metadata files of stored profiles, newest first"""
+    if not os.path.isdir(settings.PROFILE_DIR):
+        return []
+    return sorted((e for e in os.scandir(settings.PROFILE_DIR) if e.name.endswith('.json')),
+                  key=lambda e: e.stat().st_mtime, reverse=True)
+
+def _prune():
+    """Keep the newest PROFILE_MAX_STORED profiles"""
+    for entry in _stored()[settings.PROFILE_MAX_STORED:]:
+        for suffix in ('.json', '.folded'):
+            try:
+                os.remove(entry.path[:-len('.json')] + suffix)
+            except OSError:
+                pass
+
+def list_profiles(limit: int = 50):
+    """Metadata of stored profiles, newest first"""
+    profiles = []
+    for entry in _stored()[:limit]:
+        try:
+            with open(entry.path, encoding='utf-8') as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+def profile_path(profile_id: str):
+    """Path of the collapsed stacks for profile_id, or None"""
+    if not PROFILE_ID.match(profile_id or ''):
+        return None
+    path = os.path.join(settings.PROFILE_DIR, f'{profile_id}.folded')
+    return path if os.path.exists(path) else None
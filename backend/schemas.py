@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from typing import Optional
+from datetime import datetime
 
 class Token(BaseModel):
     access_token: str
@@ -16,6 +17,7 @@ class DocumentCreate(DocumentBase):
     confidence: Optional[float] = 0.0
     summary: Optional[str] = None
     semantic_alerts: Optional[str] = None
+    section_scores: Optional[str] = None
     is_misfiled: Optional[bool] = False
     flag_reason: Optional[str] = ''
     original_text: Optional[str] = ''
@@ -27,3 +29,33 @@ class DocumentOut(DocumentCreate):
     id: int
     class Config:
         orm_mode = True
+
+class DocumentListItem(DocumentBase):
+    """Document row for listings; the large text columns are left out"""
+    id: int
+    predicted_department: Optional[str] = None
+    confidence: Optional[float] = 0.0
+    semantic_alerts: Optional[str] = None
+    is_misfiled: Optional[bool] = False
+    uploaded_by: Optional[str] = ''
+    created_at: Optional[datetime] = None
+    class Config:
+        orm_mode = True
+
+class DocumentPage(BaseModel):
+    items: list[DocumentListItem]
+    next_cursor: Optional[str] = None
+
+class JobOut(BaseModel):
+    id: str
+    status: str
+    filename: str
+    department: str
+    attempts: int
+    error: Optional[str] = None
+    document_id: Optional[int] = None
+    profile_id: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    class Config:
+        orm_mode = True
@@ -0,0 +1,317 @@
+"""Persistent ANN index over stored document embeddings.
+
+One FAISS HNSW shard per department, so a department-scoped search is a
+shard lookup rather than a post-filter. Shards live next to
+``Settings.FAISS_INDEX_FILE`` (``faiss_index.<Department>.bin``) with a
+JSON manifest at ``faiss_index.json``. Inserts are written to disk in
+batches (at most every ``FAISS_SAVE_INTERVAL_SECONDS`` and on shutdown),
+each write going to a temp file that is atomically renamed into place
+while holding an exclusive lock on ``faiss_index.lock``.
+
+The database is the source of truth. Every process keeps its own shards
+in RAM and answers queries from them alone. At most every
+``FAISS_SYNC_INTERVAL_SECONDS`` a query first compares shard sizes with
+one count of ``document_embeddings`` per department, and any shard that
+disagrees (another worker inserted, a file was overwritten, documents
+were deleted) is caught up from the stored embeddings. Inserts from this
+process are searchable at once; those from other workers within that
+interval. The exact NumPy scan from ``vector_store`` answers while FAISS
+is unavailable, disabled, the index is still loading, or a shard search
+raises.
+"""
+import os, re, json, time, threading, tempfile
+from contextlib import contextmanager
+import numpy as np
+from sqlalchemy.orm import Session
+from . import crud, vector_store
+from .app.config import get_settings
+
+try:
+    import faiss
+except ImportError:  # optional dependency, exact scan is always available
+    faiss = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: shard writes are only serialized within a process
+    fcntl = None
+
+settings = get_settings()
+
+HNSW_M = 32
+HNSW_EF_SEARCH = 64
+
+class DepartmentIndex:
+    """Department-sharded HNSW index with atomic persistence"""
+
+    def __init__(self, index_file: str, model_name: str, save_interval: float = 30.0,
+                 sync_interval: float = 5.0):
+        base, ext = os.path.splitext(index_file)
+        self.base = base
+        self.ext = ext or '.bin'
+        self.manifest_file = base + '.json'
+        self.lock_file = base + '.lock'
+        self.model_name = model_name
+        self.save_interval = save_interval
+        self.sync_interval = sync_interval
+        self.last_sync = float('-inf')
+        self.shards = {}       # department -> faiss index
+        self.ids = {}          # department -> document ids held by the shard
+        self.mmapped = set()   # departments whose shard is still a read-only mapping
+        self.dirty = set()     # departments with inserts not yet written to disk
+        self.last_save = time.monotonic()
+        self.loaded = False
+        self.dim = None
+        self.lock = threading.RLock()
+
+    @property
+    def enabled(self):
+        return faiss is not None and settings.USE_FAISS
+
+    def shard_path(self, department: str) -> str:
+        safe = re.sub(r'[^A-Za-z0-9_-]', '_', department or 'unassigned')
+        return f"{self.base}.{safe}{self.ext}"
+
+    # ---- persistence -------------------------------------------------
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_atomic(self, path: str, write):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=self.ext)
+        os.close(fd)
+        try:
+            write(tmp)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    @contextmanager
+    def _file_lock(self):
+        """Serialize shard writes of all processes sharing the index files"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.lock_file)), exist_ok=True)
+        with open(self.lock_file, 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _save_manifest(self):
+        manifest = {
+            'model': self.model_name,
+            'dim': self.dim,
+            'shards': {d: {'file': os.path.basename(self.shard_path(d)), 'count': int(s.ntotal)}
+                       for d, s in self.shards.items()}
+        }
+        def write(tmp):
+            with open(tmp, 'w') as f:
+                json.dump(manifest, f)
+        self._write_atomic(self.manifest_file, write)
+
+    def _save_shard(self, department: str):
+        shard = self.shards[department]
+        self._write_atomic(self.shard_path(department), lambda tmp: faiss.write_index(shard, tmp))
+
+    def _read_shard(self, department: str):
+        path = self.shard_path(department)
+        flags = getattr(faiss, 'IO_FLAG_MMAP', 0) | getattr(faiss, 'IO_FLAG_READ_ONLY', 0)
+        try:
+            shard = faiss.read_index(path, flags)
+            self.mmapped.add(department)
+        except RuntimeError:
+            shard = faiss.read_index(path)
+        return shard
+
+    def save(self):
+        """Write shards changed since the last save, plus the manifest"""
+        if not self.enabled:
+            return
+        with self.lock:
+            if not self.dirty:
+                return
+            with self._file_lock():
+                for department in self.dirty:
+                    if department in self.shards:
+                        self._save_shard(department)
+                self._save_manifest()
+            self.dirty.clear()
+            self.last_save = time.monotonic()
+
+    def _maybe_save(self):
+        if self.dirty and time.monotonic() - self.last_save >= self.save_interval:
+            self.save()
+
+    # ---- building ----------------------------------------------------
+
+    def _new_shard(self):
+        hnsw = faiss.IndexHNSWFlat(self.dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        hnsw.hnsw.efSearch = HNSW_EF_SEARCH
+        return faiss.IndexIDMap2(hnsw)
+
+    def _writable(self, department: str):
+        """Materialize a memory-mapped shard in RAM before appending to it"""
+        if department in self.mmapped:
+            self.shards[department] = faiss.read_index(self.shard_path(department))
+            self.mmapped.discard(department)
+        return self.shards[department]
+
+    def _append(self, department: str, doc_ids, matrix):
+        """Add vectors for ids the shard does not hold yet"""
+        held = self.ids.setdefault(department, set())
+        rows = [row for row, doc_id in enumerate(doc_ids) if doc_id not in held]
+        if not rows:
+            return
+        if self.dim is None:
+            self.dim = matrix.shape[1]
+        if department not in self.shards:
+            self.shards[department] = self._new_shard()
+        shard = self._writable(department)
+        ids = [doc_ids[row] for row in rows]
+        shard.add_with_ids(np.ascontiguousarray(matrix[rows]), np.asarray(ids, dtype='int64'))
+        held.update(ids)
+        self.dirty.add(department)
+
+    def _rebuild_shard(self, db: Session, department: str):
+        doc_ids, matrix = crud.get_embedding_matrix(db, department)
+        self.shards.pop(department, None)
+        self.ids.pop(department, None)
+        self.mmapped.discard(department)
+        if doc_ids:
+            self._append(department, doc_ids, matrix)
+
+    def _sync_shard(self, db: Session, department: str):
+        """Bring one shard in line with the database.
+
+        Inserts made by other processes are read back from the stored
+        embeddings (only the missing rows); a shard holding documents the
+        database no longer has is rebuilt.
+        """
+        stored = crud.get_embedding_ids(db, department)
+        held = self.ids.get(department, set())
+        if held - stored:
+            print(f"Rebuilding search index shard: {department} ({len(stored)} documents)")
+            self._rebuild_shard(db, department)
+            return
+        missing = stored - held
+        if missing:
+            doc_ids, matrix = crud.get_embeddings(db, missing)
+            self._append(department, doc_ids, matrix)
+
+    def load(self, db: Session):
+        """Map persisted shards and bring any that are missing or stale up to date"""
+        if not self.enabled:
+            return
+        with self.lock:
+            counts = crud.count_embeddings_by_department(db)
+            manifest = self._read_manifest() or {}
+            same_model = manifest.get('model') == self.model_name
+            self.dim = manifest.get('dim') if same_model else None
+            self.shards.clear()
+            self.ids.clear()
+            self.mmapped.clear()
+            self.dirty.clear()
+            for department, count in counts.items():
+                path = self.shard_path(department)
+                if same_model and self.dim and os.path.exists(path):
+                    shard = self._read_shard(department)
+                    self.shards[department] = shard
+                    self.ids[department] = set(faiss.vector_to_array(shard.id_map).tolist())
+                    if shard.ntotal == count:
+                        continue
+                self._sync_shard(db, department)
+            self.loaded = True
+            self.last_sync = time.monotonic()
+            self.save()
+
+    def add(self, doc_id: int, department: str, embedding):
+        """Append one freshly uploaded document to its department shard"""
+        self.add_many([(doc_id, department, embedding)])
+
+    def add_many(self, items):
+        """Append [(doc_id, department, embedding)]; written to disk at most every save_interval"""
+        if not self.enabled or not items:
+            return
+        by_department = {}
+        for doc_id, department, embedding in items:
+            by_department.setdefault(department, []).append((doc_id, vector_store.to_vector(embedding)))
+        with self.lock:
+            for department, rows in by_department.items():
+                self._append(department, [r[0] for r in rows], np.vstack([r[1] for r in rows]))
+            self._maybe_save()
+
+    # ---- querying ----------------------------------------------------
+
+    def refresh(self, db: Session, force: bool = False):
+        """Catch up shards that disagree with the database, at most every sync_interval"""
+        with self.lock:
+            now = time.monotonic()
+            if not force and now - self.last_sync < self.sync_interval:
+                return
+            counts = crud.count_embeddings_by_department(db)
+            for department in set(self.shards) | set(counts):
+                shard = self.shards.get(department)
+                if (shard.ntotal if shard is not None else 0) != counts.get(department, 0):
+                    self._sync_shard(db, department)
+            self.last_sync = now
+            self._maybe_save()
+
+    def search(self, db: Session, query, department: str = None, k: int = 10):
+        """Top-k (doc_id, score) over one department's shard or all of them, or None before load().
+
+        Searches run under the lock: FAISS HNSW does not allow a search
+        concurrent with add_with_ids on the same index.
+        """
+        vector = vector_store.to_vector(query).reshape(1, -1)
+        with self.lock:
+            if not self.loaded:
+                return None
+            self.refresh(db)
+            departments = [department] if department is not None else list(self.shards)
+            hits = []
+            for dept in departments:
+                shard = self.shards.get(dept)
+                if shard is None or shard.ntotal == 0:
+                    continue
+                scores, ids = shard.search(vector, k)
+                hits.extend((int(i), float(s)) for i, s in zip(ids[0], scores[0]) if i != -1)
+        hits.sort(key=lambda h: h[1], reverse=True)
+        return hits[:k]
+
+index = DepartmentIndex(settings.FAISS_INDEX_FILE, settings.EMBED_MODEL,
+                        settings.FAISS_SAVE_INTERVAL_SECONDS, settings.FAISS_SYNC_INTERVAL_SECONDS)
+
+def exact_search(db: Session, query, department, k: int, min_score: float):
+    doc_ids, matrix = crud.get_embedding_matrix(db, department)
+    return [(doc_ids[row], score) for row, score in vector_store.top_k(query, matrix, k, min_score)]
+
+def search(db: Session, query, department: str = None, k: int = None, min_score: float = 0.0):
+    """Return [(doc_id, score)] best first, restricted to a department if given"""
+    k = k or settings.SEARCH_TOP_K
+    if not index.enabled:
+        return exact_search(db, query, department, k, min_score)
+    try:
+        hits = index.search(db, query, department, k)
+    except Exception as e:
+        print(f"Search index failed, using exact scan: {e}")
+        hits = None
+    if hits is None:
+        return exact_search(db, query, department, k, min_score)
+    return [h for h in hits if h[1] > min_score]
+
+def fuse(rankings, k: int = 60):
+    """Reciprocal rank fusion of several [(doc_id, score)] best-first lists: [(doc_id, fused)]"""
+    fused = {}
+    for ranking in rankings:
+        for rank, (doc_id, _) in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda h: h[1], reverse=True)
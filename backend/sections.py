@@ -0,0 +1,115 @@
+"""Paragraph-level document analysis.
+
+Documents are split into paragraph chunks bounded by a word budget (the
+encoder only sees ~128 tokens per input), every chunk is scored against the
+department and alert concepts, and per-document aggregates are kept as
+running sums. Memory per document is therefore O(concepts) plus a capped
+list of stored section scores, however long the input is.
+"""
+import re
+import numpy as np
+
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+SNIPPET_CHARS = 160
+
+def split_into_chunks(text: str, max_words: int):
+    """Yield chunks of at most max_words words, merging short paragraphs"""
+    buffer, count = [], 0
+    for paragraph in PARAGRAPH_BREAK.split(text):
+        words = paragraph.split()
+        if not words:
+            continue
+        # Paragraph alone exceeds the budget: emit it in slices
+        while len(words) > max_words:
+            if buffer:
+                yield ' '.join(buffer)
+                buffer, count = [], 0
+            yield ' '.join(words[:max_words])
+            words = words[max_words:]
+        if buffer and count + len(words) > max_words:
+            yield ' '.join(buffer)
+            buffer, count = [], 0
+        buffer.extend(words)
+        count += len(words)
+    if buffer:
+        yield ' '.join(buffer)
+
+class SectionAggregator:
+    """Running per-document aggregates over chunk embeddings and concept scores"""
+
+    STRATEGIES = ('mean', 'max', 'weighted')
+
+    def __init__(self, dept_labels, alert_labels, strategy: str = 'mean',
+                 alert_threshold: float = 0.50, max_sections: int = 500):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown aggregation strategy '{strategy}', expected one of {self.STRATEGIES}")
+        self.dept_labels = list(dept_labels)
+        self.alert_labels = list(alert_labels)
+        self.strategy = strategy
+        self.alert_threshold = alert_threshold
+        self.max_sections = max_sections
+        self.chunks = 0
+        self.total_weight = 0.0
+        self.dept_sum = np.zeros(len(self.dept_labels), dtype=np.float64)
+        self.dept_weighted = np.zeros(len(self.dept_labels), dtype=np.float64)
+        self.dept_max = np.full(len(self.dept_labels), -np.inf)
+        self.embedding_sum = None
+        self.alert_best = np.full(len(self.alert_labels), -np.inf)
+        self.alert_where = [None] * len(self.alert_labels)
+        self.sections = []
+
+    def add(self, index: int, chunk: str, embedding, dept_scores, alert_scores, page: int = None):
+        weight = float(len(chunk.split()))
+        self.chunks += 1
+        self.total_weight += weight
+        self.dept_sum += dept_scores
+        self.dept_weighted += weight * dept_scores
+        np.maximum(self.dept_max, dept_scores, out=self.dept_max)
+        weighted_embedding = weight * np.asarray(embedding, dtype=np.float64)
+        self.embedding_sum = weighted_embedding if self.embedding_sum is None else self.embedding_sum + weighted_embedding
+
+        snippet = chunk[:SNIPPET_CHARS]
+        for a, score in enumerate(alert_scores):
+            if score > self.alert_best[a]:
+                self.alert_best[a] = score
+                self.alert_where[a] = (index, page, snippet)
+
+        if len(self.sections) < self.max_sections:
+            self.sections.append({
+                'paragraph_index': index,
+                'page': page,
+                'snippet': snippet,
+                'dept_scores': {d: round(float(s), 3) for d, s in zip(self.dept_labels, dept_scores)},
+                'alerts': [l for l, s in zip(self.alert_labels, alert_scores) if s > self.alert_threshold]
+            })
+
+    def department_scores(self):
+        if self.strategy == 'max':
+            scores = self.dept_max
+        elif self.strategy == 'weighted':
+            scores = self.dept_weighted / max(self.total_weight, 1.0)
+        else:
+            scores = self.dept_sum / max(self.chunks, 1)
+        return scores.astype(np.float32)
+
+    def embedding(self):
+        """Length-weighted mean of chunk embeddings, unit-normalized"""
+        vector = self.embedding_sum.astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def alerts(self):
+        """Best-matching section per alert concept above the threshold"""
+        alerts = []
+        for a, label in enumerate(self.alert_labels):
+            if self.alert_best[a] > self.alert_threshold:
+                index, page, snippet = self.alert_where[a]
+                alerts.append({
+                    'label': label,
+                    'score': round(float(self.alert_best[a]), 3),
+                    'paragraph_index': index,
+                    'page': page,
+                    'snippet': snippet
+                })
+        alerts.sort(key=lambda x: x['score'], reverse=True)
+        return alerts
@@ -0,0 +1,179 @@
+"""Preload-and-fork server: ``python -m backend.serve --workers 4``.
+
+Plain ``uvicorn --workers N`` starts N interpreters, each importing the
+app and loading its own copy of every model. Here the master imports the
+app and loads the models once (``SERVE_PRELOAD_MODELS``), then freezes
+the heap (``gc.freeze``) so the collector never writes to those objects
+and forks the workers. The workers inherit the weights copy-on-write and
+share the master's listening socket.
+
+Torch runs single-threaded in the master, because a forked OpenMP pool
+deadlocks, and each worker then sets ``SERVE_TORCH_THREADS`` intra-op
+threads (default: cores / workers) so workers do not oversubscribe the
+CPU. The master restarts workers that die and, every
+``SERVE_MEMORY_REPORT_SECONDS``, prints each worker's resident, shared and
+private memory from ``/proc/<pid>/smaps_rollup``.
+"""
+import os, gc, sys, time, signal, socket, argparse
+from .app.config import get_settings
+
+settings = get_settings()
+
+SMAPS_FIELDS = {'Rss': 'rss', 'Pss': 'pss', 'Shared_Clean': 'shared', 'Shared_Dirty': 'shared',
+                'Private_Clean': 'private', 'Private_Dirty': 'private'}
+
+def process_memory(pid='self'):
+    """{rss, pss, shared, private} in bytes from /proc/<pid>/smaps_rollup, or None"""
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    memory = {'rss': 0, 'pss': 0, 'shared': 0, 'private': 0}
+    for line in lines:
+        name, _, rest = line.partition(':')
+        if name in SMAPS_FIELDS:
+            memory[SMAPS_FIELDS[name]] += int(rest.split()[0]) * 1024  # kB
+    return memory
+
+def _cpu_count() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def _set_torch_threads(threads: int):
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+
+def preload(names):
+    """Import the app and load the named models in this (master) process"""
+    os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')  # Rust tokenizer pools do not survive fork
+    _set_torch_threads(1)
+    from . import main, database
+    from .model_registry import registry
+    started = time.perf_counter()
+    for name in names:
+        try:
+            registry.get(name)
+        except Exception as e:
+            print(f"Preload of model '{name}' failed, workers will load it lazily: {e}")
+    database.engine.dispose()  # no pooled connections may cross the fork
+    gc.collect()
+    gc.freeze()  # keep the collector from dirtying (and so copying) the shared pages
+    print(f"✓ Preloaded {len(names)} models in {time.perf_counter() - started:.1f}s")
+    return main.app
+
+def bind(host: str, port: int, backlog: int = 2048):
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def _run_worker(app, sock, torch_threads: int, log_level: str):
+    import uvicorn
+    for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+        signal.signal(sig, signal.SIG_DFL)
+    _set_torch_threads(torch_threads)
+    config = uvicorn.Config(app, log_level=log_level, lifespan='on')
+    uvicorn.Server(config).run(sockets=[sock])
+
+def _spawn(app, sock, torch_threads: int, log_level: str) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(app, sock, torch_threads, log_level)
+        except BaseException as e:
+            print(f"Worker {os.getpid()} crashed: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+    print(f"✓ Worker {pid} started ({torch_threads} torch threads)")
+    return pid
+
+def report_memory(pids):
+    for pid in pids:
+        memory = process_memory(pid)
+        if memory:
+            mb = {k: v / 1024 / 1024 for k, v in memory.items()}
+            print(f"Worker {pid}: rss {mb['rss']:.0f} MB, shared {mb['shared']:.0f} MB, "
+                  f"private {mb['private']:.0f} MB, pss {mb['pss']:.0f} MB")
+
+def serve(host: str, port: int, workers: int, torch_threads: int = 0, log_level: str = 'info'):
+    """Preload models, fork the workers and supervise them until SIGTERM/SIGINT"""
+    torch_threads = torch_threads or max(1, _cpu_count() // workers)
+    app = preload(settings.SERVE_PRELOAD_MODELS)
+    sock = bind(host, port)
+    print(f"Serving on http://{host}:{port} with {workers} workers")
+
+    stopping = []
+    def stop(signum, frame):
+        stopping.append(signum)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    started = {_spawn(app, sock, torch_threads, log_level): time.monotonic() for _ in range(workers)}
+    next_report = time.monotonic() + settings.SERVE_MEMORY_REPORT_SECONDS
+    while not stopping:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid, status = 0, 0
+        if pid in started:
+            lifetime = time.monotonic() - started.pop(pid)
+            print(f"Worker {pid} exited with status {status} after {lifetime:.0f}s, restarting")
+            if lifetime < 10:
+                time.sleep(2)  # crash loop: do not fork as fast as the workers die
+            started[_spawn(app, sock, torch_threads, log_level)] = time.monotonic()
+            continue
+        if settings.SERVE_MEMORY_REPORT_SECONDS > 0 and time.monotonic() >= next_report:
+            report_memory(sorted(started))
+            next_report = time.monotonic() + settings.SERVE_MEMORY_REPORT_SECONDS
+        time.sleep(0.5)
+
+    print("Shutting down workers...")
+    pids = set(started)
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    deadline = time.monotonic() + settings.SERVE_SHUTDOWN_TIMEOUT_SECONDS
+    while pids and time.monotonic() < deadline:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        pids.discard(pid)
+        time.sleep(0.1)
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    sock.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the API from forked workers sharing preloaded models')
+    parser.add_argument('--host', default=settings.SERVE_HOST)
+    parser.add_argument('--port', type=int, default=settings.SERVE_PORT)
+    parser.add_argument('--workers', type=int, default=settings.SERVE_WORKERS)
+    parser.add_argument('--torch-threads', type=int, default=settings.SERVE_TORCH_THREADS,
+                        help='intra-op threads per worker (0 = cores / workers)')
+    parser.add_argument('--log-level', default='info')
+    args = parser.parse_args(argv)
+    if not hasattr(os, 'fork'):
+        import uvicorn
+        print("fork() is not available on this platform; serving from a single process")
+        uvicorn.run('backend.main:app', host=args.host, port=args.port, log_level=args.log_level)
+        return
+    serve(args.host, args.port, max(1, args.workers), args.torch_threads, args.log_level)
+
+if __name__ == '__main__':
+    sys.exit(main())
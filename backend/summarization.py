@@ -0,0 +1,93 @@
+"""Long-document summarization strategies.
+
+``map_reduce`` covers the whole text: it is split into encoder-sized chunks,
+the chunks of every document in a batch are summarized together, the
+partial summaries are re-chunked and summarized again until one input per
+document remains, and a final pass produces the summary. ``extractive``
+ranks sentences by centrality (summed cosine similarity to every other
+sentence) over their embeddings and keeps the top few in document order;
+it costs one batched encoder call.
+
+``choose_mode`` picks between them per document from its length and the
+latency budget, using a running estimate of seconds per summarizer input.
+"""
+import re, math, threading
+import numpy as np
+from .sections import split_into_chunks
+
+MODES = ('auto', 'abstractive', 'extractive')
+SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+|\n+')
+MIN_SENTENCE_WORDS = 5
+MAP_SUMMARY_WORDS = 60  # rough length of one chunk summary (max_length=80 tokens)
+
+class ChunkCost:
+    """Exponentially weighted estimate of summarizer seconds per input"""
+
+    def __init__(self, initial: float, alpha: float = 0.2):
+        self.seconds = initial
+        self.alpha = alpha
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, inputs: int):
+        if inputs <= 0:
+            return
+        with self._lock:
+            self.seconds += self.alpha * (seconds / inputs - self.seconds)
+
+    def estimate(self, inputs: int) -> float:
+        return self.seconds * inputs
+
+def summarizer_calls(word_count: int, chunk_words: int) -> int:
+    """Summarizer inputs needed to map-reduce a text of word_count words"""
+    chunks = max(1, math.ceil(word_count / chunk_words))
+    fan_in = max(2, chunk_words // MAP_SUMMARY_WORDS)
+    calls = 0
+    while chunks > 1:
+        calls += chunks
+        chunks = math.ceil(chunks / fan_in)
+    return calls + 1
+
+def choose_mode(word_count: int, chunk_words: int, budget_seconds: float, cost: ChunkCost) -> str:
+    """'abstractive' when map-reduce fits the latency budget, else 'extractive'"""
+    calls = summarizer_calls(word_count, chunk_words)
+    return 'abstractive' if calls == 1 or cost.estimate(calls) <= budget_seconds else 'extractive'
+
+def split_sentences(text: str):
+    return [s.strip() for s in SENTENCE_BREAK.split(text) if len(s.split()) >= MIN_SENTENCE_WORDS]
+
+def extractive(text: str, encode, max_sentences: int = 6, max_candidates: int = 400):
+    """Most central sentences of text, in document order.
+
+    encode(list of str) must return unit-normalized embeddings. Very long
+    documents are sampled evenly down to max_candidates sentences.
+    """
+    sentences = split_sentences(text)
+    if len(sentences) <= max_sentences:
+        return sentences
+    if len(sentences) > max_candidates:
+        picks = np.linspace(0, len(sentences) - 1, max_candidates).astype(int)
+        sentences = [sentences[i] for i in picks]
+    embeddings = np.asarray(encode(sentences), dtype=np.float32)
+    centrality = (embeddings @ embeddings.T).sum(axis=1)
+    top = np.argsort(-centrality)[:max_sentences]
+    return [sentences[i] for i in sorted(top)]
+
+def map_reduce(texts, summarize, chunk_words: int, max_rounds: int = 4):
+    """Summaries of whole texts.
+
+    summarize(inputs, final) returns one summary per input; all documents'
+    chunks are passed together so the model runs in full batches.
+    """
+    parts = [list(split_into_chunks(text, chunk_words)) or [text] for text in texts]
+    for _ in range(max_rounds):
+        pending = [i for i, chunks in enumerate(parts) if len(chunks) > 1]
+        if not pending:
+            break
+        outputs = summarize([chunk for i in pending for chunk in parts[i]], False)
+        position = 0
+        for i in pending:
+            count = len(parts[i])
+            joined = ' '.join(outputs[position:position + count])
+            position += count
+            parts[i] = list(split_into_chunks(joined, chunk_words)) or [joined]
+    return summarize([' '.join(chunks) for chunks in parts], True)
@@ -0,0 +1,131 @@
+"""Malayalam to English machine translation with a sentence-level memory.
+
+Text is split into sentences (line breaks and other separators are kept,
+so the layout survives). Sentences without Malayalam script pass through
+unchanged, and the rest are looked up in the translation memory, a small
+SQLite file keyed by the hash of the model name and the normalised
+sentence, so recurring letterheads, signatures and boilerplate are
+translated once. Misses are sorted by length and translated in batches of
+``TRANSLATION_BATCH_SIZE`` with greedy decoding, which keeps padding low.
+When a document exceeds ``TRANSLATION_TIME_BUDGET_SECONDS`` no further
+batches are started and the remaining sentences stay in Malayalam.
+"""
+import re, time, sqlite3, hashlib, threading, contextlib
+from . import metrics
+from .app.config import get_settings
+
+settings = get_settings()
+
+MALAYALAM = re.compile('[\u0D00-\u0D7F]')
+# Latin-1 characters that legacy Malayalam font encodings turn into after PDF extraction
+GARBLED = re.compile('[ØÄÞßÉÏíçæÕµÚÙÎ¢á]')
+SEPARATOR = re.compile(r'((?<=[.!?।])\s+|\s*\n\s*)')
+
+def has_malayalam(text: str) -> bool:
+    return MALAYALAM.search(text) is not None
+
+def garbled_count(text: str) -> int:
+    return len(GARBLED.findall(text))
+
+def _normalise(sentence: str) -> str:
+    return ' '.join(sentence.split())
+
+def split_sentences(text: str, max_words: int = None):
+    """[(sentence, separator)] covering text; overlong sentences are cut at max_words"""
+    max_words = max_words or settings.TRANSLATION_MAX_SENTENCE_WORDS
+    parts = SEPARATOR.split(text)
+    pieces = []
+    for i in range(0, len(parts), 2):
+        sentence, separator = parts[i], parts[i + 1] if i + 1 < len(parts) else ''
+        words = sentence.split(' ')
+        for start in range(0, len(words), max_words):
+            last = start + max_words >= len(words)
+            pieces.append((' '.join(words[start:start + max_words]), separator if last else ' '))
+    return pieces
+
+class TranslationMemory:
+    """Persistent sentence cache: hash of (model, source) -> English"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS memory (key TEXT PRIMARY KEY, target TEXT NOT NULL, '
+                               'hits INTEGER NOT NULL DEFAULT 0)')
+        return self._conn
+
+    @staticmethod
+    def key(model: str, sentence: str) -> str:
+        return hashlib.sha256(f'{model}\0{_normalise(sentence)}'.encode('utf-8')).hexdigest()
+
+    def get_many(self, keys):
+        if not keys:
+            return {}
+        found = {}
+        with self._lock:
+            conn = self._connect()
+            keys = list(keys)
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                marks = ','.join('?' * len(chunk))
+                found.update(conn.execute(f'SELECT key, target FROM memory WHERE key IN ({marks})', chunk).fetchall())
+            if found:
+                conn.executemany('UPDATE memory SET hits = hits + 1 WHERE key = ?', [(k,) for k in found])
+                conn.commit()
+        return found
+
+    def put_many(self, pairs):
+        if not pairs:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.executemany('INSERT OR REPLACE INTO memory (key, target) VALUES (?, ?)', pairs)
+            conn.commit()
+
+memory = TranslationMemory(settings.TRANSLATION_MEMORY_FILE) if settings.TRANSLATION_MEMORY_ENABLED else None
+
+def _inference_mode():
+    try:
+        import torch
+    except ImportError:  # offline stand-in models (benchmarks.stubs) need no torch
+        return contextlib.nullcontext()
+    return torch.inference_mode()
+
+def _generate(model, tokenizer, sentences):
+    """Greedy decoding of one batch"""
+    inputs = tokenizer(sentences, return_tensors='pt', padding=True, truncation=True, max_length=512)
+    max_new_tokens = min(512, int(inputs['input_ids'].shape[1] * 1.5) + 10)
+    with _inference_mode():
+        output = model.generate(**inputs, num_beams=1, do_sample=False, max_new_tokens=max_new_tokens)
+    return tokenizer.batch_decode(output, skip_special_tokens=True)
+
+def translate(text: str, model, tokenizer, model_name: str, budget_seconds: float = None):
+    """English rendering of text; returns (translation, complete)"""
+    budget_seconds = settings.TRANSLATION_TIME_BUDGET_SECONDS if budget_seconds is None else budget_seconds
+    pieces = split_sentences(text)
+    sources = {sentence for sentence, _ in pieces if has_malayalam(sentence)}
+    keys = {s: TranslationMemory.key(model_name, s) for s in sources}
+    cached = memory.get_many(set(keys.values())) if memory is not None else {}
+    translated = {s: cached[keys[s]] for s in sources if keys[s] in cached}
+    pending = sorted((s for s in sources if s not in translated), key=len)
+
+    started = time.monotonic()
+    complete = True
+    with metrics.stage('translation', sentences=len(sources), cached=len(translated)):
+        batch_size = settings.TRANSLATION_BATCH_SIZE
+        for start in range(0, len(pending), batch_size):
+            if time.monotonic() - started > budget_seconds:
+                print(f"Translation budget exhausted, {len(pending) - start} sentences left untranslated")
+                complete = False
+                break
+            batch = pending[start:start + batch_size]
+            outputs = _generate(model, tokenizer, batch)
+            translated.update(zip(batch, outputs))
+            if memory is not None:
+                memory.put_many([(keys[s], t) for s, t in zip(batch, outputs)])
+    return ''.join(translated.get(sentence, sentence) + separator for sentence, separator in pieces), complete
@@ -0,0 +1,109 @@
+"""Upload storage and limits.
+
+Starlette's multipart parser still spools every file part to a
+SpooledTemporaryFile (memory up to 1 MB, then disk) before the endpoint
+runs, so each upload is written twice: once by the parser and once here.
+The only limit on that first copy is ``UploadLimitMiddleware``, which
+rejects request bodies over the per-endpoint cap (one file plus form
+overhead, or ``MAX_BATCH_UPLOAD_MB`` for batches) before the form is parsed.
+
+``save_upload`` then copies the spooled file to a temp file in chunks,
+hashing as it goes, and atomically renames it to its content hash so
+identical uploads share one copy. ``MAX_FILE_SIZE_MB`` and
+``ALLOWED_EXTENSIONS`` are enforced again during that copy.
+"""
+import os, hashlib, tempfile
+import aiofiles, aiofiles.os
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from .app.config import get_settings
+
+settings = get_settings()
+
+CHUNK_SIZE = 1024 * 1024
+MULTIPART_OVERHEAD = 64 * 1024  # form fields and part headers around the file bytes
+
+def upload_dir() -> str:
+    directory = os.path.abspath(settings.UPLOAD_DIR)
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+def max_file_bytes() -> int:
+    return settings.MAX_FILE_SIZE_MB * 1024 * 1024
+
+def check_extension(filename: str):
+    ext = os.path.splitext(filename or '')[1].lower()
+    if ext not in settings.ALLOWED_EXTENSIONS:
+        allowed = ', '.join(sorted(settings.ALLOWED_EXTENSIONS))
+        raise HTTPException(status_code=415, detail=f'Unsupported file type "{ext}". Allowed: {allowed}')
+    return ext
+
+async def save_upload(file: UploadFile):
+    """Stream an upload to disk, returning (filepath, sha256).
+
+    Raises 415 for disallowed extensions and 413 as soon as the file grows
+    past MAX_FILE_SIZE_MB; the partial temp file is removed.
+    """
+    ext = check_extension(file.filename)
+    directory = upload_dir()
+    limit = max_file_bytes()
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.upload-')
+    os.close(fd)
+    try:
+        async with aiofiles.open(tmp, 'wb') as f:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > limit:
+                    raise HTTPException(status_code=413, detail=f'File exceeds {settings.MAX_FILE_SIZE_MB} MB limit')
+                digest.update(chunk)
+                await f.write(chunk)
+        content_hash = digest.hexdigest()
+        filepath = os.path.join(directory, content_hash + ext)
+        if os.path.exists(filepath):
+            await aiofiles.os.remove(tmp)
+        else:
+            await aiofiles.os.replace(tmp, filepath)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return filepath, content_hash
+
+class UploadLimitMiddleware:
+    """Reject upload requests whose body exceeds a per-path byte limit.
+
+    Declared Content-Length is checked before any body is read; chunked
+    bodies are counted as they stream and aborted once over the limit.
+    """
+
+    def __init__(self, app, limits: dict):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get('path')) if scope['type'] == 'http' and scope.get('method') == 'POST' else None
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get('headers') or [])
+        declared = headers.get(b'content-length')
+        if declared and declared.isdigit() and int(declared) > limit:
+            response = JSONResponse({'detail': 'Upload too large'}, status_code=413, headers={'Connection': 'close'})
+            return await response(scope, receive, send)
+
+        received = 0
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail='Upload too large')
+            return message
+
+        await self.app(scope, limited_receive, send)
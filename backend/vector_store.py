@@ -0,0 +1,43 @@
+"""Document embedding storage helpers and exact similarity search"""
+import numpy as np
+
+DTYPE = np.float32
+
+def to_vector(embedding) -> np.ndarray:
+    """Convert a tensor/array embedding to a unit-length float32 vector"""
+    if hasattr(embedding, 'cpu'):
+        embedding = embedding.cpu().numpy()
+    vector = np.asarray(embedding, dtype=DTYPE).reshape(-1)
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector = vector / norm
+    return vector
+
+def to_blob(embedding) -> bytes:
+    """Serialize an embedding for the document_embeddings table"""
+    return to_vector(embedding).tobytes()
+
+def from_blob(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=DTYPE)
+
+def stack(blobs) -> np.ndarray:
+    """Stack stored embeddings into an (N, dim) matrix"""
+    if not blobs:
+        return np.zeros((0, 0), dtype=DTYPE)
+    return np.vstack([from_blob(b) for b in blobs])
+
+def top_k(query, matrix: np.ndarray, k: int, min_score: float = 0.0):
+    """Return [(row, score)] for the k rows most similar to query, best first.
+
+    Rows are assumed unit-normalized, so one matrix-vector product gives
+    cosine similarity for the whole corpus.
+    """
+    if matrix.shape[0] == 0 or k <= 0:
+        return []
+    scores = matrix @ to_vector(query)
+    if k < len(scores):
+        rows = np.argpartition(-scores, k - 1)[:k]
+    else:
+        rows = np.arange(len(scores))
+    rows = rows[np.argsort(-scores[rows])]
+    return [(int(r), float(scores[r])) for r in rows if scores[r] > min_score]
@@ -0,0 +1,82 @@
+"""Write-behind batching of database writes.
+
+Callers submit units of work (``work(db) -> result``) and get a future.
+One writer thread collects whatever arrives within ``WRITE_BEHIND_INTERVAL_MS``
+(up to ``WRITE_BEHIND_MAX_BATCH`` units) and runs it in a single session and
+transaction, so concurrent job workers share one commit instead of queueing
+on the database lock. If the combined commit fails, each unit is retried in
+its own transaction so one bad write does not fail the others; units must
+therefore only touch the session they are given.
+"""
+import time, queue, threading
+from concurrent.futures import Future
+
+class WriteBehindBatcher:
+    """Single writer thread committing submitted units of work together"""
+
+    def __init__(self, session_factory, interval_ms: float, max_batch: int):
+        self.session_factory = session_factory
+        self.interval = interval_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.pending = queue.Queue()
+        self.thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, work) -> Future:
+        future = Future()
+        self.pending.put((work, future))
+        self._ensure_started()
+        return future
+
+    def _ensure_started(self):
+        with self._lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                self.thread.start()
+
+    def _collect(self):
+        batch = [self.pending.get()]
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_together(self, batch):
+        db = self.session_factory()
+        try:
+            results = [work(db) for work, _ in batch]
+            db.commit()
+        except Exception:
+            db.rollback()
+            return False
+        finally:
+            db.close()
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+        return True
+
+    def _run_alone(self, work, future):
+        db = self.session_factory()
+        try:
+            result = work(db)
+            db.commit()
+            future.set_result(result)
+        except Exception as e:
+            db.rollback()
+            future.set_exception(e)
+        finally:
+            db.close()
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if len(batch) > 1 and self._run_together(batch):
+                continue
+            for work, future in batch:
+                self._run_alone(work, future)
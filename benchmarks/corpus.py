@@ -0,0 +1,139 @@
+"""Synthetic KMRL-style documents for benchmarks.
+
+Generates text PDFs, scanned (image-only) PDFs, PNG images and plain text
+in English and Malayalam at configurable sizes. Output is deterministic
+for a given seed so runs are comparable.
+"""
+import os, random
+
+DEPARTMENT_VOCABULARY = {
+    'Engineering': 'track signalling rolling stock depot maintenance inspection bogie pantograph traction '
+                   'transformer escalator lift repair commissioning work order job card overhaul',
+    'HR': 'employee payroll salary leave attendance recruitment training appraisal promotion transfer '
+          'appointment manpower joining resignation',
+    'Safety': 'hazard incident accident emergency evacuation fire first aid PPE injury risk assessment '
+              'platform screen door unsafe',
+    'Regulatory': 'statutory compliance commissioner approval license permit notification circular '
+                  'directive audit certificate regulation',
+    'Compliance': 'ISO checklist procedure guideline verification documentation review quality control '
+                  'standard internal audit',
+}
+COMMON = ('the of and for to with on at by from as per is was will be shall report schedule '
+          'period station line section train passenger contractor').split()
+STATIONS = ['Aluva', 'Pulinchodu', 'Companypady', 'Ambattukavu', 'Muttom', 'Kalamassery',
+            'Edappally', 'Palarivattom', 'Kaloor', 'Vyttila', 'Thykoodam', 'Petta']
+MALAYALAM = ('മെട്രോ സ്റ്റേഷൻ അറ്റകുറ്റപ്പണി സുരക്ഷ ജീവനക്കാർ ശമ്പളം അവധി പരിശോധന റിപ്പോർട്ട് '
+             'ഉത്തരവ് അടിയന്തര യാത്രക്കാർ ട്രെയിൻ സമയം നിർദ്ദേശം അംഗീകാരം കരാർ').split()
+
+KINDS = ('pdf', 'scanned_pdf', 'image', 'text')
+
+def make_text(rng: random.Random, words: int, lang: str = 'en', department: str = None) -> str:
+    """Paragraphs of roughly `words` words with department terms and identifiers"""
+    department = department or rng.choice(list(DEPARTMENT_VOCABULARY))
+    topical = DEPARTMENT_VOCABULARY[department].split()
+    paragraphs, sentence, paragraph, count = [], [], [], 0
+    while count < words:
+        if lang == 'ml':
+            token = rng.choice(MALAYALAM)
+        else:
+            roll = rng.random()
+            if roll < 0.35:
+                token = rng.choice(topical)
+            elif roll < 0.38:
+                token = rng.choice(STATIONS)
+            elif roll < 0.40:
+                token = f"WO-{rng.randint(2019, 2026)}-{rng.randint(1, 999):03d}"
+            else:
+                token = rng.choice(COMMON)
+        sentence.append(token)
+        count += 1
+        if len(sentence) >= rng.randint(8, 18):
+            paragraph.append(' '.join(sentence).capitalize() + '.')
+            sentence = []
+            if len(paragraph) >= rng.randint(3, 6):
+                paragraphs.append(' '.join(paragraph))
+                paragraph = []
+    if sentence:
+        paragraph.append(' '.join(sentence).capitalize() + '.')
+    if paragraph:
+        paragraphs.append(' '.join(paragraph))
+    return '\n\n'.join(paragraphs)
+
+def _paginate(text: str, pages: int):
+    words = text.split(' ')
+    per_page = max(1, len(words) // max(pages, 1))
+    return [' '.join(words[i:i + per_page]) for i in range(0, len(words), per_page)][:pages] or ['']
+
+def _render(text: str, width: int = 1240, height: int = 1754):
+    """Text drawn onto a white page image (roughly A4 at 150 dpi)"""
+    from PIL import Image, ImageDraw
+    image = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    x, y, line = 60, 60, ''
+    for word in text.split():
+        if len(line) + len(word) > 95:
+            draw.text((x, y), line, fill=0)
+            y += 18
+            line = ''
+            if y > height - 60:
+                break
+        line = f"{line} {word}".strip()
+    if line and y <= height - 60:
+        draw.text((x, y), line, fill=0)
+    return image
+
+def write_text(path: str, text: str):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+def write_pdf(path: str, pages):
+    import fitz  # pymupdf
+    with fitz.open() as doc:
+        for page_text in pages:
+            page = doc.new_page()
+            page.insert_textbox(page.rect + (50, 50, -50, -50), page_text, fontsize=9)
+        doc.save(path)
+
+def write_scanned_pdf(path: str, pages):
+    import io
+    import fitz  # pymupdf
+    with fitz.open() as doc:
+        for page_text in pages:
+            buffer = io.BytesIO()
+            _render(page_text).save(buffer, format='PNG')
+            page = doc.new_page()
+            page.insert_image(page.rect, stream=buffer.getvalue())
+        doc.save(path)
+
+def write_image(path: str, text: str):
+    _render(text).save(path)
+
+def generate(directory: str, count: int, words: int = 800, pages: int = 4, seed: int = 7,
+             kinds=KINDS, malayalam_share: float = 0.2):
+    """Write `count` documents cycling through kinds; returns [(kind, lang, path)].
+
+    Malayalam documents are written as text (the built-in PDF fonts have
+    no Malayalam glyphs, and OCR of generated Malayalam would need the
+    mal traineddata).
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        lang = 'ml' if rng.random() < malayalam_share else 'en'
+        kind = 'text' if lang == 'ml' else kinds[i % len(kinds)]
+        text = make_text(rng, words, lang)
+        if kind == 'pdf':
+            path = os.path.join(directory, f'doc{i:04d}.pdf')
+            write_pdf(path, _paginate(text, pages))
+        elif kind == 'scanned_pdf':
+            path = os.path.join(directory, f'scan{i:04d}.pdf')
+            write_scanned_pdf(path, _paginate(text, pages))
+        elif kind == 'image':
+            path = os.path.join(directory, f'image{i:04d}.png')
+            write_image(path, text)
+        else:
+            path = os.path.join(directory, f'text{i:04d}.txt')
+            write_text(path, text)
+        corpus.append((kind, lang, path))
+    return corpus
@@ -0,0 +1,340 @@
+"""Benchmark runner for the processing pipeline and the read API.
+
+    python -m benchmarks.run --quick                      # small corpus, 1k-document search
+    python -m benchmarks.run                              # 1k / 10k / 100k documents
+    python -m benchmarks.run --quick --save-baseline      # record benchmarks/baselines/quick.json
+    python -m benchmarks.run --quick --baseline benchmarks/baselines/quick.json
+
+Models are replaced by the offline stand-ins in ``benchmarks.stubs`` unless
+``--real-models`` is given. Every run writes a JSON report (``--output``);
+with a baseline, the exit status is 1 when any metric's median latency or
+any section's peak RSS regresses past the thresholds.
+
+Peak RSS is measured per section on Linux: the kernel's high-water mark
+(``VmHWM``) is reset through ``/proc/self/clear_refs`` when a section starts
+and read when it ends. Where that reset is unavailable only the lifetime
+peak exists, so a single process-wide figure is reported instead.
+"""
+import os, re, sys, json, time, random, argparse, tempfile, platform, resource, shutil, statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(ROOT, 'benchmarks', 'baselines')
+
+def configure(work: str):
+    """Point every storage setting at the scratch directory; must run before importing backend"""
+    defaults = {
+        'DATABASE_URL': f"sqlite:///{os.path.join(work, 'pipeline.db')}",
+        'UPLOAD_DIR': os.path.join(work, 'uploads'),
+        'FAISS_INDEX_FILE': os.path.join(work, 'faiss_index.bin'),
+        'EMBEDDINGS_DIR': os.path.join(work, 'embeddings'),
+        'OCR_CACHE_DIR': os.path.join(work, 'ocr_cache'),
+        'TRANSLATION_MEMORY_FILE': os.path.join(work, 'translation_memory.db'),
+        'PROFILE_DIR': os.path.join(work, 'profiles'),
+        'MODEL_WARMUP': 'False',
+        'MODEL_ARTIFACTS_ENABLED': 'False',
+        'DEDUP_CACHE_ENABLED': 'False',
+    }
+    for key, value in defaults.items():
+        os.environ[key] = value
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+def reset_peak_rss() -> bool:
+    """Reset the kernel's RSS high-water mark for this process (Linux 4.0+)"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def peak_rss_mb() -> float:
+    """VmHWM since the last reset, else the lifetime peak from getrusage"""
+    try:
+        with open('/proc/self/status') as f:
+            match = re.search(r'^VmHWM:\s+(\d+) kB', f.read(), re.MULTILINE)
+        if match:
+            return int(match.group(1)) / 1024.0
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0  # KiB on Linux
+
+class Recorder:
+    """Latency samples per metric plus peak RSS per section (or per process)"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.memory = {}
+        self.per_section = None
+
+    def add(self, name: str, seconds: float):
+        self.metrics.setdefault(name, []).append(seconds * 1000.0)
+
+    def time(self, name: str, fn, *args, **kwargs):
+        started = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.add(name, time.perf_counter() - started)
+        return result
+
+    def repeat(self, name: str, fn, times: int):
+        for _ in range(times):
+            self.time(name, fn)
+
+    def section_start(self, section: str):
+        reset = reset_peak_rss()
+        self.per_section = reset if self.per_section is None else self.per_section and reset
+
+    def section_done(self, section: str):
+        if self.per_section:
+            self.memory[section] = round(peak_rss_mb(), 1)
+        else:
+            # Lifetime peak only: a per-section figure would hide regressions after the largest section
+            self.memory = {'process': round(peak_rss_mb(), 1)}
+
+    def report(self):
+        metrics = {}
+        for name, samples in self.metrics.items():
+            ordered = sorted(samples)
+            metrics[name] = {
+                'n': len(samples),
+                'p50_ms': round(statistics.median(ordered), 3),
+                'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+                'mean_ms': round(statistics.fmean(ordered), 3),
+                'min_ms': round(ordered[0], 3),
+            }
+        return {'metrics': metrics, 'memory': {'peak_rss_mb': dict(self.memory)}}
+
+# ---- pipeline ------------------------------------------------------------------
+
+def bench_pipeline(rec: Recorder, work: str, args):
+    from backend import processor, extraction
+    from benchmarks import corpus
+
+    documents = corpus.generate(os.path.join(work, 'corpus'), args.docs, words=args.words, pages=args.pages)
+    paths = [path for _, _, path in documents]
+    print(f"Pipeline: {len(documents)} documents ({args.words} words, {args.pages} pages)")
+    rec.section_start('pipeline')
+
+    for kind, lang, path in documents:
+        extracted = rec.time(f'pipeline.extraction.{kind}', extraction.extract_document, path)
+        text = extracted.text.strip()
+        lang_detected, translated = rec.time('pipeline.translation', processor.detect_and_translate, text)
+        segments = [(None, translated)] if translated else list(enumerate(extracted.pages, start=1))
+        rec.time('pipeline.sections', processor._analyze_sections, [segments])
+        if lang_detected != 'ml' and text:
+            rec.time('pipeline.summary', processor.generate_semantic_summaries, [translated or text])
+        rec.time(f'pipeline.document.{lang}', processor.process_document, path, 'Engineering')
+    rec.time('pipeline.batch', processor.process_documents, paths, ['Engineering'] * len(paths))
+    rec.section_done('pipeline')
+
+# ---- read API ------------------------------------------------------------------
+
+def populate(engine, n: int, seed: int = 11):
+    """Bulk-load n synthetic documents with embeddings and alerts"""
+    from datetime import datetime, timedelta
+    from backend import models, vector_store, auth
+    from benchmarks import corpus, stubs
+
+    rng = random.Random(seed)
+    encoder = stubs.HashingEncoder()
+    departments = list(corpus.DEPARTMENT_VOCABULARY)
+    labels = ['urgent operations', 'safety hazards', 'regulatory deadlines', 'risk & failure']
+    start = datetime.utcnow() - timedelta(days=180)
+    chunk = 2000
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [{
+            'username': 'bench', 'hashed_password': auth.get_password_hash('bench'),
+            'role': models.UserRole.ADMIN, 'department': 'Admin', 'is_active': True
+        }])
+    for offset in range(0, n, chunk):
+        docs, embeddings, alerts = [], [], []
+        texts = []
+        for i in range(offset, min(offset + chunk, n)):
+            department = rng.choice(departments)
+            text = corpus.make_text(rng, 120, department=department)
+            texts.append(text)
+            doc_alerts = [{'label': rng.choice(labels), 'score': round(rng.uniform(0.5, 0.8), 3),
+                           'paragraph_index': 0, 'page': 1, 'snippet': text[:160]}] if rng.random() < 0.15 else []
+            created_at = start + timedelta(seconds=i * 150)
+            docs.append({
+                'id': i + 1, 'filename': f'doc{i:06d}.pdf', 'department': department,
+                'predicted_department': rng.choice(departments), 'confidence': rng.uniform(0.3, 0.9),
+                'summary': text[:600], 'semantic_alerts': json.dumps(doc_alerts), 'section_scores': '[]',
+                'is_misfiled': rng.random() < 0.05, 'flag_reason': '', 'original_text': text,
+                'translated_text': '', 'filepath': '', 'uploaded_by': 'bench', 'created_at': created_at
+            })
+            alerts.extend({'document_id': i + 1, 'label': a['label'], 'score': a['score'],
+                           'paragraph_index': 0, 'page': 1, 'snippet': a['snippet'], 'created_at': created_at}
+                          for a in doc_alerts)
+        vectors = encoder.encode(texts, normalize_embeddings=True)
+        for doc, vector in zip(docs, vectors):
+            embeddings.append({'document_id': doc['id'], 'department': doc['department'],
+                               'vector': vector_store.to_blob(vector)})
+        with engine.begin() as conn:
+            conn.execute(models.Document.__table__.insert(), docs)
+            conn.execute(models.DocumentEmbedding.__table__.insert(), embeddings)
+            if alerts:
+                conn.execute(models.Alert.__table__.insert(), alerts)
+
+def bench_api(rec: Recorder, work: str, n: int, args):
+    from sqlalchemy.orm import sessionmaker
+    from fastapi.testclient import TestClient
+    from backend import main, database, models, crud, auth, search_index, lexical_index
+    from backend.app.db.engine import make_engine
+    from benchmarks import corpus
+
+    print(f"API: {n} documents")
+    rec.section_start(f'api.{n}')
+    engine = make_engine(f"sqlite:///{os.path.join(work, f'api_{n}.db')}")
+    models.Base.metadata.create_all(bind=engine)
+    lexical_index.setup(engine)
+    rec.time(f'api.{n}.populate', populate, engine, n)
+    Session = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    with Session() as db:
+        crud.rebuild_counters(db)
+        search_index.index = search_index.DepartmentIndex(
+            os.path.join(work, f'faiss_index_{n}.bin'), main.settings.EMBED_MODEL)
+        rec.time(f'api.{n}.index_build', search_index.index.load, db)
+
+    def get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+    main.app.dependency_overrides[database.get_db] = get_db
+    client = TestClient(main.app)
+    headers = {'Authorization': f"Bearer {auth.create_access_token({'sub': 'bench', 'role': 'admin'})}"}
+
+    def get(path, **params):
+        response = client.get(path, params=params, headers=headers)
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} returned {response.status_code}: {response.text[:200]}")
+        return response.json()
+
+    rng = random.Random(5)
+    queries = (corpus.STATIONS[:4] + ['track maintenance inspection', 'payroll leave', 'WO-2024-113',
+                                      'fire evacuation platform'])
+    for mode in ('lexical', 'semantic', 'hybrid'):
+        get('/search', q=queries[0], mode=mode)  # warm caches before sampling
+        for _ in range(args.repeat):
+            rec.time(f'api.{n}.search.{mode}', get, '/search', q=rng.choice(queries), mode=mode)
+
+    rec.repeat(f'api.{n}.documents.first_page', lambda: get('/documents'), args.repeat)
+    cursor = get('/documents', limit=20)['next_cursor']
+    for _ in range(min(50, n // 20 - 2)):  # walk toward the older end of the table
+        cursor = get('/documents', cursor=cursor, limit=20)['next_cursor']
+    rec.repeat(f'api.{n}.documents.deep_page', lambda: get('/documents', cursor=cursor), args.repeat)
+    rec.repeat(f'api.{n}.stats', lambda: get('/stats'), args.repeat)
+    rec.repeat(f'api.{n}.stats.timeseries', lambda: get('/stats/timeseries', days=90), args.repeat)
+    rec.repeat(f'api.{n}.alerts', lambda: get('/alerts', label='safety hazards'), args.repeat)
+    rec.repeat(f'api.{n}.misfiled', lambda: get('/misfiled'), args.repeat)
+
+    main.app.dependency_overrides.pop(database.get_db, None)
+    engine.dispose()
+    rec.section_done(f'api.{n}')
+
+# ---- baselines -----------------------------------------------------------------
+
+def compare(report: dict, baseline: dict, latency_threshold: float, memory_threshold: float, noise_ms: float):
+    """Regressions of report against baseline as human-readable strings"""
+    regressions = []
+    for name, current in report['metrics'].items():
+        previous = baseline.get('metrics', {}).get(name)
+        if not previous:
+            continue
+        limit = previous['p50_ms'] * (1 + latency_threshold)
+        if current['p50_ms'] > limit and current['p50_ms'] - previous['p50_ms'] > noise_ms:
+            regressions.append(f"{name}: p50 {current['p50_ms']:.2f} ms vs baseline {previous['p50_ms']:.2f} ms")
+    previous_memory = baseline.get('memory', {}).get('peak_rss_mb', {})
+    for section, current in report['memory']['peak_rss_mb'].items():
+        previous = previous_memory.get(section)
+        if previous and current > previous * (1 + memory_threshold):
+            regressions.append(f"{section}: peak RSS {current:.0f} MB vs baseline {previous:.0f} MB")
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the document pipeline and read API')
+    parser.add_argument('--quick', action='store_true', help='small corpus and 1k-document API run')
+    parser.add_argument('--sizes', help='comma-separated document counts for the API benchmarks')
+    parser.add_argument('--docs', type=int, help='documents in the pipeline corpus')
+    parser.add_argument('--words', type=int, help='words per generated document')
+    parser.add_argument('--pages', type=int, help='pages per generated PDF')
+    parser.add_argument('--repeat', type=int, default=20, help='samples per API metric')
+    parser.add_argument('--skip-pipeline', action='store_true')
+    parser.add_argument('--skip-api', action='store_true')
+    parser.add_argument('--real-models', action='store_true', help='use the configured models instead of stand-ins')
+    parser.add_argument('--output', default=os.path.join(ROOT, 'benchmarks', 'results', 'latest.json'))
+    parser.add_argument('--baseline', help='baseline JSON to compare against (default: baselines/<profile>.json if present)')
+    parser.add_argument('--save-baseline', action='store_true', help='write this run as the profile baseline')
+    parser.add_argument('--latency-threshold', type=float, default=0.25, help='allowed p50 slowdown, fraction')
+    parser.add_argument('--memory-threshold', type=float, default=0.20, help='allowed peak RSS growth, fraction')
+    parser.add_argument('--noise-ms', type=float, default=2.0, help='ignore slowdowns smaller than this')
+    parser.add_argument('--keep', action='store_true', help='keep the scratch directory')
+    args = parser.parse_args(argv)
+    args.profile = 'quick' if args.quick else 'full'
+    args.docs = args.docs or (8 if args.quick else 24)
+    args.words = args.words or (600 if args.quick else 2000)
+    args.pages = args.pages or (3 if args.quick else 8)
+    sizes = args.sizes or ('1000' if args.quick else '1000,10000,100000')
+    args.sizes = [int(s) for s in sizes.split(',') if s.strip()]
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    work = tempfile.mkdtemp(prefix='kmrl-bench-')
+    configure(work)
+    from backend import processor  # registers the real loaders, which the stand-ins then replace
+    from backend.model_registry import registry
+    from benchmarks import stubs
+    if not args.real_models:
+        stubs.install(registry)
+
+    rec = Recorder()
+    try:
+        if not args.skip_pipeline:
+            bench_pipeline(rec, work, args)
+        if not args.skip_api:
+            for n in args.sizes:
+                bench_api(rec, work, n, args)
+    finally:
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+    report = rec.report()
+    report['meta'] = {
+        'profile': args.profile,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'stub_models': not args.real_models,
+        'docs': args.docs, 'words': args.words, 'pages': args.pages, 'sizes': args.sizes,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    width = max(len(name) for name in report['metrics']) if report['metrics'] else 0
+    for name, m in sorted(report['metrics'].items()):
+        print(f"{name:<{width}}  p50 {m['p50_ms']:>10.2f} ms  p95 {m['p95_ms']:>10.2f} ms  n={m['n']}")
+    print(f"Report written to {args.output}")
+
+    baseline_path = os.path.join(BASELINE_DIR, f'{args.profile}.json')
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        shutil.copyfile(args.output, baseline_path)
+        print(f"Baseline saved to {baseline_path}")
+        return 0
+    compare_path = args.baseline or (baseline_path if os.path.exists(baseline_path) else None)
+    if not compare_path:
+        return 0
+    with open(compare_path) as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline, args.latency_threshold, args.memory_threshold, args.noise_ms)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    print(f"{len(regressions)} regression(s) against {compare_path}")
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
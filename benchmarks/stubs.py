@@ -0,0 +1,81 @@
+"""Tiny offline stand-ins for the transformer models.
+
+They keep the call signatures of SentenceTransformer.encode, the
+summarization pipeline and MarianMTModel/MarianTokenizer, so the real
+processor code paths (translation batching and memory included) run
+unchanged, but cost microseconds and need no downloads. Timings therefore measure
+the application around the models, which is what regressions in
+processor.py / main.py show up in.
+"""
+import re, zlib
+import numpy as np
+
+EMBED_DIM = 384  # same width as paraphrase-MiniLM-L6-v2
+WORD = re.compile(r'\w+', re.UNICODE)
+
+class HashingEncoder:
+    """Bag-of-words feature hashing with the SentenceTransformer encode signature"""
+
+    max_seq_length = 128
+
+    def __init__(self, dim: int = EMBED_DIM):
+        self.dim = dim
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in WORD.findall(text.lower())[:self.max_seq_length]:
+                vectors[row, zlib.crc32(word.encode('utf-8')) % self.dim] += 1.0
+        if normalize_embeddings:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.where(norms == 0, 1, norms)
+        return vectors[0] if single else vectors
+
+def summarizer(texts, max_length: int = 200, **kwargs):
+    """Leading sentences of each input, trimmed to roughly max_length tokens"""
+    single = isinstance(texts, str)
+    outputs = []
+    for text in [texts] if single else texts:
+        words = text.split()[:max_length]
+        outputs.append({'summary_text': ' '.join(words)})
+    return outputs
+
+class WordTokenizer:
+    """MarianTokenizer stand-in: whitespace words to ids from a growing vocabulary"""
+
+    def __init__(self):
+        self.vocab = {}
+        self.words = []
+
+    def _id(self, word):
+        if word not in self.vocab:
+            self.vocab[word] = len(self.words) + 1  # 0 is padding
+            self.words.append(word)
+        return self.vocab[word]
+
+    def __call__(self, sentences, max_length: int = 512, **kwargs):
+        rows = [[self._id(w) for w in s.split()[:max_length]] for s in sentences]
+        width = max((len(r) for r in rows), default=0)
+        ids = np.zeros((len(rows), width), dtype=np.int64)
+        for i, row in enumerate(rows):
+            ids[i, :len(row)] = row
+        return {'input_ids': ids, 'attention_mask': (ids != 0).astype(np.int64)}
+
+    def batch_decode(self, ids, skip_special_tokens: bool = True):
+        """Latin placeholder words, so the output no longer reads as Malayalam"""
+        return [' '.join(f'w{i}' for i in row if i) for row in ids]
+
+class CopyTranslator:
+    """MarianMTModel stand-in whose greedy decoding copies the input tokens"""
+
+    def generate(self, input_ids, max_new_tokens: int = 512, **kwargs):
+        return input_ids[:, :max_new_tokens]
+
+def install(registry):
+    """Replace the heavy models in the registry with the stand-ins"""
+    registry.register('sentence', HashingEncoder)
+    registry.register('summarizer', lambda: summarizer)
+    registry.register('translation', lambda: (CopyTranslator(), WordTokenizer()))
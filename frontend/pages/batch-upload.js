@@ -30,6 +30,18 @@ export default function BatchUploadPage() {
     })))
   }
 
+  // Uploads are processed in the background; poll the job until it finishes
+  const waitForJob = async (jobId, token) => {
+    while (true) {
+      const job = (await axios.get(`http://localhost:8000/jobs/${jobId}`, {
+        headers: { 'Authorization': `Bearer ${token}` }
+      })).data
+      if (job.status === 'succeeded') return job
+      if (job.status === 'failed') throw new Error(job.error || 'Processing failed')
+      await new Promise(resolve => setTimeout(resolve, 2000))
+    }
+  }
+
   const uploadBatch = async () => {
     if (files.length === 0) return alert('Please select files')
     
@@ -44,26 +56,32 @@ export default function BatchUploadPage() {
       return
     }
 
-    // Process files one by one to avoid overwhelming the server
-    for (let i = 0; i < files.length; i++) {
-      const file = files[i]
+    // Send all files in one request; the server processes them as a batch
+    setProgress(prev => prev.map(p => ({ ...p, status: 'processing', message: 'Uploading...' })))
+    let queued = []
+    try {
+      const fd = new FormData()
+      files.forEach(file => fd.append('files', file))
+      fd.append('department', dept)
       
-      // Update progress
-      setProgress(prev => prev.map((p, idx) => 
-        idx === i ? { ...p, status: 'processing', message: 'Uploading...' } : p
-      ))
+      const res = await axios.post('http://localhost:8000/documents/batch-upload', fd, {
+        headers: { 
+          'Content-Type': 'multipart/form-data',
+          'Authorization': `Bearer ${token}`
+        }
+      })
+      queued = res.data
+      setProgress(prev => prev.map(p => ({ ...p, message: 'Processing...' })))
+    } catch (e) {
+      console.error('Batch upload error', e)
+      setProgress(prev => prev.map(p => ({ ...p, status: 'error', message: 'Failed: ' + (e.response?.data?.detail || e.message) })))
+      setUploading(false)
+      return
+    }
 
+    await Promise.all(queued.map(async (job, i) => {
       try {
-        const fd = new FormData()
-        fd.append('file', file)
-        fd.append('department', dept)
-        
-        const res = await axios.post('http://localhost:8000/documents/upload', fd, {
-          headers: { 
-            'Content-Type': 'multipart/form-data',
-            'Authorization': `Bearer ${token}`
-          }
-        })
+        await waitForJob(job.id, token)
         
         // Update progress as success
         setProgress(prev => prev.map((p, idx) => 
@@ -72,13 +90,13 @@ export default function BatchUploadPage() {
         setCompleted(prev => prev + 1)
         
       } catch (e) {
-        console.error('Upload error for', file.name, e)
+        console.error('Processing error for', job.filename, e)
         // Update progress as error
         setProgress(prev => prev.map((p, idx) => 
           idx === i ? { ...p, status: 'error', message: 'Failed: ' + (e.response?.data?.detail || e.message) } : p
         ))
       }
-    }
+    }))
     
     setUploading(false)
   }
@@ -6,6 +6,8 @@ import Link from 'next/link'
 export default function Dashboard() {
   const [docs, setDocs] = useState([])
   const [loading, setLoading] = useState(true)
+  const [nextCursor, setNextCursor] = useState(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [username, setUsername] = useState('')
   const [stats, setStats] = useState({ total_documents: 0, active_alerts: 0, misfiled_documents: 0 })
   const router = useRouter()
@@ -24,18 +26,26 @@ export default function Dashboard() {
     loadStats(token)
   }, [])
 
-  const loadDocuments = async (token) => {
+  const loadDocuments = async (token, cursor = null) => {
     try {
       const response = await axios.get('http://localhost:8000/documents', {
-        headers: { 'Authorization': `Bearer ${token}` }
+        headers: { 'Authorization': `Bearer ${token}` },
+        params: cursor ? { cursor } : {}
       })
-      setDocs(response.data)
+      setDocs(prev => cursor ? [...prev, ...response.data.items] : response.data.items)
+      setNextCursor(response.data.next_cursor)
     } catch (error) {
       console.error('Failed to load documents:', error)
     }
     setLoading(false)
   }
 
+  const loadMore = async () => {
+    setLoadingMore(true)
+    await loadDocuments(localStorage.getItem('token'), nextCursor)
+    setLoadingMore(false)
+  }
+
   const loadStats = async (token) => {
     try {
       const response = await axios.get('http://localhost:8000/stats', {
@@ -190,6 +200,13 @@ export default function Dashboard() {
                   })}
                 </tbody>
               </table>
+              {nextCursor && (
+                <div style={styles.loadMore}>
+                  <button onClick={loadMore} disabled={loadingMore} style={styles.viewBtn}>
+                    {loadingMore ? 'Loading...' : 'Load More'}
+                  </button>
+                </div>
+              )}
             </div>
           )}
         </div>
@@ -364,6 +381,10 @@ const styles = {
   tableContainer: {
     overflowX: 'auto'
   },
+  loadMore: {
+    textAlign: 'center',
+    padding: '20px'
+  },
   table: {
     width: '100%',
     borderCollapse: 'collapse'
@@ -113,7 +113,7 @@ export default function Search() {
             <div style={styles.resultHeader}>
               <h3 style={styles.filename}>{doc.filename}</h3>
               <span style={styles.similarity}>
-                {(doc.similarity * 100).toFixed(1)}% Match
+                {doc.similarity !== null ? `${(doc.similarity * 100).toFixed(1)}% Match` : 'Keyword Match'}
               </span>
             </div>
 
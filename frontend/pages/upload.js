@@ -17,6 +17,21 @@ export default function UploadPage() {
     }
   }, [])
 
+  // Uploads are processed in the background; poll the job until it finishes
+  const waitForDocument = async (jobId, token) => {
+    const headers = { 'Authorization': `Bearer ${token}` }
+    while (true) {
+      const job = (await axios.get(`http://localhost:8000/jobs/${jobId}`, { headers })).data
+      if (job.status === 'succeeded') {
+        return (await axios.get(`http://localhost:8000/documents/${job.document_id}`, { headers })).data
+      }
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Processing failed')
+      }
+      await new Promise(resolve => setTimeout(resolve, 2000))
+    }
+  }
+
   const upload = async () => {
     if (!file) return alert('Please choose a file')
     setLoading(true)
@@ -40,7 +55,7 @@ export default function UploadPage() {
           'Authorization': `Bearer ${token}`
         }
       })
-      setResult(res.data)
+      setResult(await waitForDocument(res.data.id, token))
     } catch (e) {
       console.error('Upload error:', e)
       alert('Upload failed: ' + (e.response?.data?.detail || e.message))
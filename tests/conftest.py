@@ -0,0 +1,50 @@
+"""Shared fixtures: a scratch SQLite database and storage directories.
+
+Settings are read once at import, so the environment is pointed at a
+temporary directory before anything from ``backend`` is imported.
+"""
+import os, sys, shutil, tempfile
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORK = tempfile.mkdtemp(prefix='docintel-tests-')
+
+for key, value in {
+    'DATABASE_URL': f"sqlite:///{os.path.join(WORK, 'test.db')}",
+    'UPLOAD_DIR': os.path.join(WORK, 'uploads'),
+    'FAISS_INDEX_FILE': os.path.join(WORK, 'faiss_index.bin'),
+    'EMBEDDINGS_DIR': os.path.join(WORK, 'embeddings'),
+    'OCR_CACHE_DIR': os.path.join(WORK, 'ocr_cache'),
+    'TRANSLATION_MEMORY_FILE': os.path.join(WORK, 'translation_memory.db'),
+    'PROFILE_DIR': os.path.join(WORK, 'profiles'),
+    'MODEL_WARMUP': 'False',
+    'MODEL_ARTIFACTS_ENABLED': 'False',
+    'METRICS_TIMING_LOGS': 'False',
+}.items():
+    os.environ[key] = value
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from backend import database, models  # noqa: E402
+
+database.init_db()
+
+@pytest.fixture
+def db():
+    """Session on the scratch database; every table is emptied afterwards"""
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        for table in reversed(models.Base.metadata.sorted_tables):
+            session.execute(table.delete())
+        session.commit()
+        session.close()
+
+@pytest.fixture
+def workdir(tmp_path):
+    return str(tmp_path)
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(WORK, ignore_errors=True)
@@ -0,0 +1,52 @@
+import json
+from datetime import datetime
+from sqlalchemy import text
+from backend import crud, database, models
+
+def legacy_document(db, labels):
+    doc = models.Document(filename='legacy.pdf', department='Safety', created_at=datetime(2024, 1, 1),
+                          semantic_alerts=json.dumps([{'label': l, 'score': 0.7} for l in labels]))
+    db.add(doc)
+    db.commit()
+    return doc
+
+def alert_labels(db):
+    return sorted((a.document_id, a.label) for a in db.query(models.Alert))
+
+def test_backfill_runs_once(db):
+    first = legacy_document(db, ['fire', 'deadline'])
+    assert crud.backfill_alerts(db) == 1
+    assert alert_labels(db) == [(first.id, 'deadline'), (first.id, 'fire')]
+    assert db.get(models.CompletedMigration, crud.ALERTS_BACKFILL) is not None
+
+    legacy_document(db, ['fire'])
+    assert crud.backfill_alerts(db) == 0  # marker present: no scan, no inserts
+    assert len(alert_labels(db)) == 2
+
+def test_racing_backfills_do_not_duplicate_alerts(db):
+    doc = legacy_document(db, ['fire'])
+    other = database.SessionLocal()
+    try:
+        # Both workers found the document before either inserted its alerts
+        alerts = models.Alert.__table__
+        crud._insert_ignoring_conflicts(other, alerts, crud._alert_rows(doc), [alerts.c.document_id, alerts.c.label])
+        other.commit()
+    finally:
+        other.close()
+    crud._insert_ignoring_conflicts(db, models.Alert.__table__, crud._alert_rows(doc),
+                                    [models.Alert.__table__.c.document_id, models.Alert.__table__.c.label])
+    db.commit()
+    assert alert_labels(db) == [(doc.id, 'fire')]
+
+def test_upgrade_drops_existing_duplicates_before_adding_the_unique_index(db):
+    doc = legacy_document(db, [])
+    db.execute(text('DROP INDEX ux_alerts_document_id_label'))
+    for score in (0.6, 0.9):
+        db.add(models.Alert(document_id=doc.id, label='fire', score=score))
+    db.commit()
+
+    database.upgrade_schema()
+
+    assert [a.score for a in db.query(models.Alert)] == [0.6]
+    indexes = {row[1] for row in db.execute(text("PRAGMA index_list('alerts')"))}
+    assert 'ux_alerts_document_id_label' in indexes
@@ -0,0 +1,25 @@
+import numpy as np
+from backend import analysis_cache
+
+def analysis():
+    return {'summary': 'cached', 'embedding': np.ones(8, dtype=np.float32)}
+
+def test_hit_under_unchanged_settings(db):
+    analysis_cache.store(db, 'abc', analysis())
+    hit = analysis_cache.lookup(db, 'abc')
+    assert hit['summary'] == 'cached'
+    assert hit['embedding'].shape == (8,)
+
+def test_settings_change_turns_entries_into_misses(db, monkeypatch):
+    analysis_cache.store(db, 'abc', analysis())
+    monkeypatch.setattr(analysis_cache.settings, 'EMBED_MODEL', 'another-model')
+    assert analysis_cache.lookup(db, 'abc') is None
+    analysis_cache.store(db, 'abc', analysis())  # recomputed entry replaces the stale one
+    assert analysis_cache.lookup(db, 'abc') is not None
+
+def test_fingerprint_settings_are_all_read_by_the_pipeline():
+    import inspect
+    from backend import processor, extraction, ocr
+    source = ''.join(inspect.getsource(module) for module in (processor, extraction, ocr))
+    unused = [name for name in analysis_cache.FINGERPRINT_SETTINGS if f'settings.{name}' not in source]
+    assert unused == []
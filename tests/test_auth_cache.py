@@ -0,0 +1,90 @@
+import pytest
+from sqlalchemy import update
+from backend import auth, database, models
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(auth.settings, 'AUTH_CACHE_ENABLED', True)
+    monkeypatch.setattr(auth.settings, 'AUTH_CACHE_SYNC_SECONDS', 0.0)
+    auth.user_cache.clear()
+    yield
+    auth.user_cache.clear()
+
+def add_user(db, username='bob', role=models.UserRole.REVIEWER):
+    user = models.User(username=username, hashed_password='x', role=role, department='Engineering')
+    db.add(user)
+    db.commit()
+    return user
+
+def test_lookups_are_cached(db):
+    add_user(db)
+    auth.get_user(db, 'bob')
+    hits = auth.user_cache.hits
+    assert auth.get_user(db, 'bob').role == models.UserRole.REVIEWER
+    assert auth.user_cache.hits == hits + 1
+
+def test_orm_update_bumps_the_shared_generation(db):
+    user = add_user(db)
+    before = db.query(models.CacheGeneration.generation).scalar() or 0
+    user.role = models.UserRole.USER
+    db.commit()
+    assert db.query(models.CacheGeneration.generation).scalar() == before + 1
+    assert auth.get_user(db, 'bob').role == models.UserRole.USER
+
+def demote_elsewhere(username):
+    """Another process demotes the user: its listeners ran there, not here"""
+    users = models.User.__table__
+    with database.engine.begin() as connection:
+        connection.execute(update(users).where(users.c.username == username).values(role=models.UserRole.USER))
+        auth.bump_users_generation(connection)
+
+def test_change_from_another_worker_clears_this_cache(db):
+    add_user(db)
+    auth.get_user(db, 'bob')
+    demote_elsewhere('bob')
+    assert auth.get_user(db, 'bob').role == models.UserRole.USER
+
+def test_generation_is_checked_at_most_every_sync_interval(db, monkeypatch):
+    monkeypatch.setattr(auth.settings, 'AUTH_CACHE_SYNC_SECONDS', 3600.0)
+    add_user(db)
+    auth._generation['checked'] = float('-inf')
+    auth.get_user(db, 'bob')
+    demote_elsewhere('bob')
+    assert auth.get_user(db, 'bob').role == models.UserRole.REVIEWER  # within the staleness bound
+
+def test_bulk_update_bumps_the_generation_and_clears_after_commit(db, monkeypatch):
+    monkeypatch.setattr(auth.settings, 'AUTH_CACHE_SYNC_SECONDS', 3600.0)
+    add_user(db)
+    auth._generation['checked'] = float('-inf')
+    auth.get_user(db, 'bob')
+    before = db.query(models.CacheGeneration.generation).scalar() or 0
+    db.query(models.User).filter(models.User.username == 'bob').update({'role': models.UserRole.USER})
+    assert auth.user_cache.get('bob') is not None  # not dropped before the commit
+    db.commit()
+    assert db.query(models.CacheGeneration.generation).scalar() == before + 1
+    assert auth.get_user(db, 'bob').role == models.UserRole.USER
+
+def test_rolled_back_change_keeps_the_cache(db):
+    user = add_user(db)
+    auth.get_user(db, 'bob')
+    user.role = models.UserRole.USER
+    db.flush()
+    db.rollback()
+    assert auth.user_cache.get('bob') is not None
+
+def test_deleted_user_is_not_served_from_cache(db):
+    user = add_user(db)
+    auth.get_user(db, 'bob')
+    db.delete(user)
+    db.commit()
+    assert auth.get_user(db, 'bob') is None
+
+def test_ttl_cache_expires_entries():
+    cache = auth.TTLCache(max_entries=2, ttl=60)
+    cache.set('a', 1, ttl=0)
+    assert cache.get('a') is None
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.set('c', 3)
+    assert cache.get('a') is None and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
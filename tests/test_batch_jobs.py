@@ -0,0 +1,74 @@
+import time
+from fastapi.testclient import TestClient
+from backend import database, jobs, main, models
+
+def as_user(role=models.UserRole.REVIEWER):
+    user = models.User(username='carol', role=role, department='Engineering')
+    main.app.dependency_overrides[main.get_current_user] = lambda: user
+    return TestClient(main.app)
+
+def test_batch_upload_queues_every_file(db):
+    client = as_user()
+    try:
+        response = client.post('/documents/batch-upload', data={'department': 'Engineering'}, files=[
+            ('files', ('a.pdf', b'%PDF-1.4 first', 'application/pdf')),
+            ('files', ('b.pdf', b'%PDF-1.4 second', 'application/pdf')),
+            ('files', ('c.pdf', b'%PDF-1.4 first', 'application/pdf')),
+        ])
+    finally:
+        main.app.dependency_overrides.clear()
+    assert response.status_code == 202
+    assert [job['filename'] for job in response.json()] == ['a.pdf', 'b.pdf', 'c.pdf']
+    queued = db.query(models.ProcessingJob).all()
+    assert {job.status for job in queued} == {models.JobStatus.QUEUED}
+    paths = {job.filename: job.filepath for job in queued}
+    assert paths['a.pdf'] == paths['c.pdf'] != paths['b.pdf']  # identical bytes stored once
+
+def test_batch_upload_rejects_disallowed_types_before_saving(db):
+    client = as_user()
+    try:
+        response = client.post('/documents/batch-upload', data={'department': 'Engineering'}, files=[
+            ('files', ('a.pdf', b'%PDF', 'application/pdf')),
+            ('files', ('evil.exe', b'MZ', 'application/octet-stream')),
+        ])
+    finally:
+        main.app.dependency_overrides.clear()
+    assert response.status_code == 415
+    assert db.query(models.ProcessingJob).count() == 0
+
+def wait_for(db, predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        db.expire_all()
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+def test_failed_batch_is_retried_one_job_at_a_time(db, monkeypatch):
+    batches = []
+
+    def fake_run_jobs(session, claimed):
+        batches.append([job.filename for job in claimed])
+        if any(job.filename == 'bad.pdf' for job in claimed):
+            raise ValueError('unreadable file')
+        for job in claimed:
+            job.status = models.JobStatus.SUCCEEDED
+        session.commit()
+
+    monkeypatch.setattr(jobs, 'run_jobs', fake_run_jobs)
+    monkeypatch.setattr(jobs.settings, 'JOB_RETRY_BACKOFF_SECONDS', 3600)
+    queue = jobs.JobQueue(database.SessionLocal, workers=1, poll_interval=0.01, batch_size=8)
+    queue.enqueue_batch(db, [(name, f'/tmp/{name}', None) for name in ('a.pdf', 'bad.pdf', 'c.pdf')],
+                        'Engineering', 'carol')
+    queue.start()
+    try:
+        statuses = lambda: {j.filename: j.status for j in db.query(models.ProcessingJob)}
+        assert wait_for(db, lambda: statuses()['a.pdf'] == models.JobStatus.SUCCEEDED
+                        and statuses()['bad.pdf'] == models.JobStatus.QUEUED)
+    finally:
+        queue.stop()
+    assert sorted(batches[0]) == ['a.pdf', 'bad.pdf', 'c.pdf']
+    assert sorted(batches[1:4]) == [['a.pdf'], ['bad.pdf'], ['c.pdf']]
+    bad = db.query(models.ProcessingJob).filter(models.ProcessingJob.filename == 'bad.pdf').one()
+    assert bad.error == 'ValueError: unreadable file' and bad.attempts == 1
@@ -0,0 +1,51 @@
+import numpy as np
+from backend import concepts
+
+DESCRIPTIONS = {'Finance': 'invoice payment budget', 'Safety': 'hazard injury risk'}
+
+class CountingEncoder:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, texts):
+        self.calls += 1
+        return np.array([[len(t), 1.0, float(i)] for i, t in enumerate(texts)], dtype=np.float32)
+
+def test_cached_matrix_is_reused(workdir):
+    path = f'{workdir}/dept.npz'
+    encode = CountingEncoder()
+    first = concepts.load_concept_matrix(DESCRIPTIONS, path, 'model-a', encode)
+    second = concepts.load_concept_matrix(DESCRIPTIONS, path, 'model-a', encode)
+    assert encode.calls == 1
+    assert second.labels == ['Finance', 'Safety']
+    np.testing.assert_allclose(first.matrix, second.matrix)
+
+def test_model_change_invalidates_the_cache(workdir):
+    path = f'{workdir}/dept.npz'
+    encode = CountingEncoder()
+    concepts.load_concept_matrix(DESCRIPTIONS, path, 'model-a', encode)
+    concepts.load_concept_matrix(DESCRIPTIONS, path, 'model-b', encode)
+    assert encode.calls == 2
+
+def test_description_change_invalidates_the_cache(workdir):
+    path = f'{workdir}/dept.npz'
+    encode = CountingEncoder()
+    concepts.load_concept_matrix(DESCRIPTIONS, path, 'model-a', encode)
+    edited = dict(DESCRIPTIONS, Safety='hazard injury risk accident')
+    assert concepts.load_concept_matrix(edited, path, 'model-a', encode).labels == ['Finance', 'Safety']
+    assert encode.calls == 2
+
+def test_unreadable_cache_file_is_re_encoded(workdir):
+    path = f'{workdir}/dept.npz'
+    with open(path, 'wb') as f:
+        f.write(b'not an npz file')
+    encode = CountingEncoder()
+    concepts.load_concept_matrix(DESCRIPTIONS, path, 'model-a', encode)
+    assert encode.calls == 1
+
+def test_scores_are_cosine_similarities_for_one_or_many():
+    matrix = concepts.ConceptMatrix(['x', 'y'], [[2.0, 0.0], [0.0, 3.0]])
+    np.testing.assert_allclose(matrix.scores([5.0, 0.0]), [1.0, 0.0])
+    np.testing.assert_allclose(matrix.scores([[0.0, 1.0], [1.0, 1.0]]),
+                               [[0.0, 1.0], [np.sqrt(0.5), np.sqrt(0.5)]], rtol=1e-6)
+    assert matrix.as_dict([0.25, 0.75]) == {'x': 0.25, 'y': 0.75}
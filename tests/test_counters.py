@@ -0,0 +1,81 @@
+import json
+from datetime import datetime, timedelta, date
+import pytest
+from fastapi.testclient import TestClient
+from backend import crud, main, models, schemas
+
+def counters(db):
+    return {(c.department, c.day): (c.total, c.alerting, c.misfiled) for c in db.query(models.DocumentCounter)}
+
+def store(db, department='Safety', alerts=(), misfiled=False):
+    return crud.create_document(db, schemas.DocumentCreate(
+        filename='doc.pdf', department=department, is_misfiled=misfiled,
+        semantic_alerts=json.dumps([{'label': l, 'score': 0.8} for l in alerts])))
+
+def test_create_document_upserts_one_row_per_department_day(db):
+    store(db)
+    store(db, alerts=['fire'])
+    store(db, misfiled=True)
+    store(db, department='HR')
+    today = datetime.utcnow().date()
+    assert counters(db) == {('Safety', today): (3, 1, 1), ('HR', today): (1, 0, 0)}
+
+def test_bump_counters_adds_to_an_existing_row(db):
+    day = date(2024, 3, 1)
+    crud.bump_counters(db, 'Safety', day, alerting=1)
+    crud.bump_counters(db, 'Safety', day, total=2, misfiled=1)
+    crud.bump_counters(db, None, day)
+    db.commit()
+    assert counters(db) == {('Safety', day): (3, 1, 1), ('', day): (1, 0, 0)}
+
+def test_rebuild_matches_incremental_counters(db):
+    store(db)
+    store(db, alerts=['fire'], misfiled=True)
+    store(db, department='HR', alerts=['deadline'])
+    incremental = counters(db)
+    crud.rebuild_counters(db)
+    assert counters(db) == incremental
+
+def test_rebuild_counts_identical_timestamps_and_the_midnight_boundary(db):
+    midnight = datetime(2024, 5, 2)
+    for created in (midnight, midnight, midnight - timedelta(microseconds=1)):
+        db.add(models.Document(filename='x.pdf', department='Safety', created_at=created,
+                               semantic_alerts='[]', is_misfiled=False))
+    db.add(models.Document(filename='y.pdf', department='Safety', created_at=midnight,
+                           semantic_alerts='[{"label": "fire", "score": 0.9}]', is_misfiled=True))
+    db.commit()
+    assert crud.rebuild_counters(db) == 2
+    assert counters(db) == {('Safety', date(2024, 5, 2)): (3, 1, 1), ('Safety', date(2024, 5, 1)): (1, 0, 0)}
+
+@pytest.fixture
+def client():
+    user = models.User(username='rev', role=models.UserRole.REVIEWER, department='Safety')
+    main.app.dependency_overrides[main.get_current_user] = lambda: user
+    try:
+        yield TestClient(main.app)
+    finally:
+        main.app.dependency_overrides.clear()
+
+def test_timeseries_lists_recent_days_oldest_first(db, client):
+    today = datetime.utcnow().date()
+    for days_ago, department in ((0, 'Safety'), (0, 'HR'), (2, 'Safety'), (40, 'Safety')):
+        crud.bump_counters(db, department, today - timedelta(days=days_ago), alerting=1)
+    db.commit()
+
+    series = client.get('/stats/timeseries', params={'days': 7}).json()['series']
+    assert [(p['day'], p['total'], p['alerting']) for p in series] == [
+        ((today - timedelta(days=2)).isoformat(), 1, 1), (today.isoformat(), 2, 2)]
+
+    body = client.get('/stats/timeseries', params={'days': 1, 'department': 'HR'}).json()
+    assert body['department'] == 'HR'
+    assert [(p['day'], p['total']) for p in body['series']] == [(today.isoformat(), 1)]
+
+def test_timeseries_rejects_out_of_range_days(client):
+    assert client.get('/stats/timeseries', params={'days': 0}).status_code == 422
+    assert client.get('/stats/timeseries', params={'days': 367}).status_code == 422
+
+def test_stats_sum_the_counters(db, client):
+    store(db, alerts=['fire'])
+    store(db, department='HR', misfiled=True)
+    stats = client.get('/stats').json()
+    assert (stats['total_documents'], stats['active_alerts'], stats['misfiled_documents']) == (2, 1, 1)
@@ -0,0 +1,84 @@
+import json, os
+import numpy as np
+import pytest
+from backend import embedding_backends
+
+class Transformer:
+    pass
+
+class Pooling:
+    pooling_mode_mean_tokens = True
+
+class Tokenizer:
+    def save_pretrained(self, path):
+        pass
+
+class ReferenceEncoder:
+    """Stands in for a mean-pooling SentenceTransformer"""
+    max_seq_length = 128
+    tokenizer = Tokenizer()
+
+    def __iter__(self):
+        return iter([Transformer(), Pooling()])
+
+class FakeSession:
+    def get_inputs(self):
+        return []
+
+@pytest.fixture
+def onnx(workdir, monkeypatch):
+    """Export, quantization and ONNX Runtime replaced by file writes; returns the call log"""
+    calls = {'export': 0, 'sessions': 0, 'references': 0}
+    def export(model, path):
+        calls['export'] += 1
+        with open(path, 'wb') as f:
+            f.write(b'onnx')
+    def session(path, threads=0):
+        calls['sessions'] += 1
+        return FakeSession()
+    monkeypatch.setattr(embedding_backends, 'export_onnx', export)
+    monkeypatch.setattr(embedding_backends, 'open_session', session)
+    calls['dir'] = workdir
+    return calls
+
+def load(calls, tolerance=0.02):
+    def build_reference():
+        calls['references'] += 1
+        return ReferenceEncoder()
+    return embedding_backends.load_sentence_encoder('onnx', 'org/model', build_reference, ['concept'],
+                                                    calls['dir'], tolerance=tolerance)
+
+def record_path(calls):
+    return os.path.join(calls['dir'], 'org_model', 'model.onnx.json')
+
+def test_parity_pass_uses_onnx(onnx, monkeypatch):
+    monkeypatch.setattr(embedding_backends, 'parity_error', lambda *args: 0.001)
+    assert isinstance(load(onnx), embedding_backends.OnnxSentenceEncoder)
+    assert json.load(open(record_path(onnx)))['error'] == 0.001
+
+def test_parity_failure_returns_the_torch_encoder_and_is_remembered(onnx, monkeypatch):
+    monkeypatch.setattr(embedding_backends, 'parity_error', lambda *args: 0.5)
+    assert isinstance(load(onnx), ReferenceEncoder)
+    assert isinstance(load(onnx), ReferenceEncoder)
+    assert onnx['export'] == 1
+
+def test_unreadable_record_falls_back_to_a_fresh_export(onnx, monkeypatch):
+    monkeypatch.setattr(embedding_backends, 'parity_error', lambda *args: 0.5)
+    os.makedirs(os.path.dirname(record_path(onnx)))
+    with open(record_path(onnx), 'w') as f:
+        f.write('{not json')
+    assert isinstance(load(onnx), ReferenceEncoder)
+    assert onnx['export'] == 1
+
+def test_runtime_errors_opening_the_model_fall_back_to_torch(onnx, monkeypatch):
+    monkeypatch.setattr(embedding_backends, 'parity_error', lambda *args: 0.001)
+    load(onnx)
+    def broken_session(path, threads=0):
+        raise RuntimeError('[ONNXRuntimeError] : 7 : INVALID_PROTOBUF')
+    monkeypatch.setattr(embedding_backends, 'open_session', broken_session)
+    assert isinstance(load(onnx), ReferenceEncoder)
+    assert onnx['export'] == 2  # the unusable export was discarded and redone
+
+def test_unknown_backend_is_rejected(onnx):
+    with pytest.raises(ValueError):
+        embedding_backends.load_sentence_encoder('tpu', 'org/model', ReferenceEncoder, [], onnx['dir'])
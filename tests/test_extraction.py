@@ -0,0 +1,68 @@
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from backend import extraction, ocr
+
+fitz = pytest.importorskip('fitz')
+
+def make_pdf(path, page_texts):
+    doc = fitz.open()
+    for text in page_texts:
+        page = doc.new_page()
+        if text:
+            page.insert_text((72, 72), text)
+    doc.save(path)
+    doc.close()
+    return path
+
+def test_page_offsets_point_at_each_page_start():
+    extracted = extraction.ExtractedText(['first\n', 'second page\n', 'third\n'])
+    assert extracted.page_offsets == [0, 6, 18]
+    for offset, page in zip(extracted.page_offsets, extracted.pages):
+        assert extracted.text[offset:offset + len(page)] == page
+
+def test_blank_pages_are_falsy():
+    assert not extraction.ExtractedText(['', '  \n'])
+    assert extraction.ExtractedText(['', 'text'])
+
+def test_pdf_pages_are_kept_in_order(workdir):
+    path = make_pdf(f'{workdir}/three.pdf', ['alpha page', 'bravo page', 'charlie page'])
+    extracted = extraction.extract_document(path)
+    assert [p.strip() for p in extracted.pages] == ['alpha page', 'bravo page', 'charlie page']
+    assert extracted.text.index('bravo') == extracted.page_offsets[1]
+
+def test_large_pdfs_are_split_into_ordered_page_ranges(workdir, monkeypatch):
+    texts = [f'page number {i}' for i in range(7)]
+    path = make_pdf(f'{workdir}/seven.pdf', texts)
+    monkeypatch.setattr(extraction.settings, 'PDF_PARALLEL_MIN_PAGES', 2)
+    monkeypatch.setattr(extraction.settings, 'PDF_PAGES_PER_TASK', 3)
+    submitted = []
+    class RecordingPool(ThreadPoolExecutor):
+        def submit(self, fn, *args):
+            submitted.append(args[1:])
+            return super().submit(fn, *args)
+    with RecordingPool(max_workers=3) as pool:
+        monkeypatch.setattr(extraction, '_get_pool', lambda: pool)
+        pages = list(extraction.stream_pdf_pages(path))
+    assert submitted == [(0, 3), (3, 6), (6, 7)]
+    assert [p.strip() for p in pages] == texts
+
+def test_scanned_pages_are_replaced_by_ocr_text(workdir, monkeypatch):
+    path = make_pdf(f'{workdir}/scan.pdf', ['typed text on the first page', None])
+    monkeypatch.setattr(extraction.settings, 'OCR_ENABLED', True)
+    requested = []
+    def fake_ocr(filepath, page_numbers):
+        requested.extend(page_numbers)
+        return ['recognised scan text' for _ in page_numbers]
+    monkeypatch.setattr(ocr, 'ocr_pdf_pages', fake_ocr)
+    extracted = extraction.extract_document(path)
+    assert requested == [1]
+    assert extracted.pages[1] == 'recognised scan text'
+    assert extracted.page_offsets[1] == len(extracted.pages[0])
+
+def test_plain_text_falls_back_to_a_single_page(workdir):
+    path = f'{workdir}/notes.txt'
+    with open(path, 'w') as f:
+        f.write('plain notes')
+    extracted = extraction.extract_document(path)
+    assert extracted.pages == ['plain notes']
+    assert extracted.page_offsets == [0]
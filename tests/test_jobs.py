@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+import pytest
+from backend import jobs, models, schemas, database
+
+@pytest.fixture
+def queue():
+    return jobs.JobQueue(database.SessionLocal, workers=1, poll_interval=0.01, batch_size=4)
+
+def enqueue(db, queue, name='a.pdf'):
+    return queue.enqueue(db, name, f'/tmp/{name}', 'Engineering', 'alice')
+
+def document(name='a.pdf'):
+    return schemas.DocumentCreate(
+        filename=name, department='Engineering', predicted_department='Engineering',
+        confidence=0.9, summary='s', semantic_alerts='[]', section_scores='[]',
+        is_misfiled=False, flag_reason='', original_text='text', translated_text='',
+        filepath=f'/tmp/{name}', uploaded_by='alice')
+
+def expire(db, job_id):
+    db.query(models.ProcessingJob).filter(models.ProcessingJob.id == job_id).update(
+        {'updated_at': datetime.utcnow() - timedelta(seconds=jobs.settings.JOB_LEASE_SECONDS + 1)})
+    db.commit()
+
+def test_claim_is_exclusive_and_tokened(db, queue):
+    enqueue(db, queue, 'a.pdf')
+    enqueue(db, queue, 'b.pdf')
+    first = queue._claim(db)
+    assert len(first) == 2
+    assert len({job.claim_token for job in first}) == 1 and first[0].claim_token
+    assert all(job.attempts == 1 for job in first)
+    assert queue._claim(db) == []
+
+def test_expired_lease_is_requeued_as_an_attempt(db, queue):
+    job = enqueue(db, queue)
+    for attempt in range(1, job.max_attempts):
+        (claimed,) = queue._claim(db)
+        assert claimed.attempts == attempt
+        expire(db, job.id)
+        queue._requeue_expired(db)
+        db.refresh(job)
+        assert job.status == models.JobStatus.QUEUED and job.claim_token is None
+    queue._claim(db)
+    expire(db, job.id)
+    queue._requeue_expired(db)
+    db.refresh(job)
+    assert job.status == models.JobStatus.FAILED
+    assert 'Lease expired' in job.error
+    assert queue._claim(db) == []
+
+def test_renewed_lease_is_not_requeued(db, queue):
+    job = enqueue(db, queue)
+    (claimed,) = queue._claim(db)
+    expire(db, job.id)
+    assert jobs.Lease(database.SessionLocal, [job.id], claimed.claim_token, 60).renew() == 1
+    queue._requeue_expired(db)
+    db.refresh(job)
+    assert job.status == models.JobStatus.RUNNING
+
+def test_lease_of_a_stale_claim_is_not_renewed(db, queue):
+    job = enqueue(db, queue)
+    (claimed,) = queue._claim(db)
+    stale = claimed.claim_token
+    expire(db, job.id)
+    queue._requeue_expired(db)
+    queue._claim(db)
+    assert jobs.Lease(database.SessionLocal, [job.id], stale, 60).renew() == 0
+
+def test_result_of_a_lost_lease_is_discarded(db, queue):
+    job = enqueue(db, queue)
+    (first,) = queue._claim(db)
+    stale = first.claim_token
+    expire(db, job.id)
+    queue._requeue_expired(db)
+    (second,) = queue._claim(db)
+    # The slow first worker finishes after the job was claimed again
+    assert jobs.save_results(db, [(job.id, stale)], [document()], [None]) == []
+    db.commit()
+    assert db.query(models.Document).count() == 0
+    saved = jobs.save_results(db, [(job.id, second.claim_token)], [document()], [None])
+    db.commit()
+    assert len(saved) == 1
+    db.refresh(job)
+    assert job.status == models.JobStatus.SUCCEEDED and job.document_id == saved[0][0]
+    # A duplicate save under the same claim inserts nothing either
+    assert jobs.save_results(db, [(job.id, second.claim_token)], [document()], [None]) == []
+    db.commit()
+    assert db.query(models.Document).count() == 1
+
+def test_failure_after_losing_the_lease_leaves_job_alone(db, queue):
+    job = enqueue(db, queue)
+    (first,) = queue._claim(db)
+    expire(db, job.id)
+    queue._requeue_expired(db)
+    queue._fail(db, job.id, first.claim_token, RuntimeError('boom'))
+    db.refresh(job)
+    assert job.status == models.JobStatus.QUEUED and job.error is None
+
+def test_failures_retry_with_backoff_then_fail(db, queue):
+    job = enqueue(db, queue)
+    for attempt in range(job.max_attempts):
+        db.query(models.ProcessingJob).update({'available_at': datetime.utcnow()})
+        db.commit()
+        (claimed,) = queue._claim(db)
+        queue._fail(db, job.id, claimed.claim_token, RuntimeError('boom'))
+        db.refresh(job)
+    assert job.status == models.JobStatus.FAILED
+    assert job.error == 'RuntimeError: boom'
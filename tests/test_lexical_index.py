@@ -0,0 +1,36 @@
+from sqlalchemy import text
+from backend import crud, database, lexical_index, models, schemas
+
+def add_document(db, body, filename='report.pdf'):
+    doc = schemas.DocumentCreate(filename=filename, department='Finance',
+                                 original_text=body[:2000], summary='Quarterly report')
+    return crud.create_document(db, doc, search_text=body)
+
+def test_identifier_beyond_the_stored_excerpt_is_found(db):
+    filler = 'The maintenance schedule was reviewed and approved. ' * 90  # ~4,700 characters
+    doc = add_document(db, filler + 'Refer to invoice INV-77812 for details.')
+    assert [doc_id for doc_id, _ in lexical_index.search(db, 'INV-77812')] == [doc.id]
+
+def test_department_filter_and_no_match(db):
+    add_document(db, 'Work order WO-2024-113 closed.')
+    assert lexical_index.search(db, 'WO-2024-113', department='Engineering') == []
+    assert len(lexical_index.search(db, 'WO-2024-113', department='Finance')) == 1
+    assert lexical_index.search(db, 'nonexistent-term') == []
+
+def test_legacy_index_is_recreated_over_search_text(db):
+    legacy = ('filename', 'summary', 'original_text', 'translated_text')
+    fts = lexical_index.FTS_TABLE
+    with database.engine.begin() as conn:
+        for trigger in lexical_index._SQLITE_TRIGGERS:
+            conn.execute(text(f"DROP TRIGGER {trigger}"))
+        conn.execute(text(f"DROP TABLE {fts}"))
+        conn.execute(text(f"CREATE VIRTUAL TABLE {fts} USING fts5({', '.join(legacy)}, "
+                          "content='documents', content_rowid='id')"))
+        conn.execute(text(f"CREATE TRIGGER documents_fts_ai AFTER INSERT ON documents BEGIN "
+                          f"INSERT INTO {fts}(rowid, {', '.join(legacy)}) "
+                          f"VALUES (new.id, {', '.join('new.' + c for c in legacy)}); END"))
+    db.add(models.Document(filename='old.pdf', department='Finance', original_text='legacy circular KMRL/CIR/45'))
+    db.commit()
+    lexical_index.setup(database.engine)
+    assert len(lexical_index.search(db, 'KMRL/CIR/45')) == 1
+    assert db.query(models.Document.search_text).scalar() == 'legacy circular KMRL/CIR/45'
@@ -0,0 +1,67 @@
+import threading, time
+import pytest
+from backend import microbatch, metrics
+
+def call_concurrently(batcher, items):
+    results = [None] * len(items)
+    def call(i):
+        try:
+            results[i] = batcher(items[i])
+        except Exception as e:
+            results[i] = e
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(items))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert not any(t.is_alive() for t in threads), 'caller hung'
+    return results
+
+def test_concurrent_calls_share_a_batch():
+    sizes = []
+    def fn(items):
+        sizes.append(len(items))
+        time.sleep(0.02)
+        return [i * 2 for i in items]
+    batcher = microbatch.MicroBatcher('double', fn, max_batch=8, max_wait_ms=20, timeout=5)
+    assert call_concurrently(batcher, list(range(6))) == [0, 2, 4, 6, 8, 10]
+    assert max(sizes) > 1
+
+def test_batch_exception_reaches_every_caller_and_thread_survives():
+    calls = []
+    def fn(items):
+        calls.append(items)
+        if len(calls) == 1:
+            raise ValueError('model exploded')
+        return items
+    batcher = microbatch.MicroBatcher('flaky', fn, max_batch=4, max_wait_ms=0, timeout=5)
+    with pytest.raises(ValueError):
+        batcher('a')
+    assert batcher('b') == 'b'
+
+def test_short_result_list_fails_unresolved_callers():
+    batcher = microbatch.MicroBatcher('short', lambda items: items[:-1], max_batch=4, max_wait_ms=20, timeout=5)
+    results = call_concurrently(batcher, ['a', 'b', 'c'])
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+def test_metrics_failure_does_not_hang_callers(monkeypatch):
+    def broken(*args):
+        raise RuntimeError('metrics backend down')
+    monkeypatch.setattr(metrics, 'observe_batch', broken)
+    batcher = microbatch.MicroBatcher('observed', lambda items: items, max_batch=4, max_wait_ms=0, timeout=5)
+    assert batcher('a') == 'a'
+    assert batcher('b') == 'b'
+
+def test_caller_times_out_instead_of_hanging():
+    release = threading.Event()
+    def fn(items):
+        release.wait(5)
+        return items
+    batcher = microbatch.MicroBatcher('slow', fn, max_batch=1, max_wait_ms=0, timeout=0.05)
+    with pytest.raises(TimeoutError):
+        batcher('first')
+    with pytest.raises(TimeoutError):
+        batcher('queued behind the slow batch')  # cancelled before its batch starts
+    release.set()
+    batcher.timeout = 5
+    assert batcher('later') == 'later'
@@ -0,0 +1,47 @@
+import os, json
+import pytest
+
+from backend.model_registry import load_artifact, artifact_path
+
+def _save(obj, path):
+    with open(os.path.join(path, 'model.json'), 'w') as f:
+        json.dump(obj, f)
+
+def _load(path):
+    with open(os.path.join(path, 'model.json')) as f:
+        return json.load(f)
+
+def test_artifact_is_saved_then_loaded(tmp_path):
+    built = []
+    def build():
+        built.append(1)
+        return {'weights': [1, 2, 3]}
+    first = load_artifact('sentence-org/model', build, str(tmp_path), save=_save, load=_load)
+    second = load_artifact('sentence-org/model', build, str(tmp_path), save=_save, load=_load)
+    assert first == second == {'weights': [1, 2, 3]}
+    assert len(built) == 1
+    assert os.path.isdir(artifact_path('sentence-org/model', str(tmp_path)))
+
+def test_artifact_name_includes_library_versions(tmp_path):
+    name = os.path.basename(artifact_path('sentence-org/model', str(tmp_path)))
+    assert name.startswith('sentence-org_model-torch')
+    assert '-tf' in name and '-st' in name
+
+def test_failed_save_leaves_no_temp_directory(tmp_path):
+    def broken_save(obj, path):
+        _save(obj, path)
+        raise RuntimeError('disk full')
+    obj = load_artifact('summarizer', lambda: {'a': 1}, str(tmp_path), save=broken_save, load=_load)
+    assert obj == {'a': 1}
+    assert os.listdir(tmp_path) == []
+
+def test_unreadable_artifact_is_rebuilt(tmp_path):
+    os.makedirs(artifact_path('summarizer', str(tmp_path)))
+    obj = load_artifact('summarizer', lambda: {'a': 2}, str(tmp_path), save=_save, load=_load)
+    assert obj == {'a': 2}
+    assert load_artifact('summarizer', lambda: pytest.fail('rebuilt'), str(tmp_path),
+                         save=_save, load=_load) == {'a': 2}
+
+def test_without_save_and_load_nothing_is_cached(tmp_path):
+    assert load_artifact('summarizer', lambda: 3, str(tmp_path)) == 3
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,75 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from backend import ocr
+
+fitz = pytest.importorskip('fitz')
+Image = pytest.importorskip('PIL.Image')
+
+@pytest.fixture
+def pool(workdir, monkeypatch):
+    """OCR tasks run in threads and cache into this test's directory"""
+    monkeypatch.setattr(ocr.settings, 'OCR_CACHE_DIR', os.path.join(workdir, 'ocr_cache'))
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        monkeypatch.setattr(ocr, '_get_pool', lambda: executor)
+        yield executor
+
+@pytest.fixture
+def image(workdir):
+    path = os.path.join(workdir, 'scan.png')
+    Image.new('L', (40, 20), color=255).save(path)
+    return path
+
+class FakeWorker:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def __call__(self, *args):
+        self.calls.append(args[:-1])
+        if self.fail:
+            raise RuntimeError('tesseract crashed')
+        return f'text {len(self.calls)}'
+
+def test_image_ocr_is_cached_on_disk(pool, image, monkeypatch):
+    worker = FakeWorker()
+    monkeypatch.setattr(ocr, '_ocr_image_file', worker)
+    assert ocr.ocr_image(image) == 'text 1'
+    assert ocr.ocr_image(image) == 'text 1'
+    assert len(worker.calls) == 1
+
+def test_ocr_settings_are_part_of_the_cache_key(pool, image, monkeypatch):
+    worker = FakeWorker()
+    monkeypatch.setattr(ocr, '_ocr_image_file', worker)
+    ocr.ocr_image(image)
+    monkeypatch.setattr(ocr.settings, 'OCR_LANGUAGE', 'mal')
+    assert ocr.ocr_image(image) == 'text 2'
+    assert len(worker.calls) == 2
+
+def test_failures_are_not_cached(pool, image, monkeypatch):
+    monkeypatch.setattr(ocr, '_ocr_image_file', FakeWorker(fail=True))
+    assert ocr.ocr_image(image) == ''
+    worker = FakeWorker()
+    monkeypatch.setattr(ocr, '_ocr_image_file', worker)
+    assert ocr.ocr_image(image) == 'text 1'
+
+def test_pdf_pages_keep_order_and_share_cache_by_content(pool, workdir, monkeypatch):
+    path = os.path.join(workdir, 'scan.pdf')
+    doc = fitz.open()
+    for text in ('first', 'second', 'first'):
+        doc.new_page().insert_text((72, 72), text)
+    doc.save(path)
+    doc.close()
+    worker = FakeWorker()
+    monkeypatch.setattr(ocr, '_ocr_pdf_page', worker)
+    texts = ocr.ocr_pdf_pages(path, [0, 1])
+    assert texts == [f'text {worker.calls.index((path, n)) + 1}' for n in (0, 1)]
+    # page 2 has the same content stream as page 0, so it is a cache hit
+    assert ocr.ocr_pdf_pages(path, [2, 1]) == [texts[0], texts[1]]
+    assert len(worker.calls) == 2
+
+def test_prepare_image_downscales_and_binarizes():
+    img = Image.new('RGB', (200, 100), color=(200, 200, 200))
+    prepared = ocr._prepare_image(img, max_pixels=5000, binarize=True)
+    assert prepared.size[0] * prepared.size[1] <= 5000
+    assert prepared.mode == '1'
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+import pytest
+from fastapi.testclient import TestClient
+from backend import crud, main, models
+
+def add_documents(db, count, same_time=False):
+    start = datetime(2024, 1, 1)
+    for i in range(count):
+        created = start if same_time else start + timedelta(minutes=i)
+        db.add(models.Document(filename=f'doc-{i}.pdf', department='Engineering', created_at=created))
+    db.commit()
+
+def all_pages(db, limit):
+    seen, cursor = [], None
+    while True:
+        docs, cursor = crud.get_documents_page(db, limit, cursor=cursor)
+        seen.extend(doc.id for doc in docs)
+        if cursor is None:
+            return seen
+
+def test_pages_cover_every_document_once_newest_first(db):
+    add_documents(db, 7)
+    ids = all_pages(db, 3)
+    assert len(ids) == 7 and len(set(ids)) == 7
+    created = {d.id: d.created_at for d in db.query(models.Document)}
+    assert [created[i] for i in ids] == sorted(created.values(), reverse=True)
+
+def test_identical_timestamps_are_ordered_by_id(db):
+    add_documents(db, 5, same_time=True)
+    assert all_pages(db, 2) == sorted(all_pages(db, 5), reverse=True)
+
+def test_last_full_page_has_no_next_cursor(db):
+    add_documents(db, 4)
+    docs, cursor = crud.get_documents_page(db, 4)
+    assert len(docs) == 4 and cursor is None
+
+@pytest.mark.parametrize('cursor', ['not-base64!', 'Zm9v', crud.encode_cursor(
+    type('Row', (), {'created_at': datetime(2024, 1, 1), 'id': 'x'})())])
+def test_malformed_cursor_raises_value_error(db, cursor):
+    with pytest.raises(ValueError):
+        crud.get_documents_page(db, 3, cursor=cursor)
+
+def test_malformed_cursor_is_a_bad_request(db):
+    user = models.User(username='rev', role=models.UserRole.REVIEWER, department='Engineering')
+    main.app.dependency_overrides[main.get_current_user] = lambda: user
+    try:
+        response = TestClient(main.app).get('/documents', params={'cursor': 'garbage'})
+    finally:
+        main.app.dependency_overrides.clear()
+    assert response.status_code == 400
+    assert response.json()['detail'] == 'Invalid cursor'
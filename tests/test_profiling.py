@@ -0,0 +1,29 @@
+import threading, time
+from backend import profiling
+
+def busy_helper(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+def test_samples_work_handed_to_other_threads():
+    stop = threading.Event()
+    helper = threading.Thread(target=busy_helper, args=(stop,), name='microbatch-embed')
+    with profiling.SamplingProfiler(interval_ms=1) as profiler:
+        helper.start()
+        time.sleep(0.05)
+        stop.set()
+        helper.join()
+    stacks = profiler.collapsed()
+    assert any(line.startswith('[microbatch-embed];') and 'busy_helper' in line for line in stacks.splitlines())
+    assert any('(profiled)' in name for name in profiler.thread_samples)
+    assert 'profiler' not in profiler.thread_samples
+
+def test_short_request_still_leaves_a_sample():
+    with profiling.SamplingProfiler(interval_ms=1000) as profiler:
+        pass
+    assert profiler.samples == 1 and profiler.stacks
+
+def test_thread_filter_limits_sampled_threads():
+    with profiling.SamplingProfiler(thread_ids=[threading.get_ident()], interval_ms=1) as profiler:
+        time.sleep(0.01)
+    assert list(profiler.thread_samples) == [f'{threading.current_thread().name} (profiled)']
@@ -0,0 +1,145 @@
+import os, threading
+import numpy as np
+import pytest
+from backend import database, models, search_index, vector_store
+
+pytestmark = pytest.mark.skipif(search_index.faiss is None, reason='faiss not installed')
+
+DIM = 16
+
+def vector(seed):
+    return vector_store.to_vector(np.random.default_rng(seed).normal(size=DIM))
+
+def store(db, doc_id, department='Engineering'):
+    """Persist a document and its embedding the way an upload does"""
+    db.add(models.Document(id=doc_id, filename=f'doc-{doc_id}.pdf', department=department))
+    db.flush()
+    db.add(models.DocumentEmbedding(document_id=doc_id, department=department,
+                                    vector=vector_store.to_blob(vector(doc_id))))
+    db.commit()
+
+@pytest.fixture
+def index(workdir):
+    return search_index.DepartmentIndex(f'{workdir}/faiss_index.bin', 'test-model',
+                                        save_interval=3600, sync_interval=0)
+
+def test_search_catches_up_with_inserts_from_other_processes(db, index, monkeypatch):
+    for doc_id in range(1, 6):
+        store(db, doc_id)
+    index.load(db)
+    # Another worker stored documents without touching this process's shard
+    for doc_id in range(6, 9):
+        store(db, doc_id)
+    monkeypatch.setattr(search_index, 'exact_search', lambda *a: pytest.fail('fell back to exact scan'))
+    monkeypatch.setattr(search_index, 'index', index)
+    hits = search_index.search(db, vector(7), 'Engineering', k=3)
+    assert hits[0][0] == 7
+    assert index.shards['Engineering'].ntotal == 8
+
+def test_queries_between_syncs_do_not_count_embeddings(db, index, monkeypatch):
+    for doc_id in range(1, 4):
+        store(db, doc_id)
+    index.sync_interval = 3600
+    index.load(db)
+    monkeypatch.setattr(search_index.crud, 'count_embeddings_by_department',
+                        lambda *a, **kw: pytest.fail('counted embeddings on the query path'))
+    store(db, 4)
+    index.add(4, 'Engineering', vector(4))  # local inserts are searchable at once
+    assert index.search(db, vector(4), 'Engineering', 1)[0][0] == 4
+    assert index.search(db, vector(1), None, 1)[0][0] == 1
+
+def test_faiss_errors_fall_back_to_exact_scan(db, index, monkeypatch):
+    for doc_id in range(1, 4):
+        store(db, doc_id)
+    index.load(db)
+
+    class Broken:
+        ntotal = 3
+        def search(self, *args):
+            raise RuntimeError('corrupt shard')
+
+    index.shards['Engineering'] = Broken()
+    index.sync_interval = 3600
+    monkeypatch.setattr(search_index, 'index', index)
+    hits = search_index.search(db, vector(2), 'Engineering', k=1)
+    assert hits[0][0] == 2
+
+def test_index_answers_nothing_until_loaded(db, index, monkeypatch):
+    store(db, 1)
+    monkeypatch.setattr(search_index, 'index', index)
+    assert index.search(db, vector(1)) is None
+    assert search_index.search(db, vector(1), k=1)[0][0] == 1  # exact scan meanwhile
+
+def test_add_does_not_duplicate_documents_already_synced(db, index):
+    index.load(db)
+    store(db, 1)
+    assert index.search(db, vector(1), 'Engineering', 5)[0][0] == 1
+    index.add(1, 'Engineering', vector(1))  # the uploading worker adds after the sync did
+    assert index.shards['Engineering'].ntotal == 1
+
+def test_deleted_documents_trigger_a_rebuild(db, index):
+    for doc_id in range(1, 4):
+        store(db, doc_id)
+    index.load(db)
+    db.query(models.DocumentEmbedding).filter(models.DocumentEmbedding.document_id == 2).delete()
+    db.commit()
+    hits = index.search(db, vector(2), 'Engineering', 5)
+    assert {doc_id for doc_id, _ in hits} == {1, 3}
+
+def test_inserts_are_saved_in_batches(db, index, workdir):
+    index.load(db)
+    path = index.shard_path('Engineering')
+    for doc_id in range(1, 4):
+        store(db, doc_id)
+        index.add(doc_id, 'Engineering', vector(doc_id))
+    assert index.dirty == {'Engineering'}
+    assert not os.path.exists(path)
+    index.save()
+    assert index.dirty == set()
+    reloaded = search_index.DepartmentIndex(f'{workdir}/faiss_index.bin', 'test-model')
+    reloaded.load(db)
+    assert reloaded.shards['Engineering'].ntotal == 3
+
+def test_overwritten_shard_file_loses_no_documents(db, index, workdir):
+    other = search_index.DepartmentIndex(f'{workdir}/faiss_index.bin', 'test-model', save_interval=3600)
+    index.load(db)
+    other.load(db)
+    for doc_id, owner in ((1, index), (2, other), (3, index)):
+        store(db, doc_id)
+        owner.add(doc_id, 'Engineering', vector(doc_id))
+    index.save()
+    other.save()  # last writer wins on disk
+    fresh = search_index.DepartmentIndex(f'{workdir}/faiss_index.bin', 'test-model')
+    fresh.load(db)
+    assert fresh.ids['Engineering'] == {1, 2, 3}
+
+def test_concurrent_add_and_search(db, index):
+    store(db, 1)
+    index.load(db)
+    errors = []
+    stop = threading.Event()
+
+    def searcher():
+        session = database.SessionLocal()
+        try:
+            while not stop.is_set():
+                index.search(session, vector(0), 'Engineering', 10)
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=searcher) for _ in range(4)]
+    for t in threads:
+        t.start()
+    try:
+        for doc_id in range(2, 300):
+            store(db, doc_id)
+            index.add(doc_id, 'Engineering', vector(doc_id))
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+    assert errors == []
+    assert index.ids['Engineering'] == set(range(1, 300))
+    assert index.shards['Engineering'].ntotal == 299
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from backend.sections import SectionAggregator, split_into_chunks
+
+DEPTS = ['Finance', 'Safety']
+ALERTS = ['fire']
+
+def aggregator(**kwargs):
+    return SectionAggregator(DEPTS, ALERTS, **kwargs)
+
+def feed(agg):
+    # One short chunk leaning Finance, one long chunk leaning Safety
+    agg.add(0, 'invoice paid', np.array([1.0, 0.0]), np.array([0.8, 0.2]), np.array([0.1]), page=1)
+    agg.add(1, ' '.join(['hazard'] * 8), np.array([0.0, 1.0]), np.array([0.3, 0.6]), np.array([0.7]), page=2)
+    return agg
+
+def test_mean_strategy_averages_chunks():
+    np.testing.assert_allclose(feed(aggregator(strategy='mean')).department_scores(), [0.55, 0.4], rtol=1e-6)
+
+def test_max_strategy_keeps_the_best_chunk():
+    np.testing.assert_allclose(feed(aggregator(strategy='max')).department_scores(), [0.8, 0.6], rtol=1e-6)
+
+def test_weighted_strategy_weights_by_chunk_length():
+    scores = feed(aggregator(strategy='weighted')).department_scores()
+    np.testing.assert_allclose(scores, [(2 * 0.8 + 8 * 0.3) / 10, (2 * 0.2 + 8 * 0.6) / 10], rtol=1e-6)
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        aggregator(strategy='median')
+
+def test_embedding_is_length_weighted_and_normalized():
+    vector = feed(aggregator()).embedding()
+    assert np.linalg.norm(vector) == pytest.approx(1.0)
+    assert vector[1] > vector[0]
+
+def test_alerts_point_at_the_best_section():
+    alerts = feed(aggregator(alert_threshold=0.5)).alerts()
+    assert [(a['label'], a['paragraph_index'], a['page']) for a in alerts] == [('fire', 1, 2)]
+
+def test_max_sections_caps_stored_scores_but_not_aggregates():
+    agg = aggregator(max_sections=1, alert_threshold=0.5)
+    feed(agg)
+    assert [s['paragraph_index'] for s in agg.sections] == [0]
+    assert agg.chunks == 2
+    assert agg.alerts()[0]['paragraph_index'] == 1
+
+def test_chunks_respect_the_word_budget():
+    text = 'a b\n\nc d e\n\n' + ' '.join(['w'] * 7)
+    chunks = list(split_into_chunks(text, max_words=5))
+    assert chunks == ['a b c d e', 'w w w w w', 'w w']
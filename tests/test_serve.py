@@ -0,0 +1,80 @@
+import os, sys, time, signal, socket, subprocess, urllib.request
+import pytest
+from backend import serve
+
+SMAPS = """55d0c0a00000-7ffd3b9fe000 ---p 00000000 00:00 0                          [rollup]
+Rss:              204800 kB
+Pss:              102400 kB
+Shared_Clean:      81920 kB
+Shared_Dirty:      20480 kB
+Private_Clean:      2048 kB
+Private_Dirty:    100352 kB
+Referenced:       204800 kB
+"""
+
+def test_process_memory_sums_shared_and_private_fields(tmp_path, monkeypatch):
+    path = tmp_path / 'smaps_rollup'
+    path.write_text(SMAPS)
+    real_open = open
+    def fake_open(name, *args, **kwargs):
+        return real_open(path if name == '/proc/42/smaps_rollup' else name, *args, **kwargs)
+    monkeypatch.setattr(serve, 'open', fake_open, raising=False)
+    assert serve.process_memory(42) == {
+        'rss': 204800 * 1024, 'pss': 102400 * 1024,
+        'shared': (81920 + 20480) * 1024, 'private': (2048 + 100352) * 1024,
+    }
+
+def test_process_memory_of_a_missing_process_is_none():
+    assert serve.process_memory(2 ** 22 + 1) is None
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/smaps_rollup'), reason='needs /proc/<pid>/smaps_rollup')
+def test_process_memory_of_this_process():
+    memory = serve.process_memory()
+    assert memory['rss'] > 0
+    assert memory['shared'] + memory['private'] == memory['rss']
+
+def test_bound_socket_is_inherited_by_workers():
+    sock = serve.bind('127.0.0.1', 0)
+    try:
+        assert sock.get_inheritable()
+        assert sock.getsockname()[1] > 0
+    finally:
+        sock.close()
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_until_live(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        assert process.poll() is None, process.stdout.read()
+        try:
+            with urllib.request.urlopen(url, timeout=2) as response:
+                return response.status
+        except OSError:
+            time.sleep(0.2)
+    pytest.fail('server did not come up')
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='preload-and-fork needs fork()')
+def test_forked_workers_serve_and_stop_on_sigterm(workdir):
+    port = free_port()
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'serve.db')}",
+               SERVE_PRELOAD_MODELS='[]', SERVE_MEMORY_REPORT_SECONDS='0', SERVE_SHUTDOWN_TIMEOUT_SECONDS='10')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'backend.serve', '--host', '127.0.0.1', '--port', str(port), '--workers', '2',
+         '--log-level', 'warning'],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    try:
+        assert wait_until_live(f'http://127.0.0.1:{port}/health/live', process) == 200
+        process.send_signal(signal.SIGTERM)
+        output, _ = process.communicate(timeout=30)
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.communicate()
+    assert process.returncode == 0
+    assert output.count('Worker') >= 2 and 'Shutting down workers' in output
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from backend import summarization, processor
+from backend.summarization import ChunkCost
+
+def test_single_chunk_needs_one_call():
+    assert summarization.summarizer_calls(100, chunk_words=350) == 1
+
+def test_map_reduce_call_count_includes_every_round():
+    # 10 chunks, fan-in 350 // 60 = 5: 10 map calls, 2 reduce inputs, 1 final
+    assert summarization.summarizer_calls(3500, chunk_words=350) == 10 + 2 + 1
+
+def test_short_texts_stay_abstractive_whatever_the_cost():
+    assert summarization.choose_mode(100, 350, budget_seconds=0.0, cost=ChunkCost(100.0)) == 'abstractive'
+
+def test_long_texts_switch_to_extractive_over_budget():
+    cost = ChunkCost(1.0)
+    assert summarization.choose_mode(3500, 350, budget_seconds=20.0, cost=cost) == 'abstractive'
+    assert summarization.choose_mode(3500, 350, budget_seconds=10.0, cost=cost) == 'extractive'
+
+def test_cost_estimate_follows_observed_timings():
+    cost = ChunkCost(1.0, alpha=0.5)
+    cost.observe(seconds=12.0, inputs=4)  # 3s per input
+    assert cost.estimate(2) == pytest.approx(4.0)
+    cost.observe(seconds=5.0, inputs=0)
+    assert cost.seconds == pytest.approx(2.0)
+
+def one_hot_encoder(topics):
+    """Embeds each sentence as the unit vector of its first word's topic"""
+    def encode(sentences):
+        vectors = np.zeros((len(sentences), len(topics)), dtype=np.float32)
+        for row, sentence in enumerate(sentences):
+            vectors[row, topics.index(sentence.split()[0])] = 1.0
+        return vectors
+    return encode
+
+def test_extractive_keeps_central_sentences_in_document_order():
+    text = ('brakes were replaced on unit twelve. '
+            'canteen menu changes next week today. '
+            'brakes were inspected after the run. '
+            'brakes pads showed uneven wear patterns. '
+            'parking permits renew in the office.')
+    picked = summarization.extractive(text, one_hot_encoder(['brakes', 'canteen', 'parking']), max_sentences=2)
+    assert picked == ['brakes were replaced on unit twelve.', 'brakes were inspected after the run.']
+
+def test_extractive_returns_short_texts_unranked():
+    text = 'only one sentence that is long enough. tiny.'
+    assert summarization.extractive(text, lambda s: pytest.fail('encoded'), max_sentences=3) == [
+        'only one sentence that is long enough.']
+
+def test_extractive_samples_long_documents_evenly():
+    text = ' '.join(f'alpha sentence number {i} here.' for i in range(50))
+    seen = []
+    def encode(sentences):
+        seen.extend(sentences)
+        return np.ones((len(sentences), 2), dtype=np.float32) / np.sqrt(2)
+    summarization.extractive(text, encode, max_sentences=2, max_candidates=10)
+    assert len(seen) == 10
+    assert seen[0].endswith('0 here.') and seen[-1].endswith('49 here.')
+
+def test_map_reduce_batches_every_documents_chunks_together():
+    calls = []
+    def summarize(inputs, final):
+        calls.append((len(inputs), final))
+        return ['short summary' for _ in inputs]
+    texts = [' '.join(['word'] * 25), 'brief text']
+    assert summarization.map_reduce(texts, summarize, chunk_words=10) == ['short summary'] * 2
+    assert calls == [(3, False), (2, True)]
+
+@pytest.mark.parametrize('mode', ['abstractive', 'extractive'])
+def test_fixed_summary_mode_is_used_as_is(mode, monkeypatch):
+    monkeypatch.setattr(processor.settings, 'SUMMARY_MODE', mode)
+    assert processor._summary_mode('word ' * 100000) == mode
+
+def test_auto_summary_mode_uses_the_latency_budget(monkeypatch):
+    monkeypatch.setattr(processor.settings, 'SUMMARY_MODE', 'auto')
+    monkeypatch.setattr(processor.settings, 'SUMMARY_LATENCY_BUDGET_SECONDS', 1.0)
+    monkeypatch.setattr(processor, 'summary_cost', ChunkCost(1.0))
+    assert processor._summary_mode('word ' * 50) == 'abstractive'
+    assert processor._summary_mode('word ' * 100000) == 'extractive'
+
+def test_unknown_summary_mode_is_rejected(monkeypatch):
+    monkeypatch.setattr(processor.settings, 'SUMMARY_MODE', 'verbatim')
+    with pytest.raises(ValueError):
+        processor._summary_mode('text')
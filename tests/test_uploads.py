@@ -0,0 +1,14 @@
+from fastapi.testclient import TestClient
+from backend import main, uploads
+
+client = TestClient(main.app)
+
+def test_oversized_upload_is_rejected_with_cors_headers():
+    too_big = uploads.max_file_bytes() + uploads.MULTIPART_OVERHEAD + 1
+    response = client.post('/documents/upload', content=b'x' * 16, headers={
+        'Origin': 'http://localhost:3000',
+        'Content-Length': str(too_big),
+        'Content-Type': 'multipart/form-data; boundary=x',
+    })
+    assert response.status_code == 413
+    assert response.headers.get('access-control-allow-origin') is not None
@@ -0,0 +1,55 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+from backend import database, models
+from backend.write_behind import WriteBehindBatcher
+
+class CountingFactory:
+    def __init__(self):
+        self.sessions = 0
+
+    def __call__(self):
+        self.sessions += 1
+        return database.SessionLocal()
+
+def insert(name):
+    def work(db):
+        db.add(models.CacheGeneration(name=name, generation=1))
+        return name
+    return work
+
+def submit_all(batcher, units):
+    """Results (or raised exceptions) of units submitted back to back, within one collection window"""
+    futures = [batcher.submit(work) for work in units]
+    return [f.exception(timeout=5) or f.result() for f in futures]
+
+def names(db):
+    return sorted(name for (name,) in db.query(models.CacheGeneration.name))
+
+def test_units_share_one_transaction(db):
+    factory = CountingFactory()
+    results = submit_all(WriteBehindBatcher(factory, interval_ms=500, max_batch=10), [insert('a'), insert('b')])
+    assert results == ['a', 'b']
+    assert factory.sessions == 1
+    assert names(db) == ['a', 'b']
+
+def test_failed_batch_is_retried_unit_by_unit(db):
+    factory = CountingFactory()
+    def broken(db):
+        raise ValueError('bad unit')
+    results = submit_all(WriteBehindBatcher(factory, interval_ms=500, max_batch=10),
+                         [insert('a'), broken, insert('b')])
+    assert results[0] == 'a' and results[2] == 'b'
+    assert isinstance(results[1], ValueError)
+    assert factory.sessions == 1 + 3
+    assert names(db) == ['a', 'b']
+
+def test_commit_time_conflicts_fail_only_the_conflicting_unit(db):
+    results = submit_all(WriteBehindBatcher(CountingFactory(), interval_ms=500, max_batch=10),
+                         [insert('a'), insert('a'), insert('c')])
+    assert results[0] == 'a' and results[2] == 'c'
+    assert isinstance(results[1], IntegrityError)
+    assert names(db) == ['a', 'c']
+
+def test_submit_returns_a_future(db):
+    future = WriteBehindBatcher(CountingFactory(), interval_ms=1, max_batch=1).submit(insert('solo'))
+    assert future.result(timeout=5) == 'solo'